@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
  
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,21 +32,27 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'taskmanager'
 ]
 
 MIDDLEWARE = [
+    'taskmanager.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'taskmanager.activity.ActivityActorMiddleware',
+    'taskmanager.replicas.ReplicaRoutingMiddleware',
+    'taskmanager.timeouts.StatementTimeoutMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -69,6 +75,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'mysite.wsgi.application'
+ASGI_APPLICATION = 'mysite.asgi.application'
 
 
 # Database
@@ -82,10 +89,78 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT'),
-        
+        # Keep connections open between requests (seconds, 0 = close after every request)
+        # and check them before reuse. Under ASGI use the pool instead (see DB_POOL)
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {},
     }
 }
 
+# psycopg connection pool per process (requires psycopg-pool). Replaces CONN_MAX_AGE:
+# connections return to the pool at the end of each request and are checked when taken out
+if config('DB_POOL', default=False, cast=bool):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        # Seconds a request waits for a free connection before failing
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+        'max_idle': config('DB_POOL_MAX_IDLE', default=600, cast=float),
+    }
+
+# Read replicas: DB_REPLICAS=host[:port][/name],... (name, user and password default to the primary's).
+# Read-only list/detail views read from them (taskmanager.replicas); tests use the primary instead
+TASKMANAGER_DB_REPLICAS = []
+for index, replica in enumerate(config('DB_REPLICAS', default='', cast=Csv())):
+    address, _, name = replica.partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica{index + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    TASKMANAGER_DB_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['taskmanager.replicas.ReplicaRouter']
+# Seconds a user reads only from the primary after a request that wrote (read-your-writes)
+TASKMANAGER_REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+# Seconds an unreachable replica is skipped before the next connection attempt
+TASKMANAGER_REPLICA_RETRY_SECONDS = config('REPLICA_RETRY_SECONDS', default=30, cast=int)
+
+
+# Cache: locmem for development. For production use a shared backend so that
+# versions and fragments are common to all workers, e.g.
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache CACHE_LOCATION=/var/tmp/taskmanager_cache
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='taskmanager'),
+    },
+    # Request, cache and fragment counters (taskmanager.instrumentation). An evicted key silently
+    # resets a counter, so this cache must not evict: with Redis use a separate database whose
+    # maxmemory-policy evicts only keys with a TTL (counters have none)
+    'metrics': {
+        'BACKEND': config('METRICS_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('METRICS_CACHE_LOCATION', default='taskmanager-metrics'),
+    },
+}
+if CACHES['metrics']['BACKEND'].endswith('.LocMemCache'):
+    # locmem culls a third of its keys at MAX_ENTRIES (300 by default)
+    CACHES['metrics']['OPTIONS'] = {'MAX_ENTRIES': 1_000_000}
+
+# Seconds a user's project roles stay cached (taskmanager.permissions). Membership changes
+# invalidate them through the cache, which a per-process locmem cache cannot share with other
+# workers, so there a revoked membership must expire quickly
+TASKMANAGER_ROLE_CACHE_TIMEOUT = config(
+    'ROLE_CACHE_TIMEOUT',
+    default=5 if CACHES['default']['BACKEND'].endswith('.LocMemCache') else 300,
+    cast=int,
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -132,4 +207,91 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Authentication
 LOGIN_REDIRECT_URL = 'dashboard' 
 LOGIN_URL = 'login'               
-LOGOUT_REDIRECT_URL = 'login'    
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'login'    
+
+
+# Activity log: "buffered" (batched inserts after commit) or "sync" (same transaction).
+# The test runner always uses "sync"
+TASKMANAGER_ACTIVITY_MODE = config('ACTIVITY_MODE', default='buffered')
+TASKMANAGER_ACTIVITY_BATCH_SIZE = config('ACTIVITY_BATCH_SIZE', default=100, cast=int)
+TASKMANAGER_ACTIVITY_FLUSH_INTERVAL = config('ACTIVITY_FLUSH_INTERVAL', default=5, cast=float)
+
+# Activity retention: monthly partitions older than this are archived (PostgreSQL only)
+TASKMANAGER_ACTIVITY_RETENTION_MONTHS = config('ACTIVITY_RETENTION_MONTHS', default=12, cast=int)
+TASKMANAGER_ACTIVITY_ARCHIVE_DIR = config('ACTIVITY_ARCHIVE_DIR', default=str(BASE_DIR / 'activity_archive'))
+
+# Largest number of operations accepted by one bulk task request
+TASKMANAGER_BULK_MAX_OPERATIONS = config('BULK_MAX_OPERATIONS', default=1000, cast=int)
+
+# Attachments: content-addressed files (blobs/), thumbnails and upload parts live here.
+# Downloads go through permission-checked views, do not serve this directory directly
+TASKMANAGER_ATTACHMENT_ROOT = config('ATTACHMENT_ROOT', default=str(BASE_DIR / 'attachments'))
+TASKMANAGER_UPLOAD_MAX_SIZE = config('UPLOAD_MAX_SIZE', default=2 * 1024 ** 3, cast=int)
+TASKMANAGER_UPLOAD_CHUNK_MAX_SIZE = config('UPLOAD_CHUNK_MAX_SIZE', default=16 * 1024 ** 2, cast=int)
+# Thumbnail edge in pixels and background worker threads (0 = build right after commit in the request)
+TASKMANAGER_THUMBNAIL_SIZE = config('THUMBNAIL_SIZE', default=320, cast=int)
+TASKMANAGER_THUMBNAIL_WORKERS = config('THUMBNAIL_WORKERS', default=2, cast=int)
+
+# Real-time board updates. The in-memory layer only works inside one process;
+# run several ASGI workers with a shared layer (e.g. channels_redis) instead
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': config('CHANNEL_LAYER_BACKEND', default='channels.layers.InMemoryChannelLayer'),
+    }
+}
+# Seconds a board socket collects changes before sending them as one frame
+TASKMANAGER_REALTIME_COALESCE_DELAY = config('REALTIME_COALESCE_DELAY', default=0.1, cast=float)
+
+# Template fragment cache ({% cachefragment %} and board columns) and its hit/miss counters
+TASKMANAGER_FRAGMENT_CACHE_TIMEOUT = config('FRAGMENT_CACHE_TIMEOUT', default=600, cast=int)
+TASKMANAGER_FRAGMENT_METRICS_INTERVAL = config('FRAGMENT_METRICS_INTERVAL', default=10, cast=float)
+
+# Dashboard summary: cached per user for this many seconds (overdue counts change with time alone),
+# "due soon" window in days and number of upcoming tasks listed
+TASKMANAGER_DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=60, cast=int)
+TASKMANAGER_DASHBOARD_DUE_SOON_DAYS = config('DASHBOARD_DUE_SOON_DAYS', default=3, cast=int)
+TASKMANAGER_DASHBOARD_TASK_LIMIT = config('DASHBOARD_TASK_LIMIT', default=20, cast=int)
+
+# Email (notification digests). Set EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend and EMAIL_HOST etc. in production
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='taskmanager@localhost')
+
+# Notifications: changes are queued in the request transaction, send_notifications delivers them.
+# A user's digest is sent once their oldest unsent notification is DIGEST_INTERVAL seconds old
+TASKMANAGER_NOTIFICATIONS_ENABLED = config('NOTIFICATIONS_ENABLED', default=True, cast=bool)
+TASKMANAGER_DIGEST_INTERVAL = config('DIGEST_INTERVAL', default=900, cast=int)
+TASKMANAGER_DIGEST_MAX_ITEMS = config('DIGEST_MAX_ITEMS', default=50, cast=int)
+# Events fanned out and emails sent per batch (one send_messages call over one connection)
+TASKMANAGER_NOTIFICATION_BATCH_SIZE = config('NOTIFICATION_BATCH_SIZE', default=100, cast=int)
+
+# Background jobs (taskmanager.jobs, run by run_jobs): failed jobs are retried after RETRY_DELAY seconds,
+# doubled on every attempt up to RETRY_MAX_DELAY; running jobs without progress for STALE_TIMEOUT are requeued
+TASKMANAGER_JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=5, cast=int)
+TASKMANAGER_JOB_RETRY_DELAY = config('JOB_RETRY_DELAY', default=30, cast=int)
+TASKMANAGER_JOB_RETRY_MAX_DELAY = config('JOB_RETRY_MAX_DELAY', default=3600, cast=int)
+TASKMANAGER_JOB_STALE_TIMEOUT = config('JOB_STALE_TIMEOUT', default=600, cast=int)
+# Tasks deleted per transaction when a project is deleted
+TASKMANAGER_JOB_DELETE_BATCH_SIZE = config('JOB_DELETE_BATCH_SIZE', default=500, cast=int)
+# Task imports larger than this many bytes run as background jobs
+TASKMANAGER_IMPORT_BACKGROUND_SIZE = config('IMPORT_BACKGROUND_SIZE', default=1024 ** 2, cast=int)
+
+# Server-side statement timeout for web requests in milliseconds (0 = none); views may set
+# their own statement_timeout. Management commands and background jobs run without it
+TASKMANAGER_STATEMENT_TIMEOUT = config('STATEMENT_TIMEOUT', default=30000, cast=int)
+
+# Request metrics (taskmanager.instrumentation): Server-Timing header, slow request log and /metrics.
+# /metrics is open to staff users and to "Authorization: Bearer <METRICS_TOKEN>" when the token is set
+TASKMANAGER_SERVER_TIMING = config('SERVER_TIMING', default=True, cast=bool)
+TASKMANAGER_SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=500, cast=int)
+TASKMANAGER_SLOW_REQUEST_QUERIES = config('SLOW_REQUEST_QUERIES', default=50, cast=int)
+TASKMANAGER_METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Raise instead of logging when a view exceeds its query_budget (the test runner enables it)
+TASKMANAGER_QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+
+# Runs the test suite with the activity log in sync mode
+TEST_RUNNER = 'taskmanager.runner.TestRunner'
@@ -0,0 +1,238 @@
+import atexit
+import contextvars
+import datetime
+import decimal
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils.duration import duration_iso_string
+
+from . import notifications
+from .models import Activity, Task
+
+"""
+Журнал изменений задач (Activity)
+
+Режимы (settings.TASKMANAGER_ACTIVITY_MODE):
+    "sync" - запись сразу, в той же транзакции, что и изменение задачи.
+             Используется в тестах и когда журнал должен быть согласован
+             с данными.
+    "buffered" - после коммита запись попадает в буфер процесса и
+             сохраняется пачкой bulk_create в конце запроса, при
+             накоплении TASKMANAGER_ACTIVITY_BATCH_SIZE записей или если с
+             прошлой записи прошло TASKMANAGER_ACTIVITY_FLUSH_INTERVAL секунд.
+             При аварийном завершении процесса несохраненный буфер теряется.
+             Записи, накопленные для другой базы (тестовой, уже удаленной),
+             при записи пачки отбрасываются.
+"""
+
+logger = logging.getLogger(__name__)
+
+TRACKED_TASK_FIELDS = [
+    "title",
+    "description",
+    "priority",
+    "due_date",
+    "estimated_hours",
+    "actual_hours",
+    "status_id",
+    "project_id",
+]
+
+_actor = contextvars.ContextVar("taskmanager_activity_actor", default=None)
+
+
+def get_mode():
+    return getattr(settings, "TASKMANAGER_ACTIVITY_MODE", "buffered")
+
+
+def set_actor(user):
+    """Пользователь, от имени которого пишутся записи (см. ActivityActorMiddleware)"""
+    # request.user ленивый - пользователь загрузится только при первой записи
+    return _actor.set(user)
+
+
+def reset_actor(token):
+    _actor.reset(token)
+
+
+def get_actor_id(task=None):
+    actor = _actor.get()
+    if actor is not None and actor.is_authenticated:
+        return actor.pk
+    # Вне запроса (команды, фоновые задачи) изменение приписывается автору задачи
+    return task.creator_id if task is not None else None
+
+
+def serialize_value(value):
+    if isinstance(value, datetime.datetime | datetime.date):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return duration_iso_string(value)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def task_values(task):
+    return {field: serialize_value(getattr(task, field)) for field in TRACKED_TASK_FIELDS}
+
+
+def diff_values(old, new):
+    """Пара словарей (old_values, new_values) только с изменившимися полями"""
+    changed = [field for field in new if old.get(field) != new[field]]
+    return (
+        {field: old.get(field) for field in changed},
+        {field: new[field] for field in changed},
+    )
+
+
+def _database_name():
+    return connection.settings_dict["NAME"]
+
+
+class ActivityBuffer:
+    """Потокобезопасный буфер записей журнала с пакетной записью"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []
+        self._database = None
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry):
+        with self._lock:
+            if not self._entries:
+                self._database = _database_name()
+            self._entries.append(entry)
+            should_flush = len(self._entries) >= getattr(
+                settings, "TASKMANAGER_ACTIVITY_BATCH_SIZE", 100
+            ) or time.monotonic() - self._last_flush >= getattr(
+                settings, "TASKMANAGER_ACTIVITY_FLUSH_INTERVAL", 5
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            entries, self._entries = self._entries, []
+            database = self._database
+            self._last_flush = time.monotonic()
+        if not entries:
+            return 0
+        if database != _database_name():
+            # Тестовая база удалена, а соединение снова смотрит в рабочую
+            logger.warning(
+                "Dropped %d activity entries recorded for database %s",
+                len(entries),
+                database,
+            )
+            return 0
+
+        # Сбой записи журнала (в том числе на закрытом соединении при выходе
+        # процесса) не должен ронять запрос или процесс
+        try:
+            # Задача могла быть удалена до записи пачки
+            existing = self._existing_task_ids(entries)
+            entries = [entry for entry in entries if entry.task_id in existing]
+            try:
+                with transaction.atomic():
+                    Activity.objects.bulk_create(entries)
+            except IntegrityError:
+                # Задачу удалили между проверкой и вставкой: пишем по одной,
+                # чтобы не потерять записи остальных задач
+                return self._write_each(entries)
+        except Exception:
+            logger.exception("Failed to write %d activity entries", len(entries))
+            return 0
+        return len(entries)
+
+    def clear(self):
+        """Отбросить накопленные записи (при удалении тестовой базы)"""
+        with self._lock:
+            self._entries = []
+
+    def _existing_task_ids(self, entries):
+        return set(
+            Task.objects.filter(
+                pk__in={entry.task_id for entry in entries}
+            ).values_list("pk", flat=True)
+        )
+
+    def _write_each(self, entries):
+        written = 0
+        for entry in entries:
+            # id, выданный откаченной вставке пачки
+            entry.pk = None
+            try:
+                with transaction.atomic():
+                    Activity.objects.bulk_create([entry])
+            except IntegrityError:
+                continue
+            written += 1
+        return written
+
+
+buffer = ActivityBuffer()
+atexit.register(buffer.flush)
+
+
+def record(task, action_type, old_values=None, new_values=None, user_id=None):
+    """Записать изменение задачи согласно режиму журнала"""
+    user_id = user_id or get_actor_id(task)
+    if user_id is None:
+        return
+    entry = Activity(
+        task_id=task.pk,
+        user_id=user_id,
+        action_type=action_type,
+        old_values=old_values,
+        new_values=new_values,
+    )
+    # Очередь уведомлений пишется в транзакции изменения независимо от режима журнала
+    notifications.enqueue([entry])
+
+    if get_mode() == "sync":
+        entry.save()
+    else:
+        # Откаченные изменения в журнал не попадают
+        transaction.on_commit(lambda: buffer.add(entry))
+
+
+def record_bulk(entries):
+    """Записать готовые Activity одной вставкой (массовые операции)"""
+    entries = [entry for entry in entries if entry.user_id is not None]
+    notifications.enqueue(entries)
+    if get_mode() == "sync":
+        Activity.objects.bulk_create(entries)
+    else:
+        def enqueue():
+            for entry in entries:
+                buffer.add(entry)
+
+        transaction.on_commit(enqueue)
+
+
+def flush_buffer(**kwargs):
+    """Обработчик request_finished: сбросить буфер в конце запроса"""
+    buffer.flush()
+
+
+class ActivityActorMiddleware:
+    """Запоминает пользователя запроса как автора записей журнала"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = set_actor(getattr(request, "user", None))
+        try:
+            return self.get_response(request)
+        finally:
+            reset_actor(token)
@@ -7,9 +7,11 @@ from .models import (
     Assignee,
     Comment,
     Attachment,
+    Blob,
     Activity,
     ProjectLabel,
     TaskLabel,
+    ProjectSummary,
 )
 
 # Register your models here.
@@ -21,6 +23,8 @@ admin.site.register(Task)
 admin.site.register(Assignee)
 admin.site.register(Comment)
 admin.site.register(Attachment)
+admin.site.register(Blob)
 admin.site.register(Activity)
 admin.site.register(ProjectLabel)
-admin.site.register(TaskLabel)
\ No newline at end of file
+admin.site.register(TaskLabel)
+admin.site.register(ProjectSummary)
\ No newline at end of file
@@ -0,0 +1,388 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.http import Http404, JsonResponse
+from django.views import View
+
+from .conditional import ConditionalGetMixin
+from .models import (
+    Activity,
+    Assignee,
+    Comment,
+    Project,
+    ProjectLabel,
+    ProjectMember,
+    Status,
+    Task,
+    TaskLabel,
+)
+from .pagination import KeysetPaginationMixin
+from .permissions import ProjectRoleMixin, get_project_roles
+
+"""
+JSON API только для чтения, версия 1 (/api/v1/)
+
+Ответы строятся из строк .values() без создания объектов моделей. Связанные
+данные (?include=) догружаются одним запросом на связь для всей страницы,
+списки листаются курсором (KeysetPaginator).
+
+Параметры:
+    ?fields=id,title           - только перечисленные поля
+    ?include=assignees,labels  - связанные объекты
+    ?cursor=...&page_size=50   - страница списка
+"""
+
+User = get_user_model()
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# Наибольшее значение bigint: большее число база отвергла бы ошибкой
+MAX_ID = 2**63 - 1
+
+
+def parse_id(name, value):
+    if not (value.isascii() and value.isdigit()) or int(value) > MAX_ID:
+        raise ApiError(f"'{name}' must be an id")
+    return int(value)
+
+
+class Include:
+    """Связь ресурса, загружаемая одной выборкой для всех строк страницы
+
+    source - ключ строки ресурса со значением для связи, target - поле
+    связанной модели, по которому идет отбор. many=False - объект вместо списка.
+    """
+
+    def __init__(self, model, source, target, fields, ordering=("id",), many=True):
+        self.model = model
+        self.source = source
+        self.target = target
+        self.fields = fields
+        self.ordering = ordering
+        self.many = many
+
+    def load(self, rows):
+        keys = {row[self.source] for row in rows if row[self.source] is not None}
+        related = defaultdict(list)
+        if keys:
+            queryset = (
+                self.model.objects.filter(**{f"{self.target}__in": keys})
+                .order_by(*self.ordering)
+                .values(*dict.fromkeys([self.target, *self.fields.values()]))
+            )
+            for item in queryset:
+                related[item[self.target]].append(
+                    {name: item[path] for name, path in self.fields.items()}
+                )
+
+        for row in rows:
+            items = related.get(row[self.source], [])
+            yield items if self.many else (items[0] if items else None)
+
+
+USER_FIELDS = {"id": "id", "username": "username"}
+
+
+class Resource:
+    """Описание ресурса API
+
+    fields - публичное имя поля -> путь для .values(), ordering - сортировка
+    курсора (последнее поле уникально), filters - параметр запроса -> поле.
+    project_prefix - путь от модели к проекту для проверки доступа.
+    """
+
+    model = None
+    fields = {}
+    ordering = ["-id"]
+    includes = {}
+    filters = {}
+    required_filters = []
+    project_prefix = "project__"
+
+    def __init__(self, request):
+        self.request = request
+
+    def get_queryset(self):
+        project_ids = list(get_project_roles(self.request))
+        return self.model.objects.filter(**{f"{self.project_prefix}id__in": project_ids})
+
+    def filter_queryset(self, queryset, params):
+        for name in self.required_filters:
+            if name not in params:
+                raise ApiError(f"'{name}' parameter is required")
+        for name, lookup in self.filters.items():
+            value = params.get(name)
+            if value is None:
+                continue
+            if value == "none":
+                queryset = queryset.filter(**{f"{lookup}__isnull": True})
+            else:
+                queryset = queryset.filter(**{lookup: parse_id(name, value)})
+        return queryset
+
+    def parse_fields(self, value):
+        if not value:
+            return list(self.fields)
+        names = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+        return names
+
+    def parse_includes(self, value):
+        if not value:
+            return []
+        names = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = [name for name in names if name not in self.includes]
+        if unknown:
+            raise ApiError(f"Unknown includes: {', '.join(unknown)}")
+        return names
+
+    def select(self, queryset, fields, includes):
+        """values() с запрошенными полями и служебными: курсор и ключи связей"""
+        paths = [self.fields[name] for name in fields]
+        paths += [name.lstrip("-") for name in self.ordering]
+        paths += [self.includes[name].source for name in includes]
+        return queryset.values(*dict.fromkeys(paths))
+
+    def serialize(self, rows, fields, includes):
+        data = [{name: row[self.fields[name]] for name in fields} for row in rows]
+        for name in includes:
+            for item, related in zip(data, self.includes[name].load(rows)):
+                item[name] = related
+        return data
+
+
+class ProjectResource(Resource):
+    model = Project
+    fields = {
+        "id": "id",
+        "name": "name",
+        "description": "description",
+        "created_at": "created_at",
+        "updated_at": "updated_at",
+        "owner": "summary__owner_id",
+        "task_count": "summary__task_count",
+        "open_task_count": "summary__open_task_count",
+        "overdue_task_count": "summary__overdue_task_count",
+        "status_counts": "summary__status_counts",
+    }
+    ordering = ["-created_at", "-id"]
+    includes = {
+        "members": Include(
+            ProjectMember,
+            "id",
+            "project_id",
+            {
+                "user": "user_id",
+                "username": "user__username",
+                "role": "role",
+                "joined_at": "joined_at",
+            },
+            ordering=("joined_at", "id"),
+        ),
+        "statuses": Include(
+            Status,
+            "id",
+            "project_id",
+            {"id": "id", "name": "name", "order": "order", "is_closed": "is_closed"},
+            ordering=("order", "id"),
+        ),
+        "labels": Include(
+            ProjectLabel,
+            "id",
+            "project_id",
+            {"id": "id", "name": "name", "color": "color"},
+            ordering=("name", "id"),
+        ),
+    }
+    project_prefix = ""
+
+
+class TaskResource(Resource):
+    model = Task
+    fields = {
+        "id": "id",
+        "project": "project_id",
+        "title": "title",
+        "description": "description",
+        "priority": "priority",
+        "due_date": "due_date",
+        "estimated_hours": "estimated_hours",
+        "actual_hours": "actual_hours",
+        "status": "status_id",
+        "task_order": "task_order",
+        "creator": "creator_id",
+        "created_at": "created_at",
+        "updated_at": "updated_at",
+    }
+    ordering = ["task_order", "-created_at", "id"]
+    filters = {"project": "project_id", "status": "status_id"}
+    includes = {
+        "status": Include(
+            Status,
+            "status_id",
+            "id",
+            {"id": "id", "name": "name", "is_closed": "is_closed"},
+            many=False,
+        ),
+        "assignees": Include(
+            Assignee,
+            "id",
+            "task_id",
+            {"user": "user_id", "username": "user__username", "role": "role"},
+        ),
+        "labels": Include(
+            TaskLabel,
+            "id",
+            "task_id",
+            {"id": "label_id", "name": "label__name", "color": "label__color"},
+        ),
+        "creator": Include(User, "creator_id", "id", USER_FIELDS, many=False),
+    }
+
+
+class CommentResource(Resource):
+    model = Comment
+    fields = {
+        "id": "id",
+        "task": "task_id",
+        "author": "author_id",
+        "content": "content",
+        "created_at": "created_at",
+        "updated_at": "updated_at",
+    }
+    ordering = ["-created_at", "-id"]
+    filters = {"task": "task_id"}
+    includes = {"author": Include(User, "author_id", "id", USER_FIELDS, many=False)}
+    project_prefix = "task__project__"
+
+
+class ActivityResource(Resource):
+    model = Activity
+    fields = {
+        "id": "id",
+        "task": "task_id",
+        "user": "user_id",
+        "action_type": "action_type",
+        "old_values": "old_values",
+        "new_values": "new_values",
+        "created_at": "created_at",
+    }
+    ordering = ["-created_at", "-id"]
+    filters = {"task": "task_id"}
+    # Без задачи запрос читал бы все секции журнала
+    required_filters = ["task"]
+    includes = {"user": Include(User, "user_id", "id", USER_FIELDS, many=False)}
+    project_prefix = "task__project__"
+
+    def filter_queryset(self, queryset, params):
+        queryset = super().filter_queryset(queryset, params)
+        # Записи не старше задачи: PostgreSQL пропускает более ранние секции
+        created_at = (
+            Task.objects.filter(pk=parse_id("task", params["task"]))
+            .values_list("created_at", flat=True)
+            .first()
+        )
+        if created_at is None:
+            raise ApiError("Task not found", status=404)
+        return queryset.filter(created_at__gte=created_at)
+
+
+class LabelResource(Resource):
+    model = ProjectLabel
+    fields = {
+        "id": "id",
+        "project": "project_id",
+        "name": "name",
+        "color": "color",
+        "created_at": "created_at",
+    }
+    ordering = ["name", "id"]
+    filters = {"project": "project_id"}
+
+
+class ApiMixin:
+    """JSON-ответы вместо редиректа на вход и HTML-страниц ошибок"""
+
+    resource_class = None
+    http_method_names = ["get", "head", "options"]
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({"error": str(error)}, status=error.status)
+        except Http404 as error:
+            return JsonResponse({"error": str(error) or "Not found"}, status=404)
+
+    def get_resource(self):
+        return self.resource_class(self.request)
+
+
+class ResourceListView(ApiMixin, KeysetPaginationMixin, View):
+    """Список ресурса: {"data": [...], "next_cursor": ...}"""
+
+    # Сессия, пользователь, роли, страница и по запросу на каждый include
+    query_budget = 8
+    replica_reads = True
+
+    def get_keyset_ordering(self):
+        return self.resource_class.ordering
+
+    def get(self, request, *args, **kwargs):
+        resource = self.get_resource()
+        fields = resource.parse_fields(request.GET.get("fields"))
+        includes = resource.parse_includes(request.GET.get("include"))
+        queryset = resource.filter_queryset(resource.get_queryset(), request.GET)
+
+        _, page, rows, _ = self.paginate_queryset(
+            resource.select(queryset, fields, includes), self.get_paginate_by(queryset)
+        )
+        return JsonResponse(
+            {
+                "data": resource.serialize(rows, fields, includes),
+                "next_cursor": page.next_cursor,
+            }
+        )
+
+
+class ResourceDetailView(ApiMixin, ConditionalGetMixin, ProjectRoleMixin, View):
+    """Один объект: {"data": {...}} с ETag/Last-Modified по сводке проекта"""
+
+    query_budget = 5
+    replica_reads = True
+
+    def get_validators(self):
+        resource = self.resource_class
+        prefix = resource.project_prefix
+        row = (
+            resource.model.objects.filter(pk=self.kwargs["pk"])
+            .values_list(f"{prefix}id", f"{prefix}summary__updated_at")
+            .first()
+        )
+        if row is None or not self.has_project_role(row[0]):
+            raise Http404("Not found")
+        changed_at = row[1]
+        if changed_at is None:
+            # Сводки еще нет (rebuild_project_summaries): без валидаторов
+            return None
+        parts = [resource.__name__, self.kwargs["pk"], self.request.GET.urlencode()]
+        return [*parts, changed_at], changed_at
+
+    def get(self, request, pk):
+        resource = self.get_resource()
+        fields = resource.parse_fields(request.GET.get("fields"))
+        includes = resource.parse_includes(request.GET.get("include"))
+        queryset = resource.get_queryset().filter(pk=pk)
+        rows = list(resource.select(queryset, fields, includes))
+        if not rows:
+            raise Http404("Not found")
+        return JsonResponse({"data": resource.serialize(rows, fields, includes)[0]})
@@ -0,0 +1,480 @@
+import logging
+import mimetypes
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from PIL import Image, ImageOps
+
+from .models import Attachment, Blob, ProjectSummary, UploadSession
+from .storage import CHUNK_SIZE, blob_storage, hash_file
+
+"""
+Загрузка, хранение и выдача вложений
+
+Вложение ссылается на Blob - содержимое в хранилище по SHA-256 (storage.py),
+поэтому одинаковые файлы хранятся один раз. Загрузить файл можно обычной
+формой или по частям через UploadSession: части пишутся на диск потоком,
+прерванную загрузку можно продолжить с сохраненного смещения.
+
+Превью изображений строятся после коммита в пуле потоков
+(TASKMANAGER_THUMBNAIL_WORKERS, 0 - сразу в том же потоке), пропущенные
+достраивает команда generate_thumbnails или первый запрос превью.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Форматы, из которых строится превью и которые можно показывать в браузере
+IMAGE_TYPES = {
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/webp",
+    "image/bmp",
+    "image/tiff",
+}
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class UploadError(ValueError):
+    """Некорректная загрузка (размер, смещение, имя файла)"""
+
+    status = 400
+
+
+class UploadConflict(UploadError):
+    """Смещение части не совпадает с сохраненным или загрузка уже идет"""
+
+    status = 409
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+def guess_content_type(name, content_type=""):
+    return content_type or mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def add_attachment(task, user, name, content_type, temp_path, digest, size):
+    """Вложение из временного файла с уже посчитанным хэшем
+
+    Временный файл становится блоком или удаляется, если такой блок уже есть.
+    """
+    content_type = guess_content_type(name, content_type)
+    try:
+        with transaction.atomic():
+            # Блокировка строки не дает gc_attachments удалить блок, пока на
+            # него появляется новая ссылка
+            blob, created = Blob.objects.select_for_update().get_or_create(
+                sha256=digest,
+                defaults={
+                    "size": size,
+                    "thumbnail_status": (
+                        "pending" if content_type in IMAGE_TYPES else "none"
+                    ),
+                },
+            )
+            attachment = Attachment.objects.create(
+                task=task,
+                blob=blob,
+                name=os.path.basename(name)[:255],
+                content_type=content_type,
+                uploaded_by=user,
+            )
+            blob_storage.place(temp_path, digest)
+            if created and blob.thumbnail_status == "pending":
+                schedule_thumbnail(digest)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+    return attachment
+
+
+def store_uploaded_file(task, user, uploaded_file):
+    """Вложение из файла обычной формы (request.FILES)"""
+    temp_path, digest, size = blob_storage.ingest(uploaded_file)
+    return add_attachment(
+        task,
+        user,
+        uploaded_file.name,
+        uploaded_file.content_type,
+        temp_path,
+        digest,
+        size,
+    )
+
+
+def adopt_legacy_file(attachment):
+    """Перенести файл вложения, загруженного до хранилища по содержимому"""
+    with attachment.file.open("rb") as f:
+        temp_path, digest, size = blob_storage.write_temp(f.chunks(CHUNK_SIZE))
+    content_type = guess_content_type(attachment.name or attachment.file.name)
+    try:
+        with transaction.atomic():
+            blob, created = Blob.objects.select_for_update().get_or_create(
+                sha256=digest,
+                defaults={
+                    "size": size,
+                    "thumbnail_status": (
+                        "pending" if content_type in IMAGE_TYPES else "none"
+                    ),
+                },
+            )
+            # Сигнал reference_blob срабатывает только для новых вложений
+            Blob.objects.filter(pk=digest).update(
+                ref_count=F("ref_count") + 1, updated_at=timezone.now()
+            )
+            attachment.blob = blob
+            attachment.content_type = content_type
+            attachment.name = attachment.name or os.path.basename(attachment.file.name)
+            attachment.save(update_fields=["blob", "content_type", "name"])
+            blob_storage.place(temp_path, digest)
+            if created and blob.thumbnail_status == "pending":
+                schedule_thumbnail(digest)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+    return attachment
+
+
+def check_size(size):
+    max_size = settings.TASKMANAGER_UPLOAD_MAX_SIZE
+    if size > max_size:
+        raise UploadError(f"File is larger than {max_size} bytes")
+
+
+# Загрузка по частям
+
+
+def part_path(session):
+    return blob_storage.upload_path(f"{session.pk}.part")
+
+
+def start_upload(task, user, name, size, content_type=""):
+    if not isinstance(name, str) or not name.strip():
+        raise UploadError("name is required")
+    if isinstance(size, bool) or not isinstance(size, int) or size < 0:
+        raise UploadError("size must be a non-negative integer")
+    check_size(size)
+
+    session = UploadSession.objects.create(
+        task=task,
+        user=user,
+        name=os.path.basename(name.strip())[:255],
+        content_type=content_type if isinstance(content_type, str) else "",
+        size=size,
+    )
+    os.makedirs(os.path.dirname(part_path(session)), exist_ok=True)
+    open(part_path(session), "wb").close()
+    return session
+
+
+def append_chunk(session, offset, stream, length):
+    """Дописать часть длиной length из stream с позиции offset
+
+    Возвращает (сессия, вложение); вложение создается, когда получен весь
+    файл. Часть читается из запроса блоками и сразу пишется на диск.
+    """
+    if length > settings.TASKMANAGER_UPLOAD_CHUNK_MAX_SIZE:
+        raise UploadError(
+            f"Chunk is larger than {settings.TASKMANAGER_UPLOAD_CHUNK_MAX_SIZE} bytes"
+        )
+
+    with transaction.atomic():
+        try:
+            # Одна часть за раз: параллельная запись в тот же файл испортит его
+            session = UploadSession.objects.select_for_update(nowait=True).get(
+                pk=session.pk
+            )
+        except DatabaseError:
+            raise UploadConflict("Another chunk is being uploaded", session.offset)
+        if offset != session.offset:
+            raise UploadConflict(
+                f"Expected offset {session.offset}, got {offset}", session.offset
+            )
+        if offset + length > session.size:
+            raise UploadError("Chunk exceeds the declared file size")
+
+        with open(part_path(session), "r+b") as f:
+            # Хвост оборванной ранее части отбрасывается
+            f.truncate(offset)
+            f.seek(offset)
+            remaining = length
+            while remaining:
+                chunk = stream.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+
+        session.offset = offset + length - remaining
+        session.save(update_fields=["offset", "updated_at"])
+
+    if session.offset < session.size:
+        return session, None
+    return session, complete_upload(session)
+
+
+def complete_upload(session):
+    path = part_path(session)
+    digest, size = hash_file(path)
+    if size != session.size:
+        raise UploadError(f"Expected {session.size} bytes, received {size}")
+    attachment = add_attachment(
+        session.task,
+        session.user,
+        session.name,
+        session.content_type,
+        path,
+        digest,
+        size,
+    )
+    session.delete()
+    return attachment
+
+
+def abort_upload(session):
+    path = part_path(session)
+    session.delete()
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def cleanup_uploads(max_age):
+    """Удалить брошенные загрузки и временные файлы старше max_age"""
+    cutoff = timezone.now() - max_age
+    removed = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        abort_upload(session)
+        removed += 1
+
+    # Временные файлы оборванных обычных загрузок
+    directory = blob_storage.path("uploads")
+    active = {
+        f"{pk}.part" for pk in UploadSession.objects.values_list("pk", flat=True)
+    }
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            if entry.name in active or entry.stat().st_mtime > cutoff.timestamp():
+                continue
+            os.unlink(entry.path)
+            removed += 1
+    return removed
+
+
+def collect_garbage(grace):
+    """Удалить блоки без ссылок, не менявшиеся дольше grace, и их файлы"""
+    cutoff = timezone.now() - grace
+    with transaction.atomic():
+        digests = list(
+            Blob.objects.select_for_update(skip_locked=True)
+            .filter(ref_count=0, updated_at__lt=cutoff)
+            .exclude(Exists(Attachment.objects.filter(blob=OuterRef("pk"))))
+            .values_list("pk", flat=True)
+        )
+        Blob.objects.filter(pk__in=digests).delete()
+        # Строки заблокированы до коммита, новая ссылка на блок дождется удаления
+        for digest in digests:
+            blob_storage.delete_blob(digest)
+    return len(digests)
+
+
+# Превью изображений
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TASKMANAGER_THUMBNAIL_WORKERS,
+                thread_name_prefix="thumbnails",
+            )
+    return _executor
+
+
+def _generate_in_thread(digest):
+    try:
+        generate_thumbnail(digest)
+    except Exception:
+        logger.exception("Failed to generate thumbnail for blob %s", digest)
+    finally:
+        # У потока пула свое соединение с базой
+        connection.close()
+
+
+def schedule_thumbnail(digest):
+    """Построить превью после коммита текущей транзакции"""
+    if settings.TASKMANAGER_THUMBNAIL_WORKERS <= 0:
+        transaction.on_commit(lambda: generate_thumbnail(digest))
+    else:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_generate_in_thread, digest)
+        )
+
+
+def generate_thumbnail(digest):
+    """Построить превью блока и записать его статус; возвращает статус"""
+    size = settings.TASKMANAGER_THUMBNAIL_SIZE
+    target = blob_storage.path(blob_storage.thumbnail_name(digest))
+    temp_path = None
+    try:
+        with (
+            blob_storage.open(blob_storage.blob_name(digest)) as f,
+            Image.open(f) as image,
+        ):
+            # JPEG декодируется сразу в уменьшенном масштабе
+            image.draft("RGB", (size, size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or (
+                image.mode == "P" and "transparency" in image.info
+            )
+            image = image.convert("RGBA" if has_alpha else "RGB")
+            with blob_storage.temp_file(suffix=".webp") as out:
+                temp_path = out.name
+                image.save(out, "WEBP", quality=80)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+        status = "ready"
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        logger.warning("Cannot build thumbnail for blob %s: %s", digest, error)
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+        status = "failed"
+
+    Blob.objects.filter(pk=digest).update(thumbnail_status=status)
+    if status == "failed":
+        # Страницы задач перестают ссылаться на превью
+        ProjectSummary.objects.filter(
+            project__tasks__attachments__blob_id=digest
+        ).update(updated_at=timezone.now())
+    return status
+
+
+# Выдача файлов
+
+
+def parse_range(header, size):
+    """Диапазон (start, end) включительно из заголовка Range
+
+    None - заголовка нет, он некорректен или задает несколько диапазонов:
+    тогда отдается весь файл. ValueError - диапазон вне файла (416).
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500 - последние 500 байт
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def iter_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_attachment(request, attachment):
+    """Ответ с содержимым вложения: ETag по хэшу, 304, Range и If-Range"""
+    blob = attachment.blob
+    inline = attachment.content_type in IMAGE_TYPES
+    if blob is None:
+        # Вложение до хранилища по содержимому
+        return FileResponse(
+            attachment.file.open("rb"),
+            as_attachment=not inline,
+            filename=attachment.name or os.path.basename(attachment.file.name),
+        )
+
+    etag = quote_etag(blob.sha256)
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponse(status=304)
+    else:
+        path = blob_storage.path(blob_storage.blob_name(blob.sha256))
+        if_range = request.headers.get("If-Range")
+        try:
+            byte_range = (
+                parse_range(request.headers.get("Range"), blob.size)
+                if if_range is None or if_range == etag
+                else None
+            )
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{blob.size}"
+            return response
+
+        if byte_range is None:
+            response = FileResponse(
+                open(path, "rb"), content_type=attachment.content_type
+            )
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                iter_range(path, start, end),
+                status=206,
+                content_type=attachment.content_type,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{blob.size}"
+            response["Content-Length"] = end - start + 1
+        response["Content-Disposition"] = content_disposition_header(
+            not inline, attachment.name or blob.sha256
+        )
+
+    response["ETag"] = etag
+    response["Accept-Ranges"] = "bytes"
+    response["Last-Modified"] = http_date(attachment.created_at.timestamp())
+    # Содержимое вложения не меняется, но доступ к нему проверяется заново
+    patch_cache_control(response, private=True, max_age=3600)
+    return response
+
+
+def serve_thumbnail(request, attachment):
+    """Превью изображения; если фоновая задача еще не успела - строится сразу"""
+    blob = attachment.blob
+    if blob is None or blob.thumbnail_status in ("none", "failed"):
+        return None
+    if blob.thumbnail_status == "pending":
+        if generate_thumbnail(blob.sha256) != "ready":
+            return None
+
+    etag = quote_etag(f"{blob.sha256}-{settings.TASKMANAGER_THUMBNAIL_SIZE}")
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponse(status=304)
+    else:
+        response = FileResponse(
+            blob_storage.open(blob_storage.thumbnail_name(blob.sha256)),
+            content_type="image/webp",
+        )
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=86400)
+    return response
@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Prefetch, Q, Window
+from django.db.models.functions import RowNumber
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import replicas
+from .caching import fragment_metrics, get_project_version
+from .models import Assignee, Project, ProjectSummary, Task, TaskLabel
+from .pagination import KeysetPaginator
+
+"""
+Kanban-доска проекта
+
+Все карточки доски загружаются фиксированным числом запросов: первые
+limit задач каждой колонки одним запросом с ROW_NUMBER() по статусу,
+исполнители и метки - двумя prefetch-запросами. Отрисованные колонки
+кэшируются с ключом по версии проекта (см. caching.py).
+"""
+
+COLUMN_ORDERING = ["task_order", "-created_at", "id"]
+NO_STATUS = "none"
+
+
+def card_queryset():
+    return Task.objects.prefetch_related(
+        Prefetch("assignees", queryset=Assignee.objects.select_related("user")),
+        Prefetch("task_labels", queryset=TaskLabel.objects.select_related("label")),
+    )
+
+
+def column_key(status):
+    return str(status.pk) if status is not None else NO_STATUS
+
+
+class Column:
+    def __init__(self, project, status, count):
+        self.project = project
+        self.status = status
+        self.key = column_key(status)
+        self.count = count
+        self.tasks = []
+        self.next_cursor = None
+
+    @property
+    def status_id(self):
+        return self.status.pk if self.status is not None else None
+
+    @property
+    def name(self):
+        return self.status.name if self.status is not None else "Без статуса"
+
+
+def get_columns(project):
+    """Колонки доски; количество задач берется из сводки проекта без агрегаций"""
+    try:
+        counts = project.summary.status_counts
+    except ProjectSummary.DoesNotExist:
+        counts = ProjectSummary.rebuild(project.pk).status_counts
+
+    columns = [
+        Column(project, status, counts.get(column_key(status), 0))
+        for status in project.statuses.all()
+    ]
+    if counts.get(NO_STATUS):
+        columns.append(Column(project, None, counts[NO_STATUS]))
+    return columns
+
+
+def fill_columns(project, columns, limit):
+    """Первые limit карточек каждой колонки одним запросом"""
+    if not columns:
+        return
+
+    status_filter = Q(status_id__in=[c.status_id for c in columns if c.status])
+    if any(column.status is None for column in columns):
+        status_filter |= Q(status__isnull=True)
+
+    tasks = (
+        card_queryset()
+        .filter(status_filter, project=project)
+        .annotate(
+            column_position=Window(
+                RowNumber(),
+                partition_by=[F("status_id")],
+                order_by=[F("task_order").asc(), F("created_at").desc(), F("id").asc()],
+            )
+        )
+        .filter(column_position__lte=limit + 1)
+        .order_by("status_id", "column_position")
+    )
+
+    by_key = {column.key: column for column in columns}
+    for task in tasks:
+        by_key[str(task.status_id) if task.status_id else NO_STATUS].tasks.append(task)
+
+    # Лишняя (limit + 1) карточка означает, что в колонке есть еще задачи
+    paginator = KeysetPaginator(Task.objects.all(), COLUMN_ORDERING, limit)
+    for column in columns:
+        if len(column.tasks) > limit:
+            column.tasks = column.tasks[:limit]
+            column.next_cursor = paginator.encode_cursor(column.tasks[-1])
+
+
+def load_more(column, cursor, limit):
+    """Следующая страница карточек колонки после cursor"""
+    page = KeysetPaginator(
+        card_queryset().filter(project=column.project, status_id=column.status_id),
+        COLUMN_ORDERING,
+        limit,
+    ).page(cursor)
+    column.tasks = page.object_list
+    column.next_cursor = page.next_cursor
+    return column
+
+
+def _fragment_key(project_id, version, key, limit):
+    return f"taskmanager:board:{project_id}:{version}:{key}:{limit}"
+
+
+def render_columns(project, limit):
+    """HTML колонок доски; запросы к задачам только для колонок не из кэша
+
+    Фрагменты не зависят от пользователя, поэтому рендерятся без request.
+    """
+    columns = get_columns(project)
+    version = get_project_version(project.pk)
+    keys = {
+        column.key: _fragment_key(project.pk, version, column.key, limit)
+        for column in columns
+    }
+    cached = cache.get_many(keys.values())
+
+    for column in columns:
+        fragment_metrics.record("board_column", hit=keys[column.key] in cached)
+    missing = [column for column in columns if keys[column.key] not in cached]
+    if missing and replicas.used_replica():
+        # Колонки для кэша - по основной базе: статусы и счетчики с реплики
+        # могут отставать от версии проекта в ключе
+        with replicas.primary_reads():
+            project = (
+                Project.objects.select_related("summary")
+                .prefetch_related("statuses")
+                .get(pk=project.pk)
+            )
+            columns = get_columns(project)
+        keys = {
+            column.key: _fragment_key(project.pk, version, column.key, limit)
+            for column in columns
+        }
+        missing = [column for column in columns if keys[column.key] not in cached]
+    with replicas.primary_reads():
+        fill_columns(project, missing, limit)
+
+    rendered = {}
+    for column in missing:
+        html = render_to_string(
+            "taskmanager/includes/board_column.html",
+            {"column": column, "project": project, "limit": limit},
+        )
+        rendered[keys[column.key]] = html
+    if rendered:
+        cache.set_many(
+            rendered, getattr(settings, "TASKMANAGER_FRAGMENT_CACHE_TIMEOUT", 600)
+        )
+
+    fragments = {**cached, **rendered}
+    return [mark_safe(fragments[keys[column.key]]) for column in columns]
@@ -0,0 +1,476 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import activity, realtime
+from .caching import bump_project_version, bump_user_version
+from .models import (
+    Activity,
+    Assignee,
+    ProjectLabel,
+    ProjectSummary,
+    Status,
+    Task,
+    TaskLabel,
+)
+
+"""
+Массовое изменение задач проекта одним запросом
+
+Операции (список в поле "operations"):
+    {"op": "create", "fields": {...}, "assignees": [{"user": id, "role": ...}],
+     "labels": [id, ...]}
+    {"op": "update", "id": id, "fields": {...}}
+    {"op": "assign", "task": id, "user": id, "role": "reviewer"}
+    {"op": "unassign", "task": id, "user": id}
+    {"op": "label", "task": id, "label": id}
+    {"op": "unlabel", "task": id, "label": id}
+
+Сначала проверяются все операции (поля модели и Task.clean), и только если
+ошибок нет, изменения записываются в одной транзакции через bulk_create,
+bulk_update и удаление без сигналов. Сводка, версии кэша, журнал и доска в
+реальном времени обновляются один раз на всю пачку.
+"""
+
+TASK_FIELDS = [
+    "title",
+    "description",
+    "priority",
+    "due_date",
+    "estimated_hours",
+    "actual_hours",
+    "status",
+    "task_order",
+]
+# Поля, которые задает сервер, а не клиент
+EXCLUDED_FIELDS = ["project", "creator", "status", "search_vector"]
+
+ASSIGNEE_ROLES = {role for role, _ in Assignee.ROLES}
+BULK_BATCH_SIZE = 1000
+
+
+class BulkError(ValueError):
+    """Запрос нельзя обработать целиком (не список, слишком много операций)"""
+
+
+class OperationError(Exception):
+    """Ошибка одной операции: словарь {поле: [сообщения]}"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors if isinstance(errors, dict) else {"__all__": [errors]}
+
+
+def _get_id(operation, name):
+    value = operation.get(name)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise OperationError({name: ["Must be an id"]})
+    return value
+
+
+class BatchResult:
+    def __init__(self, count):
+        self.results = [{"index": index, "status": "ok"} for index in range(count)]
+        self.applied = False
+
+    @property
+    def has_errors(self):
+        return any(result["status"] == "error" for result in self.results)
+
+    def add_error(self, index, errors):
+        self.results[index] = {"index": index, "status": "error", "errors": errors}
+
+    def as_dict(self):
+        return {"applied": self.applied, "results": self.results}
+
+
+class TaskBatch:
+    """Проверка и выполнение операций над задачами одного проекта
+
+    Задачи, исполнители и метки загружаются по запросу на модель для всей
+    пачки; операции меняют их состояние в памяти, запись идет в конце.
+    Ключ задачи - ("task", pk) для существующих и ("new", индекс) для новых.
+    """
+
+    operations = ["create", "update", "assign", "unassign", "label", "unlabel"]
+
+    def __init__(self, project, user):
+        self.project = project
+        self.user = user
+        self.max_operations = getattr(settings, "TASKMANAGER_BULK_MAX_OPERATIONS", 1000)
+
+    def run(self, operations):
+        if not isinstance(operations, list):
+            raise BulkError("operations must be a list")
+        if len(operations) > self.max_operations:
+            raise BulkError(f"At most {self.max_operations} operations are allowed")
+
+        result = BatchResult(len(operations))
+        with transaction.atomic():
+            self._load(operations)
+            for index, operation in enumerate(operations):
+                try:
+                    if not isinstance(operation, dict):
+                        raise OperationError("Operation must be an object")
+                    if operation.get("op") not in self.operations:
+                        raise OperationError(
+                            {"op": [f"Unknown operation: {operation.get('op')}"]}
+                        )
+                    key = getattr(self, f"_{operation['op']}")(index, operation)
+                    result.results[index]["key"] = key
+                except OperationError as error:
+                    result.add_error(index, error.errors)
+
+            if not result.has_errors:
+                self._save()
+                result.applied = True
+
+        for item in result.results:
+            key = item.pop("key", None)
+            if key is not None and result.applied:
+                item["id"] = self.tasks[key].pk
+        return result
+
+    def _load(self, operations):
+        task_ids, user_ids, label_ids = set(), set(), set()
+        for operation in operations:
+            if not isinstance(operation, dict):
+                continue
+            references = [
+                ("id", task_ids),
+                ("task", task_ids),
+                ("user", user_ids),
+                ("label", label_ids),
+            ]
+            for name, ids in references:
+                if isinstance(operation.get(name), int):
+                    ids.add(operation[name])
+            for item in operation.get("assignees") or []:
+                if isinstance(item, dict) and isinstance(item.get("user"), int):
+                    user_ids.add(item["user"])
+            for label_id in operation.get("labels") or []:
+                if isinstance(label_id, int):
+                    label_ids.add(label_id)
+
+        self.tasks = {
+            ("task", task.pk): task
+            for task in Task.objects.select_for_update().filter(
+                pk__in=task_ids, project=self.project
+            )
+        }
+        self.previous = {
+            key: {**activity.task_values(task), "task_order": task.task_order}
+            for key, task in self.tasks.items()
+        }
+        self.realtime_previous = {
+            key: {name: getattr(task, name) for name in realtime.TASK_FIELDS}
+            for key, task in self.tasks.items()
+        }
+        self.changed_fields = {}
+        self.created = []
+
+        self.statuses = set(
+            Status.objects.filter(project=self.project).values_list("pk", flat=True)
+        )
+        self.labels = set(
+            ProjectLabel.objects.filter(
+                project=self.project, pk__in=label_ids
+            ).values_list("pk", flat=True)
+        )
+        # Назначать можно только участников проекта
+        self.users = dict(
+            get_user_model()
+            .objects.filter(pk__in=user_ids, projectmember__project=self.project)
+            .values_list("pk", "username")
+        )
+        self.members = set(self.users)
+
+        self.initial_assignees = {key: {} for key in self.tasks}
+        for row in (
+            Assignee.objects.filter(task_id__in=task_ids)
+            .order_by("id")
+            .values("id", "task_id", "user_id", "role", "user__username")
+        ):
+            key = ("task", row["task_id"])
+            if key in self.initial_assignees:
+                # Имена нужны для состава исполнителей на доске
+                self.users.setdefault(row["user_id"], row["user__username"])
+                self.initial_assignees[key][row["user_id"]] = Assignee(
+                    id=row["id"],
+                    task_id=row["task_id"],
+                    user_id=row["user_id"],
+                    role=row["role"],
+                )
+        self.assignees = {
+            key: {user_id: item.role for user_id, item in items.items()}
+            for key, items in self.initial_assignees.items()
+        }
+
+        self.initial_labels = {key: {} for key in self.tasks}
+        for task_label in TaskLabel.objects.filter(task_id__in=task_ids):
+            key = ("task", task_label.task_id)
+            if key in self.initial_labels:
+                self.initial_labels[key][task_label.label_id] = task_label
+        self.task_labels = {
+            key: set(items) for key, items in self.initial_labels.items()
+        }
+
+    def _get_task_key(self, operation, name):
+        key = ("task", _get_id(operation, name))
+        if key not in self.tasks:
+            raise OperationError({name: [f"Task {key[1]} not found in the project"]})
+        return key
+
+    def _get_user_id(self, operation):
+        user_id = _get_id(operation, "user")
+        if user_id not in self.members:
+            raise OperationError(
+                {"user": [f"User {user_id} is not a member of the project"]}
+            )
+        return user_id
+
+    def _get_label_id(self, operation):
+        label_id = _get_id(operation, "label")
+        if label_id not in self.labels:
+            raise OperationError(
+                {"label": [f"Label {label_id} does not belong to the project"]}
+            )
+        return label_id
+
+    def _set_fields(self, task, fields, validate_dates):
+        """Присвоить и проверить поля; Task.clean - только при смене срока"""
+        if not isinstance(fields, dict):
+            raise OperationError({"fields": ["Must be an object"]})
+        unknown = sorted(set(fields) - set(TASK_FIELDS))
+        if unknown:
+            raise OperationError({"fields": [f"Unknown fields: {', '.join(unknown)}"]})
+
+        for name, value in fields.items():
+            if name == "status":
+                if value is not None and value not in self.statuses:
+                    raise OperationError(
+                        {"status": [f"Status {value} does not belong to the project"]}
+                    )
+                task.status_id = value
+            else:
+                setattr(task, name, value)
+
+        errors = {}
+        try:
+            task.clean_fields(exclude=EXCLUDED_FIELDS)
+        except ValidationError as error:
+            errors.update(error.message_dict)
+        if task.due_date is not None and timezone.is_naive(task.due_date):
+            task.due_date = timezone.make_aware(task.due_date)
+        # Задачу с уже прошедшим сроком можно менять, не трогая срок
+        if not errors and (validate_dates or "due_date" in fields):
+            try:
+                task.clean()
+            except ValidationError as error:
+                errors.update(error.message_dict)
+        if errors:
+            raise OperationError(errors)
+
+    def _create(self, index, operation):
+        key = ("new", index)
+        task = Task(project=self.project, creator=self.user)
+        self._set_fields(task, operation.get("fields"), validate_dates=True)
+
+        assignees = {}
+        for item in operation.get("assignees") or []:
+            if not isinstance(item, dict):
+                raise OperationError({"assignees": ["Must be a list of objects"]})
+            role = item.get("role", "assignee")
+            if role not in ASSIGNEE_ROLES:
+                raise OperationError({"assignees": [f"Invalid role: {role}"]})
+            assignees[self._get_user_id(item)] = role
+
+        labels = set()
+        for label_id in operation.get("labels") or []:
+            labels.add(self._get_label_id({"label": label_id}))
+
+        self.tasks[key] = task
+        self.created.append(key)
+        self.initial_assignees[key], self.assignees[key] = {}, assignees
+        self.initial_labels[key], self.task_labels[key] = {}, labels
+        return key
+
+    def _update(self, index, operation):
+        key = self._get_task_key(operation, "id")
+        fields = operation.get("fields")
+        self._set_fields(self.tasks[key], fields, validate_dates=False)
+        self.changed_fields.setdefault(key, set()).update(fields)
+        return key
+
+    def _assign(self, index, operation):
+        key = self._get_task_key(operation, "task")
+        user_id = self._get_user_id(operation)
+        role = operation.get("role", "assignee")
+        if role not in ASSIGNEE_ROLES:
+            raise OperationError({"role": [f"Invalid role: {role}"]})
+        self.assignees[key][user_id] = role
+        return key
+
+    def _unassign(self, index, operation):
+        key = self._get_task_key(operation, "task")
+        # Снять можно и исполнителя, который уже вышел из проекта
+        user_id = _get_id(operation, "user")
+        if self.assignees[key].pop(user_id, None) is None:
+            raise OperationError(
+                {"user": [f"User {user_id} is not assigned to the task"]}
+            )
+        return key
+
+    def _label(self, index, operation):
+        key = self._get_task_key(operation, "task")
+        self.task_labels[key].add(self._get_label_id(operation))
+        return key
+
+    def _unlabel(self, index, operation):
+        key = self._get_task_key(operation, "task")
+        label_id = _get_id(operation, "label")
+        if label_id not in self.task_labels[key]:
+            raise OperationError(
+                {"label": [f"Label {label_id} is not set on the task"]}
+            )
+        self.task_labels[key].discard(label_id)
+        return key
+
+    def _save(self):
+        actor_id = self.user.pk
+        entries, changes = [], []
+        now = timezone.now()
+
+        created = [self.tasks[key] for key in self.created]
+        Task.objects.bulk_create(created, batch_size=BULK_BATCH_SIZE)
+        for task in created:
+            entries.append(
+                Activity(
+                    task_id=task.pk,
+                    user_id=actor_id,
+                    action_type="created",
+                    new_values=activity.task_values(task),
+                )
+            )
+            changes.append(realtime.task_created(task))
+
+        updated, update_fields = [], {"updated_at"}
+        for key, names in self.changed_fields.items():
+            task = self.tasks[key]
+            old_values, new_values = activity.diff_values(
+                self.previous[key], activity.task_values(task)
+            )
+            if new_values or task.task_order != self.previous[key]["task_order"]:
+                task.updated_at = now
+                updated.append(task)
+                update_fields.update(names)
+            if new_values:
+                action_type = (
+                    "status_changed" if "status_id" in new_values else "updated"
+                )
+                entries.append(
+                    Activity(
+                        task_id=task.pk,
+                        user_id=actor_id,
+                        action_type=action_type,
+                        old_values=old_values,
+                        new_values=new_values,
+                    )
+                )
+            changes.append(realtime.task_changed(task, self.realtime_previous[key]))
+        # bulk_update не вызывает сигналы - сводка и журнал обновляются ниже
+        Task.objects.bulk_update(
+            updated, sorted(update_fields), batch_size=BULK_BATCH_SIZE
+        )
+
+        entries += self._save_assignees(actor_id, changes)
+        self._save_labels()
+
+        activity.record_bulk(entries)
+        if created or updated:
+            ProjectSummary.rebuild(self.project.pk)
+        bump_project_version(self.project.pk)
+        realtime.publish(self.project.pk, *changes)
+
+    def _save_assignees(self, actor_id, changes):
+        new, changed, removed, entries, users = [], [], [], [], set()
+        for key, roles in self.assignees.items():
+            task, initial = self.tasks[key], self.initial_assignees[key]
+            affected = {
+                user_id
+                for user_id in roles.keys() | initial.keys()
+                if roles.get(user_id) != getattr(initial.get(user_id), "role", None)
+            }
+            if not affected:
+                continue
+            users |= affected
+
+            for user_id in affected:
+                old_values = new_values = None
+                if user_id in initial:
+                    assignee = initial[user_id]
+                    old_values = {"user_id": user_id, "role": assignee.role}
+                    if user_id in roles:
+                        assignee.role = roles[user_id]
+                        changed.append(assignee)
+                    else:
+                        removed.append(assignee.pk)
+                else:
+                    new.append(
+                        Assignee(task=task, user_id=user_id, role=roles[user_id])
+                    )
+                if user_id in roles:
+                    new_values = {"user_id": user_id, "role": roles[user_id]}
+                entries.append((task, old_values, new_values))
+            changes.append(
+                realtime.assignees_changed(
+                    task.pk, [self.users[user_id] for user_id in roles]
+                )
+            )
+
+        Assignee.objects.bulk_create(new, batch_size=BULK_BATCH_SIZE)
+        Assignee.objects.bulk_update(changed, ["role"], batch_size=BULK_BATCH_SIZE)
+        if removed:
+            # Удаление без сигналов: журнал, версии и доска обновляются пачкой.
+            # QuerySet.delete() выбрал бы строки и на каждую вызвал post_delete:
+            # второе "unassigned" в журнале, версии кэша и событие доски по
+            # каждой строке. _raw_delete - один DELETE; каскадов нет, на
+            # Assignee и TaskLabel никто не ссылается
+            queryset = Assignee.objects.filter(pk__in=removed)
+            queryset._raw_delete(queryset.db)
+
+        for user_id in users:
+            bump_user_version(user_id)
+        return [
+            Activity(
+                task_id=task.pk,
+                user_id=actor_id,
+                action_type="assigned",
+                old_values=old_values,
+                new_values=new_values,
+            )
+            for task, old_values, new_values in entries
+        ]
+
+    def _save_labels(self):
+        new, removed = [], []
+        for key, label_ids in self.task_labels.items():
+            task, initial = self.tasks[key], self.initial_labels[key]
+            new += [
+                TaskLabel(task=task, label_id=label_id)
+                for label_id in label_ids
+                if label_id not in initial
+            ]
+            removed += [
+                item.pk
+                for label_id, item in initial.items()
+                if label_id not in label_ids
+            ]
+
+        TaskLabel.objects.bulk_create(new, batch_size=BULK_BATCH_SIZE)
+        if removed:
+            # Без сигналов, как у исполнителей выше
+            queryset = TaskLabel.objects.filter(pk__in=removed)
+            queryset._raw_delete(queryset.db)
@@ -0,0 +1,127 @@
+import atexit
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .instrumentation import SharedCounters, record_cache
+from .models import ProjectSummary
+
+"""
+Версии для инвалидации кэша
+
+Вместо удаления записей ключ кэша включает номер версии. Изменение данных
+увеличивает версию, старые записи перестают читаться и вытесняются по таймауту.
+
+Версия проекта увеличивается при изменении проекта, его участников, задач,
+статусов и меток, версия пользователя - при изменении его членства в
+проектах и назначений (см. signals.py). Из версий строятся ключи
+кэша фрагментов шаблонов (тег {% cachefragment %}).
+"""
+
+PROJECT_VERSION_KEY = "taskmanager:project:version:{project_id}"
+USER_VERSION_KEY = "taskmanager:user:version:{user_id}"
+FRAGMENT_KEY = "taskmanager:fragment:{name}:{digest}"
+
+
+def _new_version():
+    # Версия от времени, чтобы после вытеснения ключа не вернуться к старой
+    return time.time_ns()
+
+
+def get_version(key):
+    return cache.get_or_set(key, _new_version, None)
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Версии нет в кэше (вытеснена или еще не создавалась)
+        cache.set(key, _new_version(), None)
+
+
+def get_versions(keys):
+    """Версии нескольких ключей одним обращением к кэшу"""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = get_version(key)
+    return versions
+
+
+def get_project_version(project_id):
+    return get_version(PROJECT_VERSION_KEY.format(project_id=project_id))
+
+
+def bump_project_version(project_id):
+    """Увеличить версию проекта после коммита текущей транзакции
+
+    Время изменения в сводке проекта обновляется сразу, вместе с данными.
+    """
+    ProjectSummary.touch(project_id)
+    key = PROJECT_VERSION_KEY.format(project_id=project_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def bump_user_version(user_id):
+    """Увеличить версию пользователя после коммита текущей транзакции"""
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def versions_digest(project=None, projects=(), user=None, **vary):
+    """Хэш версий проектов и пользователя и прочих значений vary
+
+    project, projects и user принимают объекты или их id.
+    """
+    project_ids = sorted({getattr(item, "pk", item) for item in projects})
+    if project is not None:
+        project_ids.append(getattr(project, "pk", project))
+    version_keys = [PROJECT_VERSION_KEY.format(project_id=pk) for pk in project_ids]
+    if user is not None:
+        version_keys.append(USER_VERSION_KEY.format(user_id=getattr(user, "pk", user)))
+
+    versions = get_versions(version_keys)
+    parts = [f"{key}={versions[key]}" for key in version_keys]
+    parts += [f"{field}={value}" for field, value in sorted(vary.items())]
+    return hashlib.md5("|".join(parts).encode()).hexdigest()
+
+
+def fragment_key(name, project=None, projects=(), user=None, **vary):
+    """Ключ фрагмента из версий проектов и пользователя и прочих значений vary"""
+    digest = versions_digest(project=project, projects=projects, user=user, **vary)
+    return FRAGMENT_KEY.format(name=name, digest=digest)
+
+
+class FragmentMetrics(SharedCounters):
+    """Счетчики попаданий и промахов кэша фрагментов
+
+    Общий кэш позволяет команде fragment_cache_stats и /metrics видеть
+    статистику всех воркеров.
+    """
+
+    def __init__(self):
+        super().__init__("fragment", ["hits", "misses"])
+
+    def record(self, name, hit):
+        record_cache("fragment", hit)
+        self.add(name, **{"hits" if hit else "misses": 1})
+
+
+fragment_metrics = FragmentMetrics()
+atexit.register(fragment_metrics.flush)
+
+
+def get_fragment(name, key):
+    html = cache.get(key)
+    fragment_metrics.record(name, hit=html is not None)
+    return html
+
+
+def set_fragment(key, html, timeout=None):
+    if timeout is None:
+        timeout = getattr(settings, "TASKMANAGER_FRAGMENT_CACHE_TIMEOUT", 600)
+    cache.set(key, html, timeout)
@@ -0,0 +1,186 @@
+from functools import partial
+
+from django.db import transaction
+
+from .caching import bump_user_version
+from .models import (
+    Assignee,
+    Project,
+    ProjectLabel,
+    ProjectMember,
+    ProjectSummary,
+    Status,
+    Task,
+    TaskLabel,
+)
+from .permissions import invalidate_project_roles
+
+"""
+Копирование проекта и создание проекта из шаблона
+
+Статусы, метки, задачи, метки задач и (по желанию) участники с исполнителями
+копируются bulk_create пачками; соответствие старых id новым держится в
+словарях в памяти. На пачку задач уходит постоянное число запросов (выборка
+задач, их меток и исполнителей и три вставки), поэтому проект на 10 тысяч
+задач копируется за секунды. Вставки идут без сигналов: сводка проекта
+пересчитывается в конце, кэш ролей и версии участников сбрасываются явно.
+Комментарии, вложения и журнал не копируются.
+"""
+
+BATCH_SIZE = 2000
+
+# Поля задачи, которые копируются как есть; фактические часы не копируются
+COPIED_TASK_FIELDS = [
+    "title",
+    "description",
+    "task_order",
+    "priority",
+    "due_date",
+    "estimated_hours",
+]
+
+
+class ProjectCloner:
+    def __init__(
+        self, source, owner, include_tasks=True, include_assignees=False, batch_size=BATCH_SIZE
+    ):
+        self.source = source
+        self.owner = owner
+        self.include_tasks = include_tasks
+        # Исполнители копируются вместе с участниками: назначать можно только их
+        self.include_assignees = include_assignees
+        self.batch_size = batch_size
+        self.counts = {}
+
+    def _bulk(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(created)
+        return created
+
+    def run(self, name, description=None):
+        with transaction.atomic():
+            project = Project.objects.create(
+                name=name,
+                description=self.source.description if description is None else description,
+            )
+            members = self.copy_members(project)
+            statuses = self.copy_statuses(project)
+            labels = self.copy_labels(project)
+            if self.include_tasks:
+                self.copy_tasks(project, statuses, labels, members)
+            ProjectSummary.rebuild(project.pk)
+        return project
+
+    def copy_members(self, project):
+        """Владелец копии - owner, прежний владелец становится администратором"""
+        ProjectMember.objects.create(project=project, user=self.owner, role="owner")
+        members = {self.owner.pk}
+        if not self.include_assignees:
+            return members
+
+        rows = [
+            ProjectMember(
+                project=project, user_id=user_id, role="admin" if role == "owner" else role
+            )
+            for user_id, role in ProjectMember.objects.filter(project=self.source)
+            .exclude(user=self.owner)
+            .values_list("user_id", "role")
+        ]
+        self._bulk(ProjectMember, rows)
+        for row in rows:
+            members.add(row.user_id)
+            # Как в сигналах ProjectMember: кэш ролей сбрасывается после коммита
+            transaction.on_commit(partial(invalidate_project_roles, row.user_id))
+            bump_user_version(row.user_id)
+        return members
+
+    def copy_statuses(self, project):
+        """{id статуса источника: id копии}"""
+        source = list(Status.objects.filter(project=self.source).order_by("order", "id"))
+        copies = self._bulk(
+            Status,
+            [
+                Status(
+                    project=project,
+                    name=status.name,
+                    order=status.order,
+                    is_closed=status.is_closed,
+                )
+                for status in source
+            ],
+        )
+        return {old.pk: new.pk for old, new in zip(source, copies)}
+
+    def copy_labels(self, project):
+        source = list(ProjectLabel.objects.filter(project=self.source).order_by("id"))
+        copies = self._bulk(
+            ProjectLabel,
+            [
+                ProjectLabel(project=project, name=label.name, color=label.color)
+                for label in source
+            ],
+        )
+        return {old.pk: new.pk for old, new in zip(source, copies)}
+
+    def copy_tasks(self, project, statuses, labels, members):
+        tasks = Task.objects.filter(project=self.source).order_by("pk")
+        last_id = 0
+        while True:
+            rows = list(
+                tasks.filter(pk__gt=last_id).values("id", "status_id", *COPIED_TASK_FIELDS)[
+                    : self.batch_size
+                ]
+            )
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+
+            copies = self._bulk(
+                Task,
+                [
+                    Task(
+                        project=project,
+                        creator=self.owner,
+                        status_id=statuses.get(row["status_id"]),
+                        **{field: row[field] for field in COPIED_TASK_FIELDS},
+                    )
+                    for row in rows
+                ],
+            )
+            task_ids = {row["id"]: copy.pk for row, copy in zip(rows, copies)}
+
+            self._bulk(
+                TaskLabel,
+                [
+                    TaskLabel(task_id=task_ids[task_id], label_id=labels[label_id])
+                    for task_id, label_id in TaskLabel.objects.filter(
+                        task_id__in=task_ids
+                    ).values_list("task_id", "label_id")
+                ],
+            )
+            if self.include_assignees:
+                self._bulk(
+                    Assignee,
+                    [
+                        Assignee(task_id=task_ids[task_id], user_id=user_id, role=role)
+                        for task_id, user_id, role in Assignee.objects.filter(
+                            task_id__in=task_ids
+                        ).values_list("task_id", "user_id", "role")
+                        if user_id in members
+                    ],
+                )
+
+
+def clone_project(
+    source, owner, name, description=None, include_tasks=True, include_assignees=False
+):
+    """Скопировать проект source; владелец копии - owner"""
+    cloner = ProjectCloner(
+        source, owner, include_tasks=include_tasks, include_assignees=include_assignees
+    )
+    return cloner.run(name, description)
+
+
+def templates_for(user):
+    """Проекты-шаблоны, доступные пользователю"""
+    return Project.objects.for_user(user).filter(is_template=True).order_by("name", "id")
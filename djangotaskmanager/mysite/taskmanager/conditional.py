@@ -0,0 +1,87 @@
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import ProjectSummary, Task
+
+"""
+Условные GET-запросы (ETag / Last-Modified)
+
+Валидаторы строятся из ProjectSummary.updated_at, которое обновляется при
+любом изменении проекта и его дочерних объектов: задач, статусов, меток,
+участников, исполнителей и комментариев (см. signals.py и
+caching.bump_project_version). Проверка стоит один короткий запрос; если
+клиент прислал актуальный ETag, отдается 304 без запросов представления и
+рендеринга шаблона.
+"""
+
+
+def make_etag(*parts):
+    return hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def project_changed_at(project_id):
+    return (
+        ProjectSummary.objects.filter(project_id=project_id)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+
+
+def task_changed_at(task_id):
+    """(project_id, время изменения) задачи или None"""
+    row = (
+        Task.objects.filter(pk=task_id)
+        .values_list("project_id", "updated_at", "project__summary__updated_at")
+        .first()
+    )
+    if row is None:
+        return None
+    project_id, updated_at, project_updated_at = row
+    return project_id, max(filter(None, [updated_at, project_updated_at]))
+
+
+class ConditionalGetMixin:
+    """ETag/Last-Modified и 304 Not Modified для GET и HEAD
+
+    Подкласс реализует get_validators() -> (etag_parts, last_modified) или
+    None, если валидаторы вычислить нельзя. Страницы зависят от
+    пользователя, поэтому в ETag входят его id и CSRF-cookie (токен формы
+    в base.html), а ответ помечается private и требует перепроверки.
+    """
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return super().dispatch(request, *args, **kwargs)
+
+        validators = self.get_validators()
+        if validators is None:
+            response = super().dispatch(request, *args, **kwargs)
+        else:
+            parts, last_modified = validators
+            etag = quote_etag(
+                make_etag(
+                    type(self).__name__,
+                    request.user.pk,
+                    request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+                    *parts,
+                )
+            )
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = super().dispatch(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault("ETag", etag)
+                if timestamp is not None:
+                    response.headers.setdefault("Last-Modified", http_date(timestamp))
+
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
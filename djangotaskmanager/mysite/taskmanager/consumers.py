@@ -0,0 +1,67 @@
+import asyncio
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+
+from . import realtime
+from .permissions import load_project_roles
+
+"""
+WebSocket-потребители
+
+Браузер подключается к ws/projects/<pk>/board/ и получает кадры
+{"changes": [...]} с изменениями доски (формат см. realtime.py).
+"""
+
+
+class BoardConsumer(AsyncJsonWebsocketConsumer):
+    """Подписка участника проекта на изменения его доски"""
+
+    async def connect(self):
+        self.project_id = self.scope["url_route"]["kwargs"]["pk"]
+        self.group_name = realtime.project_group(self.project_id)
+        self.pending = {}
+        self.flush_task = None
+
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        roles = await database_sync_to_async(load_project_roles)(user)
+        if self.project_id not in roles:
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Канал только на отправку; клиент может пинговать соединение
+        if content.get("type") == "ping":
+            await self.send_json({"type": "pong"})
+
+    async def board_changes(self, event):
+        for change in event["changes"]:
+            realtime.merge_change(self.pending, change)
+
+        delay = getattr(settings, "TASKMANAGER_REALTIME_COALESCE_DELAY", 0.1)
+        if delay <= 0:
+            await self.flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later(delay))
+
+    async def flush_later(self, delay):
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        changes, self.pending = list(self.pending.values()), {}
+        if changes:
+            await self.send_json({"changes": changes})
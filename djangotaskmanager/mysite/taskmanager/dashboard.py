@@ -0,0 +1,155 @@
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.utils import timezone
+
+from . import replicas
+from .caching import versions_digest
+from .instrumentation import record_cache
+from .models import Assignee, Project, Task
+from .permissions import get_project_roles
+
+"""
+Сводка дашборда пользователя
+
+Проекты дашборда - проекты пользователя и проекты назначенных на него задач.
+По ним один агрегирующий запрос (COUNT/SUM ... FILTER) считает задачи,
+открытые, просроченные и со сроком в ближайшие дни, те же числа для задач
+пользователя и его нагрузку в часах. Второй запрос выбирает ближайшие по
+сроку открытые задачи пользователя.
+
+Сводка кэшируется на пользователя под ключом из версий его проектов и его
+версии (см. caching.py): изменение задачи, участников или назначений дает
+новый ключ. Срок жизни короткий (TASKMANAGER_DASHBOARD_CACHE_TIMEOUT), так как
+задачи становятся просроченными и без изменений данных.
+"""
+
+DASHBOARD_KEY = "taskmanager:dashboard:{user_id}:{digest}"
+HIGH_PRIORITIES = ["1", "2"]
+
+
+def dashboard_project_ids(request):
+    """Проекты пользователя (из кэша ролей) и проекты его задач"""
+    assigned = Assignee.objects.filter(user=request.user).values_list(
+        "task__project_id", flat=True
+    )
+    return sorted(set(get_project_roles(request)) | set(assigned))
+
+
+def _hours(value):
+    return round(value.total_seconds() / 3600, 1) if value else 0
+
+
+def aggregate_projects(user, project_ids, now):
+    """Счетчики задач по проектам одним запросом, по алфавиту"""
+    soon = now + datetime.timedelta(
+        days=getattr(settings, "TASKMANAGER_DASHBOARD_DUE_SOON_DAYS", 3)
+    )
+    mine = Exists(Assignee.objects.filter(task=OuterRef("tasks"), user=user))
+    is_open = Q(tasks__status__isnull=True) | Q(tasks__status__is_closed=False)
+    overdue = is_open & Q(tasks__due_date__lt=now)
+    due_soon = is_open & Q(tasks__due_date__gte=now, tasks__due_date__lt=soon)
+
+    rows = (
+        Project.objects.filter(pk__in=project_ids)
+        .values("id", "name")
+        .annotate(
+            task_count=Count("tasks"),
+            open_count=Count("tasks", filter=is_open),
+            overdue_count=Count("tasks", filter=overdue),
+            due_soon_count=Count("tasks", filter=due_soon),
+            my_open_count=Count("tasks", filter=is_open & mine),
+            my_overdue_count=Count("tasks", filter=overdue & mine),
+            my_due_soon_count=Count("tasks", filter=due_soon & mine),
+            my_high_priority_count=Count(
+                "tasks", filter=is_open & mine & Q(tasks__priority__in=HIGH_PRIORITIES)
+            ),
+            my_estimated=Sum("tasks__estimated_hours", filter=is_open & mine),
+            my_actual=Sum("tasks__actual_hours", filter=mine),
+        )
+        .order_by("name", "id")
+    )
+    return list(rows)
+
+
+def upcoming_tasks(user, now, limit):
+    """Открытые задачи пользователя: сначала с ближайшим сроком"""
+    rows = (
+        Task.objects.filter(
+            Q(status__isnull=True) | Q(status__is_closed=False),
+            Exists(Assignee.objects.filter(task=OuterRef("pk"), user=user)),
+        )
+        .order_by(F("due_date").asc(nulls_last=True), "priority", "id")
+        .values("id", "title", "priority", "due_date", "project_id", "project__name", "status__name")
+    )[:limit]
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "priority": row["priority"],
+            "due_date": row["due_date"],
+            "overdue": row["due_date"] is not None and row["due_date"] < now,
+            "project_id": row["project_id"],
+            "project_name": row["project__name"],
+            "status": row["status__name"],
+        }
+        for row in rows
+    ]
+
+
+def build_dashboard(request, project_ids, now=None):
+    user = request.user
+    now = now or timezone.now()
+    roles = get_project_roles(request)
+    projects = aggregate_projects(user, project_ids, now)
+
+    workload = {
+        name: sum(row[f"my_{name}_count"] for row in projects)
+        for name in ("open", "overdue", "due_soon", "high_priority")
+    }
+    workload["estimated_hours"] = _hours(
+        sum((row["my_estimated"] for row in projects if row["my_estimated"]), datetime.timedelta())
+    )
+    workload["actual_hours"] = _hours(
+        sum((row["my_actual"] for row in projects if row["my_actual"]), datetime.timedelta())
+    )
+    for row in projects:
+        row["role"] = roles.get(row["id"])
+        row["my_estimated_hours"] = _hours(row.pop("my_estimated"))
+        row["my_actual_hours"] = _hours(row.pop("my_actual"))
+
+    return {
+        "generated_at": now,
+        "project_ids": project_ids,
+        # Список проектов - только те, где пользователь участник
+        "projects": [row for row in projects if row["role"]],
+        "workload": workload,
+        "tasks": upcoming_tasks(
+            user, now, getattr(settings, "TASKMANAGER_DASHBOARD_TASK_LIMIT", 20)
+        ),
+    }
+
+
+def get_dashboard(request):
+    """Сводка дашборда текущего пользователя из кэша или базы"""
+    project_ids = dashboard_project_ids(request)
+    key = DASHBOARD_KEY.format(
+        user_id=request.user.pk,
+        digest=versions_digest(projects=project_ids, user=request.user),
+    )
+    data = cache.get(key)
+    record_cache("dashboard", data is not None)
+    if data is None:
+        # В кэш - только данные основной базы: реплика может отставать от
+        # версий в ключе
+        with replicas.primary_reads():
+            if replicas.used_replica():
+                project_ids = dashboard_project_ids(request)
+            data = build_dashboard(request, project_ids)
+        cache.set(
+            key, data, getattr(settings, "TASKMANAGER_DASHBOARD_CACHE_TIMEOUT", 60)
+        )
+    data["key"] = key
+    return data
@@ -3,4 +3,17 @@ from django import forms
 
 class ProjectChangeOwnerForm(forms.Form):
     new_owner = forms.ChoiceField(choices=[], required=False, label="New Owner")
-    
+
+
+class ProjectCloneForm(forms.Form):
+    name = forms.CharField(max_length=100, label="Name")
+    include_tasks = forms.BooleanField(required=False, initial=True, label="Copy tasks")
+    include_assignees = forms.BooleanField(
+        required=False, label="Copy members and task assignees"
+    )
+
+    def clean_name(self):
+        name = self.cleaned_data["name"].strip()
+        if len(name) < 2:
+            raise forms.ValidationError("Projects name must be at least 2 characters long")
+        return name
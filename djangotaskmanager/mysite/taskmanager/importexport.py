@@ -0,0 +1,440 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max, Prefetch
+from django.utils.dateparse import parse_datetime
+
+from .caching import bump_project_version
+from .ordering import ORDER_STEP
+from .models import (
+    Assignee,
+    Comment,
+    ProjectLabel,
+    ProjectSummary,
+    Status,
+    Task,
+    TaskLabel,
+)
+
+"""
+Потоковый импорт и экспорт задач проекта в CSV и NDJSON
+
+Формат записи (одна задача):
+    title, description, priority, due_date (ISO 8601), task_order,
+    status (имя статуса), creator (username),
+    assignees - список "username" или "username:role",
+    labels - список имен меток,
+    comments - список {"author": username, "content": текст}
+
+В CSV списки assignees и labels разделяются "|", comments - JSON-массив.
+"""
+
+FORMATS = ["csv", "ndjson"]
+CSV_FIELDS = [
+    "title",
+    "description",
+    "priority",
+    "due_date",
+    "task_order",
+    "status",
+    "creator",
+    "assignees",
+    "labels",
+    "comments",
+]
+LIST_SEPARATOR = "|"
+
+ASSIGNEE_ROLES = {role for role, _ in Assignee.ROLES}
+PRIORITIES = {priority for priority, _ in Task.PRIORITIES}
+
+
+class ImportRecordError(ValueError):
+    """Ошибка в записи импорта"""
+
+
+def detect_format(filename, default="csv"):
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+
+def _split(value, field):
+    """Список строк из списка NDJSON или строки CSV через "|" """
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ImportRecordError(f"{field} must be a list of strings")
+    return value
+
+
+def _text(record, field):
+    """Строковое поле записи; пустое значение - пустая строка"""
+    value = record.get(field)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ImportRecordError(f"{field} must be a string")
+    return value
+
+
+def iter_records(stream, fmt):
+    """Построчный разбор текстового потока, возвращает (номер строки, запись)"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            if record.get("comments"):
+                try:
+                    record["comments"] = json.loads(record["comments"])
+                except ValueError:
+                    yield reader.line_num, ImportRecordError("Invalid comments JSON")
+                    continue
+            yield reader.line_num, record
+    elif fmt == "ndjson":
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_num, json.loads(line)
+            except ValueError:
+                yield line_num, ImportRecordError("Invalid JSON")
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def open_text(binary_stream, encoding="utf-8"):
+    """Текстовая обертка над загруженным файлом без чтения его в память"""
+    return io.TextIOWrapper(binary_stream, encoding=encoding, newline="")
+
+
+class ImportResult:
+    def __init__(self):
+        self.tasks = 0
+        self.assignees = 0
+        self.labels = 0
+        self.comments = 0
+        self.errors = []
+
+    def as_dict(self):
+        return {
+            "tasks": self.tasks,
+            "assignees": self.assignees,
+            "labels": self.labels,
+            "comments": self.comments,
+            "errors": self.errors,
+        }
+
+
+class TaskImporter:
+    """Импорт задач пачками через bulk_create
+
+    Каждая пачка записей создается в своей транзакции. Статусы, метки и
+    пользователи разрешаются через словари в памяти; отсутствующие статусы
+    и метки создаются, неизвестные пользователи считаются ошибкой записи.
+    Если пачка откатилась, созданные в ней статусы и метки забываются, а
+    сводка и версия проекта все равно обновляются по уже записанным пачкам.
+    """
+
+    def __init__(self, project, user=None, batch_size=1000):
+        self.project = project
+        self.user = user
+        self.batch_size = batch_size
+        self.statuses = {
+            status.name: status for status in Status.objects.filter(project=project)
+        }
+        self.labels = {
+            label.name: label for label in ProjectLabel.objects.filter(project=project)
+        }
+        self.users = {}
+        # (словарь, имя) статусов и меток, созданных в текущей пачке
+        self._created = []
+        # Наибольший task_order колонки по id статуса
+        self._last_orders = {}
+        self._next_status_order = (
+            Status.objects.filter(project=project).aggregate(Max("order"))["order__max"]
+            or 0
+        ) + 1
+
+    def run(self, records, progress=None):
+        """Импортировать записи; progress(result) вызывается после каждой пачки"""
+        result = ImportResult()
+        records = iter(records)
+        try:
+            while True:
+                chunk = list(islice(records, self.batch_size))
+                if not chunk:
+                    break
+                try:
+                    with transaction.atomic():
+                        self._import_chunk(chunk, result)
+                except Exception:
+                    # Строк откатившейся пачки в базе нет
+                    for cache, name in self._created:
+                        cache.pop(name, None)
+                    raise
+                finally:
+                    self._created = []
+                if progress:
+                    progress(result)
+        finally:
+            # bulk_create не вызывает сигналы, сводку пересчитываем один раз -
+            # и после сбоя, ведь предыдущие пачки уже записаны
+            ProjectSummary.rebuild(self.project.pk)
+            bump_project_version(self.project.pk)
+        return result
+
+    def _import_chunk(self, chunk, result):
+        self._load_users(chunk)
+
+        rows = []
+        for line_num, record in chunk:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                rows.append(self._build_row(record))
+            except (ImportRecordError, ValueError, TypeError, KeyError) as error:
+                result.errors.append({"line": line_num, "error": str(error)})
+
+        tasks = Task.objects.bulk_create([row[0] for row in rows])
+
+        assignees, task_labels, comments = [], [], []
+        for task, (_, row_assignees, row_labels, row_comments) in zip(tasks, rows):
+            assignees += [
+                Assignee(task=task, user=user, role=role) for user, role in row_assignees
+            ]
+            task_labels += [TaskLabel(task=task, label=label) for label in row_labels]
+            comments += [
+                Comment(task=task, author=author, content=content)
+                for author, content in row_comments
+            ]
+
+        Assignee.objects.bulk_create(assignees)
+        TaskLabel.objects.bulk_create(task_labels)
+        Comment.objects.bulk_create(comments)
+
+        result.tasks += len(tasks)
+        result.assignees += len(assignees)
+        result.labels += len(task_labels)
+        result.comments += len(comments)
+
+    def _load_users(self, chunk):
+        """Догрузить неизвестных пользователей пачки одним запросом"""
+        # Значения неверного типа пропускаются: ошибку записи сообщит _build_row
+        usernames = set()
+        for _, record in chunk:
+            if not isinstance(record, dict):
+                continue
+            if isinstance(record.get("creator"), str):
+                usernames.add(record["creator"])
+            assignees = record.get("assignees")
+            if isinstance(assignees, str):
+                assignees = assignees.split(LIST_SEPARATOR)
+            for item in assignees if isinstance(assignees, list) else []:
+                if isinstance(item, str):
+                    usernames.add(item.strip().split(":", 1)[0])
+            comments = record.get("comments")
+            for comment in comments if isinstance(comments, list) else []:
+                if isinstance(comment, dict) and isinstance(comment.get("author"), str):
+                    usernames.add(comment["author"])
+
+        missing = usernames - self.users.keys()
+        if missing:
+            for user in get_user_model().objects.filter(username__in=missing):
+                self.users[user.username] = user
+
+    def _get_user(self, username):
+        try:
+            return self.users[username]
+        except KeyError:
+            raise ImportRecordError(f"Unknown user: {username}")
+
+    def _get_status(self, name):
+        if name not in self.statuses:
+            self.statuses[name] = Status.objects.create(
+                project=self.project, name=name, order=self._next_status_order
+            )
+            self._next_status_order += 1
+            self._created.append((self.statuses, name))
+        return self.statuses[name]
+
+    def _get_label(self, name):
+        if name not in self.labels:
+            self.labels[name] = ProjectLabel.objects.create(
+                project=self.project, name=name
+            )
+            self._created.append((self.labels, name))
+        return self.labels[name]
+
+    def _place(self, status, task_order):
+        """task_order записи: без порядка - в конец колонки с шагом ORDER_STEP"""
+        status_id = status.pk if status is not None else None
+        if status_id not in self._last_orders:
+            self._last_orders[status_id] = (
+                Task.objects.filter(project=self.project, status_id=status_id).aggregate(
+                    value=Max("task_order")
+                )["value"]
+                or 0
+            )
+        if task_order is None:
+            task_order = self._last_orders[status_id] + ORDER_STEP
+            if task_order >= 2**31:
+                raise ImportRecordError("Column is full, run rebalance_task_order")
+        self._last_orders[status_id] = max(self._last_orders[status_id], task_order)
+        return task_order
+
+    def _build_row(self, record):
+        if not isinstance(record, dict):
+            raise ImportRecordError("Record must be an object")
+
+        title = _text(record, "title").strip()
+        if not title:
+            raise ImportRecordError("title is required")
+        description = _text(record, "description")
+
+        priority = record.get("priority") or "3"
+        if isinstance(priority, int) and not isinstance(priority, bool):
+            priority = str(priority)
+        if not isinstance(priority, str) or priority not in PRIORITIES:
+            raise ImportRecordError(f"Invalid priority: {priority}")
+
+        due_date = None
+        if record.get("due_date"):
+            due_date = parse_datetime(_text(record, "due_date"))
+            if due_date is None:
+                raise ImportRecordError(f"Invalid due_date: {record['due_date']}")
+
+        task_order = record.get("task_order")
+        if isinstance(task_order, str):
+            try:
+                task_order = int(task_order)
+            except ValueError:
+                raise ImportRecordError(f"Invalid task_order: {task_order}")
+        # Диапазон IntegerField: иначе ошибка базы откатила бы всю пачку
+        if task_order is not None and (
+            not isinstance(task_order, int)
+            or isinstance(task_order, bool)
+            or not -(2**31) <= task_order < 2**31
+        ):
+            raise ImportRecordError(f"Invalid task_order: {task_order}")
+
+        creator = self.user
+        if record.get("creator"):
+            creator = self._get_user(_text(record, "creator"))
+
+        status_name = _text(record, "status")
+
+        assignees = {}
+        for item in _split(record.get("assignees"), "assignees"):
+            username, _, role = item.partition(":")
+            role = role or "assignee"
+            if role not in ASSIGNEE_ROLES:
+                raise ImportRecordError(f"Invalid assignee role: {role}")
+            assignees[username] = (self._get_user(username), role)
+
+        comments = []
+        if not isinstance(record.get("comments") or [], list):
+            raise ImportRecordError("comments must be a list")
+        for comment in record.get("comments") or []:
+            if (
+                not isinstance(comment, dict)
+                or not isinstance(comment.get("author"), str)
+                or not isinstance(comment.get("content"), str)
+                or not comment["content"]
+            ):
+                raise ImportRecordError("Comment must have author and content")
+            comments.append((self._get_user(comment["author"]), comment["content"]))
+
+        label_names = _split(record.get("labels"), "labels")
+
+        # Статусы и метки создаются только для корректных записей
+        labels = {name: self._get_label(name) for name in label_names}
+        status = self._get_status(status_name) if status_name else None
+
+        task = Task(
+            project=self.project,
+            title=title[:200],
+            description=description,
+            priority=priority,
+            due_date=due_date,
+            task_order=self._place(status, task_order),
+            status=status,
+            creator=creator,
+        )
+
+        return task, list(assignees.values()), list(labels.values()), comments
+
+
+def export_queryset(project):
+    return (
+        Task.objects.filter(project=project)
+        .select_related("status", "creator")
+        .prefetch_related(
+            Prefetch("assignees", queryset=Assignee.objects.select_related("user")),
+            Prefetch("task_labels", queryset=TaskLabel.objects.select_related("label")),
+            Prefetch(
+                "comments",
+                queryset=Comment.objects.select_related("author").order_by("created_at"),
+            ),
+        )
+    )
+
+
+def task_to_record(task):
+    return {
+        "title": task.title,
+        "description": task.description,
+        "priority": task.priority,
+        "due_date": task.due_date.isoformat() if task.due_date else None,
+        "task_order": task.task_order,
+        "status": task.status.name if task.status else None,
+        "creator": task.creator.username if task.creator else None,
+        "assignees": [
+            f"{assignee.user.username}:{assignee.role}"
+            for assignee in task.assignees.all()
+        ],
+        "labels": [task_label.label.name for task_label in task.task_labels.all()],
+        "comments": [
+            {"author": comment.author.username, "content": comment.content}
+            for comment in task.comments.all()
+        ],
+    }
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def iter_export(project, fmt, chunk_size=2000):
+    """Построчный экспорт задач; в памяти держится только одна пачка"""
+    tasks = export_queryset(project).iterator(chunk_size=chunk_size)
+
+    if fmt == "ndjson":
+        for task in tasks:
+            yield json.dumps(task_to_record(task), ensure_ascii=False) + "\n"
+    elif fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(CSV_FIELDS)
+        for task in tasks:
+            record = task_to_record(task)
+            record["assignees"] = LIST_SEPARATOR.join(record["assignees"])
+            record["labels"] = LIST_SEPARATOR.join(record["labels"])
+            record["comments"] = (
+                json.dumps(record["comments"], ensure_ascii=False)
+                if record["comments"]
+                else ""
+            )
+            yield writer.writerow(
+                ["" if record[field] is None else record[field] for field in CSV_FIELDS]
+            )
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
@@ -0,0 +1,423 @@
+import atexit
+import contextvars
+import logging
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+"""
+Метрики запросов
+
+RequestMetricsMiddleware считает для каждого HTTP-запроса число и время SQL,
+время рендеринга шаблонов и обращения к кэшу (RequestStats в contextvar) и:
+    - отдает их в заголовке Server-Timing;
+    - пишет в лог медленные запросы с отпечатками самых дорогих SQL;
+    - копит сводку по представлениям (view_metrics) для /metrics;
+    - проверяет бюджет запросов представления (атрибут query_budget).
+
+Запросы, выполненные при отдаче StreamingHttpResponse (экспорт, файлы),
+идут уже после middleware и не учитываются.
+
+Счетчики хранятся в кэше "metrics" (см. CACHES в settings.py), а если его нет -
+в default. Вытесненный ключ молча обнуляет счетчик, поэтому для метрик нужен
+кэш без вытеснения.
+"""
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "taskmanager:metrics:{group}:{name}:{kind}"
+METRICS_NAMES_KEY = "taskmanager:metrics:{group}:names"
+
+# Границы корзин гистограммы длительности запросов, секунды
+DURATION_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = contextvars.ContextVar("taskmanager_request_stats", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def metrics_cache():
+    return caches["metrics" if "metrics" in settings.CACHES else "default"]
+
+
+class SharedCounters:
+    """Целочисленные счетчики {name: {kind: n}}, общие для процессов
+
+    Считаются в памяти процесса и раз в TASKMANAGER_FRAGMENT_METRICS_INTERVAL
+    секунд добавляются в общий кэш (для locmem - только свой процесс).
+    """
+
+    def __init__(self, group, kinds):
+        self.group = group
+        self.kinds = tuple(kinds)
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._last_flush = time.monotonic()
+
+    def _key(self, name, kind):
+        return METRICS_KEY.format(group=self.group, name=name, kind=kind)
+
+    @property
+    def _names_key(self):
+        return METRICS_NAMES_KEY.format(group=self.group)
+
+    def add(self, name, **deltas):
+        with self._lock:
+            counts = self._counts.setdefault(name, dict.fromkeys(self.kinds, 0))
+            for kind, delta in deltas.items():
+                counts[kind] += delta
+            should_flush = time.monotonic() - self._last_flush >= getattr(
+                settings, "TASKMANAGER_FRAGMENT_METRICS_INTERVAL", 10
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._last_flush = time.monotonic()
+        if not counts:
+            return
+
+        cache = metrics_cache()
+        names = cache.get(self._names_key, set())
+        if not names.issuperset(counts):
+            cache.set(self._names_key, names | set(counts), None)
+        for name, values in counts.items():
+            for kind, delta in values.items():
+                if not delta:
+                    continue
+                key = self._key(name, kind)
+                # add не перезапишет счетчик, созданный другим процессом
+                if cache.add(key, delta, None):
+                    continue
+                try:
+                    cache.incr(key, delta)
+                except ValueError:
+                    # Ключ вытеснен между add и incr
+                    cache.set(key, delta, None)
+
+    def stats(self):
+        """{name: {kind: n}} по данным общего кэша"""
+        self.flush()
+        cache = metrics_cache()
+        names = sorted(cache.get(self._names_key, set()))
+        keys = {
+            (name, kind): self._key(name, kind) for name in names for kind in self.kinds
+        }
+        values = cache.get_many(keys.values())
+        return {
+            name: {kind: values.get(keys[name, kind], 0) for kind in self.kinds}
+            for name in names
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+        cache = metrics_cache()
+        names = cache.get(self._names_key, set())
+        keys = [self._key(name, kind) for name in names for kind in self.kinds]
+        cache.delete_many([*keys, self._names_key])
+
+
+# Длительности хранятся в микросекундах: incr кэша работает только с целыми
+view_metrics = SharedCounters(
+    "view",
+    [
+        "requests",
+        "errors",
+        "duration_us",
+        "queries",
+        "sql_us",
+        "template_us",
+        *(f"bucket_{index}" for index in range(len(DURATION_BUCKETS))),
+    ],
+)
+cache_metrics = SharedCounters("cache", ["hits", "misses"])
+atexit.register(view_metrics.flush)
+atexit.register(cache_metrics.flush)
+
+
+_FINGERPRINT_RULES = [
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r'"s\d+_x\d+"'), '"s?"'),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+]
+
+
+def fingerprint(sql):
+    """SQL без литералов и длины списков IN: одинаков для запросов одной формы"""
+    for pattern, replacement in _FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class RequestStats:
+    """Счетчики одного HTTP-запроса"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache = {}
+        # SQL -> [число, время]; отпечатки считаются только для лога
+        self.statements = {}
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += elapsed
+            statement = self.statements.setdefault(sql, [0, 0.0])
+            statement[0] += 1
+            statement[1] += elapsed
+
+    def record_cache(self, name, hit):
+        counts = self.cache.setdefault(name, [0, 0])
+        counts[0 if hit else 1] += 1
+
+    def top_queries(self, limit=5):
+        """[(отпечаток, число, время)] по убыванию суммарного времени"""
+        grouped = {}
+        for sql, (count, elapsed) in self.statements.items():
+            item = grouped.setdefault(fingerprint(sql), [0, 0.0])
+            item[0] += count
+            item[1] += elapsed
+        ordered = sorted(grouped.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, count, elapsed) for sql, (count, elapsed) in ordered[:limit]]
+
+    def server_timing(self):
+        hits = sum(counts[0] for counts in self.cache.values())
+        misses = sum(counts[1] for counts in self.cache.values())
+        return ", ".join(
+            [
+                f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+                f'tpl;dur={self.template_time * 1000:.1f};desc="templates"',
+                f'cache;desc="{hits} hits, {misses} misses"',
+                f"total;dur={self.duration * 1000:.1f}",
+            ]
+        )
+
+
+def current_stats():
+    """RequestStats текущего запроса или None вне запроса"""
+    return _current.get()
+
+
+def record_cache(name, hit):
+    """Учесть обращение к кэшу name в метриках текущего запроса"""
+    stats = _current.get()
+    if stats is not None:
+        stats.record_cache(name, hit)
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.view_name or match._func_path
+
+
+def _query_budget(request):
+    match = getattr(request, "resolver_match", None)
+    view_class = getattr(getattr(match, "func", None), "view_class", None)
+    return getattr(view_class, "query_budget", None)
+
+
+class RequestMetricsMiddleware:
+    """Собирает RequestStats запроса; ставится первым в MIDDLEWARE"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(stats.execute_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        stats.duration = time.perf_counter() - stats.started
+
+        if getattr(settings, "TASKMANAGER_SERVER_TIMING", True):
+            response["Server-Timing"] = stats.server_timing()
+        view = _view_name(request)
+        self.record(view, stats, response)
+        self.log_slow(request, view, stats)
+        self.check_budget(request, view, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        stats = _current.get()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                # Включает запросы, выполненные ленивыми QuerySet из шаблона
+                stats.template_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, view, stats, response):
+        # Корзины хранятся не накопительными: запрос попадает в первую подходящую
+        buckets = {}
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if stats.duration <= bound:
+                buckets[f"bucket_{index}"] = 1
+                break
+        view_metrics.add(
+            view,
+            requests=1,
+            errors=int(response.status_code >= 500),
+            duration_us=round(stats.duration * 1e6),
+            queries=stats.queries,
+            sql_us=round(stats.sql_time * 1e6),
+            template_us=round(stats.template_time * 1e6),
+            **buckets,
+        )
+        for name, (hits, misses) in stats.cache.items():
+            cache_metrics.add(name, hits=hits, misses=misses)
+
+    def log_slow(self, request, view, stats):
+        slow_ms = getattr(settings, "TASKMANAGER_SLOW_REQUEST_MS", 500)
+        slow_queries = getattr(settings, "TASKMANAGER_SLOW_REQUEST_QUERIES", 50)
+        if stats.duration * 1000 < slow_ms and stats.queries < slow_queries:
+            return
+        top = "".join(
+            f"\n  {count}x {elapsed * 1000:.1f} ms  {sql[:300]}"
+            for sql, count, elapsed in stats.top_queries()
+        )
+        logger.warning(
+            "Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, "
+            "templates %.0f ms%s",
+            request.method,
+            request.path,
+            view,
+            stats.duration * 1000,
+            stats.queries,
+            stats.sql_time * 1000,
+            stats.template_time * 1000,
+            top,
+        )
+
+    def check_budget(self, request, view, stats):
+        budget = _query_budget(request)
+        if budget is None or stats.queries <= budget:
+            return
+        message = (
+            f"{view} made {stats.queries} queries, budget is {budget}: "
+            + "; ".join(
+                f"{count}x {sql[:200]}" for sql, count, _ in stats.top_queries()
+            )
+        )
+        if getattr(settings, "TASKMANAGER_QUERY_BUDGET_STRICT", False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def render_metrics(fragments=None):
+    """Сводка view_metrics и cache_metrics в текстовом формате Prometheus
+
+    fragments - статистика кэша фрагментов {name: {"hits": n, "misses": n}}.
+    """
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+    views = view_metrics.stats()
+
+    def per_view(kind):
+        return [(_labels(view=view), counts[kind]) for view, counts in views.items()]
+
+    def seconds_per_view(kind):
+        return [(labels, value / 1e6) for labels, value in per_view(kind)]
+
+    family(
+        "taskmanager_requests_total", "counter", "HTTP requests by view.",
+        per_view("requests"),
+    )
+    family(
+        "taskmanager_request_errors_total", "counter",
+        "Responses with 5xx status by view.", per_view("errors"),
+    )
+
+    histogram = []
+    for view, counts in views.items():
+        cumulative = 0
+        for index, bound in enumerate(DURATION_BUCKETS):
+            cumulative += counts[f"bucket_{index}"]
+            histogram.append((f"_bucket{_labels(view=view, le=bound)}", cumulative))
+        histogram.append((f"_bucket{_labels(view=view, le='+Inf')}", counts["requests"]))
+        histogram.append((f"_sum{_labels(view=view)}", counts["duration_us"] / 1e6))
+        histogram.append((f"_count{_labels(view=view)}", counts["requests"]))
+    family(
+        "taskmanager_request_duration_seconds", "histogram",
+        "Request duration by view.", histogram,
+    )
+
+    family(
+        "taskmanager_db_queries_total", "counter", "SQL queries by view.",
+        per_view("queries"),
+    )
+    family(
+        "taskmanager_db_seconds_total", "counter", "Time spent in SQL by view.",
+        seconds_per_view("sql_us"),
+    )
+    family(
+        "taskmanager_template_seconds_total", "counter",
+        "Template rendering time by view.", seconds_per_view("template_us"),
+    )
+
+    caches = cache_metrics.stats()
+    family(
+        "taskmanager_cache_hits_total", "counter", "Cache hits by cache.",
+        [(_labels(cache=name), counts["hits"]) for name, counts in caches.items()],
+    )
+    family(
+        "taskmanager_cache_misses_total", "counter", "Cache misses by cache.",
+        [(_labels(cache=name), counts["misses"]) for name, counts in caches.items()],
+    )
+
+    if fragments is not None:
+        family(
+            "taskmanager_fragment_cache_hits_total", "counter",
+            "Template fragment cache hits by fragment.",
+            [(_labels(fragment=name), c["hits"]) for name, c in fragments.items()],
+        )
+        family(
+            "taskmanager_fragment_cache_misses_total", "counter",
+            "Template fragment cache misses by fragment.",
+            [(_labels(fragment=name), c["misses"]) for name, c in fragments.items()],
+        )
+    return "\n".join(lines) + "\n"
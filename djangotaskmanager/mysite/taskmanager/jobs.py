@@ -0,0 +1,325 @@
+import datetime
+import logging
+import os
+import random
+import socket
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import importexport
+from .caching import bump_project_version, bump_user_version
+from .models import (
+    Activity,
+    Assignee,
+    Attachment,
+    Blob,
+    Comment,
+    Job,
+    Notification,
+    NotificationEvent,
+    Project,
+    ProjectLabel,
+    ProjectMember,
+    ProjectSummary,
+    Status,
+    Task,
+    TaskLabel,
+    UploadSession,
+)
+
+"""
+Очередь фоновых задач в PostgreSQL
+
+Запрос ставит задачу (enqueue) в своей транзакции: если запрос откатится,
+задачи не будет. Команда run_jobs запускает воркеры, каждый забирает по одной
+задаче с SELECT ... FOR UPDATE SKIP LOCKED, так что воркеры не ждут друг
+друга и не берут одну задачу дважды. Строка блокируется только на время
+захвата, сам обработчик работает вне этой транзакции и пишет прогресс
+(progress/total), который видно на странице задачи.
+
+Упавшая задача повторяется с экспоненциальной паузой (TASKMANAGER_JOB_RETRY_DELAY,
+удваивается с каждой попыткой) до max_attempts раз; PermanentError завершает
+ее сразу. Задача воркера, который умер, не сообщая прогресс дольше
+TASKMANAGER_JOB_STALE_TIMEOUT секунд, возвращается в очередь. Поэтому
+обработчики должны выдерживать повторный запуск с середины.
+"""
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+class PermanentError(Exception):
+    """Ошибка, которую повтор не исправит"""
+
+
+def handler(kind):
+    """Зарегистрировать обработчик задач вида kind: func(job) -> result"""
+
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def enqueue(kind, payload=None, user=None, run_at=None, max_attempts=None):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        created_by=user,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts
+        or getattr(settings, "TASKMANAGER_JOB_MAX_ATTEMPTS", 5),
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker):
+    """Забрать следующую готовую задачу или None"""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.filter(state="queued", run_at__lte=now)
+            .select_for_update(skip_locked=True)
+            .order_by("run_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.state = "running"
+        job.locked_by = worker
+        job.locked_at = now
+        job.attempts += 1
+        job.error = ""
+        job.save(
+            update_fields=["state", "locked_by", "locked_at", "attempts", "error", "updated_at"]
+        )
+    return job
+
+
+def retry_delay(attempts):
+    """Пауза перед повтором в секундах: base * 2^(attempts-1), с разбросом"""
+    base = getattr(settings, "TASKMANAGER_JOB_RETRY_DELAY", 30)
+    delay = min(
+        base * 2 ** (attempts - 1), getattr(settings, "TASKMANAGER_JOB_RETRY_MAX_DELAY", 3600)
+    )
+    # Разброс, чтобы задачи, упавшие вместе, не повторялись одновременно
+    return delay * random.uniform(0.5, 1)
+
+
+def _owned(job):
+    """Задача, пока она числится за этим воркером"""
+    return Job.objects.filter(pk=job.pk, state="running", locked_by=job.locked_by)
+
+
+def report_progress(job, progress, total=None):
+    """Сохранить прогресс; вызывается вне транзакций обработчика, чтобы его было видно"""
+    job.progress = progress
+    if total is not None:
+        job.total = total
+    _owned(job).update(progress=progress, total=job.total, updated_at=timezone.now())
+
+
+def _finish(job, result):
+    _owned(job).update(
+        state="done",
+        result=result,
+        progress=Greatest(F("progress"), F("total")) if job.total else F("progress"),
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+
+
+def _fail(job, error):
+    now = timezone.now()
+    message = f"{type(error).__name__}: {error}"
+    if isinstance(error, PermanentError) or job.attempts >= job.max_attempts:
+        _owned(job).update(state="failed", error=message, finished_at=now, updated_at=now)
+        return
+    _owned(job).update(
+        state="queued",
+        error=message,
+        run_at=now + datetime.timedelta(seconds=retry_delay(job.attempts)),
+        locked_by="",
+        locked_at=None,
+        updated_at=now,
+    )
+
+
+def run(job):
+    func = HANDLERS.get(job.kind)
+    try:
+        if func is None:
+            raise PermanentError(f"Unknown job kind: {job.kind}")
+        result = func(job)
+    except Exception as error:
+        logger.exception("Job %s failed (attempt %s)", job, job.attempts)
+        _fail(job, error)
+        return False
+    _finish(job, result)
+    return True
+
+
+def requeue_stale(timeout=None):
+    """Вернуть в очередь задачи воркеров, которые давно не сообщали прогресс"""
+    timeout = timeout or getattr(settings, "TASKMANAGER_JOB_STALE_TIMEOUT", 600)
+    now = timezone.now()
+    stale = Job.objects.filter(
+        state="running", updated_at__lt=now - datetime.timedelta(seconds=timeout)
+    )
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        state="failed", error="Worker stopped responding", finished_at=now, updated_at=now
+    )
+    requeued = stale.update(
+        state="queued", locked_by="", locked_at=None, run_at=now, updated_at=now
+    )
+    return requeued + failed
+
+
+def work(worker=None, once=False, sleep=1.0, should_stop=None):
+    """Цикл воркера: число выполненных задач
+
+    once - выйти, когда готовых задач не осталось; should_stop() проверяется
+    между задачами.
+    """
+    worker = worker or worker_name()
+    processed = 0
+    while not (should_stop and should_stop()):
+        close_old_connections()
+        job = claim(worker)
+        if job is None:
+            if once:
+                break
+            requeue_stale()
+            time.sleep(sleep)
+            continue
+        run(job)
+        processed += 1
+    close_old_connections()
+    return processed
+
+
+# Обработчики
+
+
+def _raw_delete(queryset):
+    # Удаление без сбора объектов и сигналов: версии кэша и ссылки на блоки
+    # обновляются пачкой. QuerySet.delete() загрузил бы каждую строку пачки и
+    # вызвал на ней post_delete (журнал, версии, доска, счетчики блоков).
+    # Приватный _raw_delete - один DELETE без каскада, поэтому _delete_tasks
+    # удаляет дочерние строки сам, снизу вверх
+    return queryset._raw_delete(queryset.db)
+
+
+def _delete_tasks(task_ids):
+    """Удалить задачи и все их дочерние строки; вызывается в транзакции"""
+    users = set(
+        Assignee.objects.filter(task_id__in=task_ids).values_list("user_id", flat=True)
+    )
+    blobs = (
+        Attachment.objects.filter(task_id__in=task_ids, blob__isnull=False)
+        .values("blob_id")
+        .annotate(count=Count("id"))
+        .order_by("blob_id")
+    )
+    for row in blobs:
+        # Файл остается до gc_attachments, как и при обычном удалении вложения
+        Blob.objects.filter(pk=row["blob_id"]).update(
+            ref_count=Greatest(F("ref_count") - row["count"], 0),
+            updated_at=timezone.now(),
+        )
+
+    _raw_delete(Notification.objects.filter(event__task_id__in=task_ids))
+    for model in (
+        NotificationEvent,
+        Assignee,
+        TaskLabel,
+        Comment,
+        Attachment,
+        UploadSession,
+        Activity,
+    ):
+        _raw_delete(model.objects.filter(task_id__in=task_ids))
+    _raw_delete(Task.objects.filter(pk__in=task_ids))
+
+    for user_id in users:
+        bump_user_version(user_id)
+
+
+@handler("delete_project")
+def delete_project(job):
+    """Удалить проект пачками задач, каждая пачка в своей транзакции
+
+    Так ни одна транзакция не держит блокировки на тысячах строк. Участники
+    удаляются еще в запросе (ProjectDeleteView), поэтому проект сразу
+    пропадает из списков, а задачи исчезают по мере удаления.
+    """
+    project_id = job.payload["project_id"]
+    batch_size = getattr(settings, "TASKMANAGER_JOB_DELETE_BATCH_SIZE", 500)
+    tasks = Task.objects.filter(project_id=project_id)
+    # При повторе продолжаем с уже удаленного
+    done = job.progress
+    report_progress(job, done, done + tasks.count())
+
+    while True:
+        with transaction.atomic():
+            task_ids = list(tasks.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not task_ids:
+                break
+            _delete_tasks(task_ids)
+            bump_project_version(project_id)
+        done += len(task_ids)
+        report_progress(job, done)
+
+    with transaction.atomic():
+        for model in (ProjectLabel, Status, ProjectSummary):
+            _raw_delete(model.objects.filter(project_id=project_id))
+        # Оставшиеся участники - через сигналы: кэш ролей и версии пользователей
+        ProjectMember.objects.filter(project_id=project_id).delete()
+        deleted = _raw_delete(Project.objects.filter(pk=project_id))
+        bump_project_version(project_id)
+    return {"tasks": done, "project_deleted": bool(deleted)}
+
+
+@handler("import_tasks")
+def import_tasks(job):
+    """Импорт файла, сохраненного ProjectTaskImportView; файл удаляется в конце
+
+    Повтор после сбоя импортирует файл заново, поэтому задача импорта не
+    повторяется (max_attempts=1).
+    """
+    payload = job.payload
+    project = Project.objects.filter(pk=payload["project_id"]).first()
+    if project is None:
+        raise PermanentError("Project does not exist")
+    if not os.path.exists(payload["path"]):
+        raise PermanentError("Import file is missing")
+
+    try:
+        # Первый проход только считает записи - для прогресса
+        with open(payload["path"], "rb") as f:
+            records = importexport.iter_records(importexport.open_text(f), payload["format"])
+            report_progress(job, 0, sum(1 for _ in records))
+
+        def progress(result):
+            report_progress(job, result.tasks + len(result.errors))
+
+        with open(payload["path"], "rb") as f:
+            records = importexport.iter_records(importexport.open_text(f), payload["format"])
+            importer = importexport.TaskImporter(project, user=job.created_by)
+            result = importer.run(records, progress=progress)
+    finally:
+        if os.path.exists(payload["path"]):
+            os.unlink(payload["path"])
+    return result.as_dict()
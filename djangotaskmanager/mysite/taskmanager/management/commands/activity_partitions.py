@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from taskmanager import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Создает секции таблицы Activity на будущие месяцы и архивирует старые "
+        "секции в сжатые NDJSON-файлы. Предназначена для периодического запуска."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead", type=int, default=3, help="На сколько месяцев вперед"
+        )
+        parser.add_argument(
+            "--archive",
+            action="store_true",
+            help="Архивировать секции старше срока хранения",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            default=settings.TASKMANAGER_ACTIVITY_RETENTION_MONTHS,
+        )
+        parser.add_argument(
+            "--archive-dir", default=settings.TASKMANAGER_ACTIVITY_ARCHIVE_DIR
+        )
+        parser.add_argument(
+            "--keep-detached",
+            action="store_true",
+            help="Не удалять отсоединенные секции после выгрузки",
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            raise CommandError("Activity partitioning requires PostgreSQL")
+
+        for name in partitioning.ensure_partitions(options["months_ahead"]):
+            self.stdout.write(f"Created partition {name}")
+
+        if options["archive"]:
+            for path in partitioning.archive_old_partitions(
+                options["retention_months"],
+                options["archive_dir"],
+                drop=not options["keep_detached"],
+            ):
+                self.stdout.write(f"Archived to {path}")
+
+        self.stdout.write(self.style.SUCCESS("Activity partitions are up to date"))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from taskmanager.models import Comment, Task
+from taskmanager.search import COMMENT_VECTOR, TASK_VECTOR
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет поисковые векторы задач и комментариев пачками по id. "
+        "Каждая пачка обновляется отдельной короткой транзакцией, "
+        "таблицы целиком не блокируются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Пересчитать все векторы, а не только пустые",
+        )
+
+    def handle(self, *args, **options):
+        for model, vector in ((Task, TASK_VECTOR), (Comment, COMMENT_VECTOR)):
+            updated = self.backfill(model, vector, options["batch_size"], options["all"])
+            self.stdout.write(
+                self.style.SUCCESS(f"Updated {updated} {model._meta.verbose_name_plural}")
+            )
+
+    def backfill(self, model, vector, batch_size, refresh_all):
+        queryset = model.objects.order_by("id")
+        if not refresh_all:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        updated, last_id = 0, 0
+        while True:
+            ids = list(
+                queryset.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return updated
+            # Вне atomic: в режиме autocommit каждая пачка - своя транзакция
+            updated += model.objects.filter(id__in=ids).update(search_vector=vector)
+            last_id = ids[-1]
@@ -0,0 +1,177 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from taskmanager import synthetic
+
+from .benchmark_views import percentile
+
+MODES = {
+    # Новое соединение на каждый запрос
+    "none": {"CONN_MAX_AGE": 0},
+    "persistent": {"CONN_MAX_AGE": 60},
+    "pool": {"CONN_MAX_AGE": 0, "pool": True},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Пропускная способность страниц без повторного использования соединений, "
+        "с постоянными соединениями (CONN_MAX_AGE) и с пулом psycopg. Данные "
+        "создаются в отдельной тестовой базе; запросы идут тестовым клиентом из "
+        "нескольких потоков, соединения закрываются в начале и конце запроса, как "
+        "у WSGI-сервера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modes", default=",".join(MODES), help=f"Режимы через запятую: {', '.join(MODES)}"
+        )
+        parser.add_argument("--requests", type=int, default=200, help="Запросов на режим")
+        parser.add_argument("--concurrency", type=int, default=4, help="Параллельных потоков")
+        parser.add_argument(
+            "--scale", default="small", help=f"Размер набора: {', '.join(synthetic.SCALES)}"
+        )
+        parser.add_argument("--output", help="Файл для результатов в JSON")
+
+    def handle(self, *args, **options):
+        modes = [name.strip() for name in options["modes"].split(",") if name.strip()]
+        unknown = [name for name in modes if name not in MODES]
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(unknown)}")
+        if options["scale"] not in synthetic.SCALES:
+            raise CommandError(f"Unknown scale: {options['scale']}")
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1")
+
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        settings_dict = connections["default"].settings_dict
+        initial = (settings_dict["CONN_MAX_AGE"], settings_dict["OPTIONS"].get("pool"))
+        try:
+            owner, projects, _ = synthetic.generate(synthetic.SCALES[options["scale"]], seed=1)
+            self.urls = [
+                reverse("dashboard"),
+                reverse("project_list"),
+                reverse("project_detail", args=[projects[0].pk]),
+                reverse("task_list"),
+            ]
+            self.owner = owner
+            results = {
+                "created_at": timezone.now().isoformat(),
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "modes": {},
+            }
+            self.stdout.write(
+                f"{'mode':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'new conns':>10}"
+            )
+            for mode in modes:
+                row = self.run_mode(mode, options)
+                results["modes"][mode] = row
+                self.stdout.write(
+                    f"{mode:<12} {row['requests_per_second']:>8.1f} {row['p50_ms']:>8.1f} "
+                    f"{row['p95_ms']:>8.1f} {row['new_connections']:>10}"
+                )
+        finally:
+            self.configure(*initial)
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def configure(self, conn_max_age, pool=None, concurrency=1):
+        """Переключить настройки соединения default во всех потоках"""
+        connection = connections["default"]
+        connection.close()
+        if connection.pool is not None:
+            connection.close_pool()
+        # Обертки соединений всех потоков ссылаются на этот же словарь
+        connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+        connection.settings_dict["OPTIONS"].pop("pool", None)
+        if pool is True:
+            pool = {"min_size": 1, "max_size": concurrency}
+        if pool:
+            connection.settings_dict["OPTIONS"]["pool"] = pool
+
+    def run_mode(self, mode, options):
+        config = MODES[mode]
+        self.configure(config["CONN_MAX_AGE"], config.get("pool"), options["concurrency"])
+
+        opened = []
+        lock = threading.Lock()
+
+        def count(sender, connection, **kwargs):
+            with lock:
+                opened.append(connection.alias)
+
+        local = threading.local()
+
+        def request(number):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = Client()
+                client.force_login(self.owner)
+            url = self.urls[number % len(self.urls)]
+            # Тестовый клиент не закрывает соединения сам - как WSGI-сервер
+            close_old_connections()
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = (time.perf_counter() - started) * 1000
+            close_old_connections()
+            if response.status_code >= 400:
+                raise CommandError(f"GET {url} returned {response.status_code}")
+            return elapsed
+
+        barrier = threading.Barrier(options["concurrency"])
+
+        def close(_):
+            # Каждый поток закрывает свои соединения: барьер не дает одному
+            # потоку забрать два закрытия
+            barrier.wait()
+            connections.close_all()
+
+        with ThreadPoolExecutor(options["concurrency"]) as executor:
+            # Прогрев: вход пользователей, кэш ролей и фрагментов
+            list(executor.map(request, range(options["concurrency"] * len(self.urls))))
+            pool = connections["default"].pool
+            if pool is not None:
+                pool.pop_stats()
+            connection_created.connect(count)
+            try:
+                started = time.perf_counter()
+                latencies = list(executor.map(request, range(options["requests"])))
+                duration = time.perf_counter() - started
+            finally:
+                connection_created.disconnect(count)
+                list(executor.map(close, range(options["concurrency"])))
+
+        if pool is not None:
+            # С пулом connection_created срабатывает на каждую выдачу из пула,
+            # новые соединения с сервером считает сам пул
+            opened = range(pool.get_stats().get("connections_num", 0))
+
+        return {
+            "requests_per_second": round(options["requests"] / duration, 1),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "new_connections": len(opened),
+        }
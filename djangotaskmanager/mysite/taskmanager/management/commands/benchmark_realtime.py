@@ -0,0 +1,118 @@
+import asyncio
+import statistics
+import time
+
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from taskmanager import realtime
+from taskmanager.models import ProjectMember
+from taskmanager.routing import websocket_urlpatterns
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест доски в реальном времени: подключает N подписчиков к "
+        "доске проекта в одном процессе (один воркер) и измеряет задержку "
+        "доставки изменений всем подписчикам. Клиенты работают в том же цикле "
+        "событий, что и сервер, поэтому результат - нижняя оценка."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subscribers",
+            default="100,500,1000,2000",
+            help="Число подписчиков через запятую, по прогону на каждое",
+        )
+        parser.add_argument(
+            "--messages", type=int, default=20, help="Изменений на прогон"
+        )
+        parser.add_argument("--project", type=int, help="ID проекта")
+        parser.add_argument("--user", help="Участник проекта (username)")
+        parser.add_argument(
+            "--timeout", type=float, default=10, help="Ожидание одного кадра, с"
+        )
+
+    def handle(self, *args, **options):
+        members = ProjectMember.objects.select_related("user")
+        if options["project"]:
+            members = members.filter(project_id=options["project"])
+        if options["user"]:
+            members = members.filter(user__username=options["user"])
+        member = members.first()
+        if member is None:
+            raise CommandError("No matching project member; create a project first")
+
+        try:
+            counts = [int(count) for count in options["subscribers"].split(",")]
+        except ValueError:
+            raise CommandError("--subscribers must be a comma-separated list of numbers")
+
+        # Без окна слияния каждое изменение уходит отдельным кадром
+        settings.TASKMANAGER_REALTIME_COALESCE_DELAY = 0
+        self.stdout.write(
+            f"Project {member.project_id}, layer {type(get_channel_layer()).__name__}"
+        )
+        self.stdout.write(
+            f"{'subscribers':>11} {'connect s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'max ms':>8} {'frames/s':>10}"
+        )
+        asyncio.run(self.run_all(member, counts, options))
+
+    async def run_all(self, member, counts, options):
+        for count in counts:
+            row = await self.run(member, count, options["messages"], options["timeout"])
+            self.stdout.write(
+                f"{count:>11} {row['connect']:>10.2f} {row['p50']:>8.1f} "
+                f"{row['p95']:>8.1f} {row['max']:>8.1f} {row['rate']:>10.0f}"
+            )
+
+    async def run(self, member, count, messages, timeout):
+        application = URLRouter(websocket_urlpatterns)
+        path = f"/ws/projects/{member.project_id}/board/"
+        communicators = []
+        for _ in range(count):
+            communicator = WebsocketCommunicator(application, path)
+            communicator.scope["user"] = member.user
+            communicators.append(communicator)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(c.connect(timeout) for c in communicators))
+        connect_time = time.perf_counter() - started
+        if not all(connected for connected, _ in results):
+            raise CommandError("Some subscribers were rejected")
+
+        layer = get_channel_layer()
+        group = realtime.project_group(member.project_id)
+        latencies = []
+
+        async def receive(communicator, sent_at):
+            await communicator.receive_json_from(timeout)
+            latencies.append((time.perf_counter() - sent_at) * 1000)
+
+        started = time.perf_counter()
+        for number in range(messages):
+            change = {
+                "key": f"task:{number}",
+                "event": "task.updated",
+                "id": number,
+                "fields": {"title": f"Benchmark {number}"},
+            }
+            sent_at = time.perf_counter()
+            await layer.group_send(group, {"type": "board.changes", "changes": [change]})
+            await asyncio.gather(*(receive(c, sent_at) for c in communicators))
+        elapsed = time.perf_counter() - started
+
+        await asyncio.gather(*(c.disconnect() for c in communicators))
+
+        latencies.sort()
+        return {
+            "connect": connect_time,
+            "p50": statistics.median(latencies),
+            "p95": latencies[int(len(latencies) * 0.95) - 1],
+            "max": latencies[-1],
+            "rate": count * messages / elapsed,
+        }
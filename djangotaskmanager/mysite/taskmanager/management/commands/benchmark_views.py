@@ -0,0 +1,144 @@
+import json
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from taskmanager import synthetic
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест страниц: для каждого размера синтетического набора "
+        "(см. generate_synthetic_data) создает данные в отдельной тестовой базе и "
+        "запрашивает дашборд, проект, форму и сохранение проекта и список задач "
+        "тестовым клиентом. Выводит p50/p95 задержки и число SQL-запросов; "
+        "--output сохраняет результат в JSON для сравнения между версиями."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            default="small,medium",
+            help=f"Размеры наборов через запятую: {', '.join(synthetic.SCALES)}",
+        )
+        parser.add_argument("--requests", type=int, default=30, help="Запросов на страницу")
+        parser.add_argument("--warmup", type=int, default=3, help="Прогревочных запросов")
+        parser.add_argument(
+            "--cold", action="store_true", help="Очищать кэш перед каждым запросом"
+        )
+        parser.add_argument("--seed", type=int, default=1, help="Зерно генератора")
+        parser.add_argument("--output", help="Файл для результатов в JSON")
+        parser.add_argument(
+            "--keepdb", action="store_true", help="Не удалять тестовую базу после прогона"
+        )
+
+    def handle(self, *args, **options):
+        scales = [name.strip() for name in options["scales"].split(",") if name.strip()]
+        unknown = [name for name in scales if name not in synthetic.SCALES]
+        if unknown:
+            raise CommandError(f"Unknown scales: {', '.join(unknown)}")
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1")
+
+        # Данные создаются в тестовой базе: рабочая не затрагивается
+        setup_test_environment()
+        databases = setup_databases(
+            verbosity=0, interactive=False, keepdb=options["keepdb"]
+        )
+        try:
+            results = {
+                "created_at": timezone.now().isoformat(),
+                "requests": options["requests"],
+                "cold": options["cold"],
+                "scales": {},
+            }
+            self.stdout.write(
+                f"{'scale':<8} {'view':<20} {'p50 ms':>8} {'p95 ms':>8} "
+                f"{'max ms':>8} {'queries':>8}"
+            )
+            for name in scales:
+                results["scales"][name] = self.run_scale(name, options)
+        finally:
+            teardown_databases(databases, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run_scale(self, name, options):
+        call_command("flush", interactive=False, verbosity=0)
+        cache.clear()
+        scale = synthetic.SCALES[name]
+        started = time.perf_counter()
+        owner, projects, counts = synthetic.generate(scale, seed=options["seed"])
+        self.stderr.write(f"{name}: generated in {time.perf_counter() - started:.1f} s")
+
+        client = Client()
+        client.force_login(owner)
+        project = projects[0]
+        pages = [
+            ("dashboard", "get", reverse("dashboard"), None),
+            ("project_detail", "get", reverse("project_detail", args=[project.pk]), None),
+            ("project_update", "get", reverse("project_update", args=[project.pk]), None),
+            (
+                "project_update_post",
+                "post",
+                reverse("project_update", args=[project.pk]),
+                {"name": project.name, "description": project.description},
+            ),
+            ("task_list", "get", reverse("task_list"), None),
+        ]
+
+        views = {}
+        for view, method, url, data in pages:
+            row = self.measure(client, method, url, data, options)
+            views[view] = row
+            self.stdout.write(
+                f"{name:<8} {view:<20} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+                f"{row['max_ms']:>8.1f} {row['queries']:>8}"
+            )
+        return {"size": scale.as_dict(), "rows": counts, "views": views}
+
+    def measure(self, client, method, url, data, options):
+        latencies = []
+        queries = []
+        for number in range(options["warmup"] + options["requests"]):
+            if options["cold"]:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code >= 400:
+                raise CommandError(f"{method.upper()} {url} returned {response.status_code}")
+            if number >= options["warmup"]:
+                latencies.append(elapsed)
+                queries.append(len(captured))
+
+        return {
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "max_ms": round(max(latencies), 2),
+            "queries": round(statistics.median(queries)),
+        }
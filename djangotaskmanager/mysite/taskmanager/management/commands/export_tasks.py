@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from taskmanager.importexport import FORMATS, detect_format, iter_export
+from taskmanager.models import Project
+
+
+class Command(BaseCommand):
+    help = "Потоковый экспорт задач проекта в CSV или NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_id", type=int)
+        parser.add_argument("--output", help="Путь к файлу (по умолчанию stdout)")
+        parser.add_argument("--format", choices=FORMATS, help="По умолчанию по расширению")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options["project_id"])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {options['project_id']} does not exist")
+
+        fmt = options["format"] or detect_format(options["output"])
+        lines = iter_export(project, fmt, chunk_size=options["chunk_size"])
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,38 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from taskmanager.caching import fragment_metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает попадания и промахи кэша фрагментов шаблонов по именам "
+        "фрагментов. Нужен общий для воркеров кэш метрик "
+        "(METRICS_CACHE_BACKEND: file, Redis)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Обнулить счетчики")
+
+    def handle(self, *args, **options):
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+            self.stderr.write(
+                self.style.WARNING(
+                    "locmem cache is per process: "
+                    "counters of the web workers are not visible here"
+                )
+            )
+
+        stats = fragment_metrics.stats()
+        self.stdout.write(f"{'fragment':<28} {'hits':>10} {'misses':>10} {'hit rate':>9}")
+        for name, counts in stats.items():
+            total = counts["hits"] + counts["misses"]
+            rate = counts["hits"] / total if total else 0
+            self.stdout.write(
+                f"{name:<28} {counts['hits']:>10} {counts['misses']:>10} {rate:>9.1%}"
+            )
+
+        if options["reset"]:
+            fragment_metrics.reset()
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
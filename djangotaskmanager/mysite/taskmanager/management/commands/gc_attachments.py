@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F
+
+from taskmanager import attachments
+from taskmanager.models import Blob
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет файлы вложений, на которые не осталось ссылок, и брошенные "
+        "загрузки по частям. Блок удаляется только после периода ожидания: "
+        "тот же файл могут загрузить снова. Запускать ежедневно."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="Сколько хранить блок без ссылок, ч",
+        )
+        parser.add_argument(
+            "--upload-max-age-hours",
+            type=float,
+            default=24,
+            help="Через сколько часов без новых частей загрузка считается брошенной",
+        )
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Пересчитать счетчики ссылок по таблице вложений",
+        )
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            fixed = 0
+            for blob in (
+                Blob.objects.annotate(actual=Count("attachments"))
+                .exclude(ref_count=F("actual"))
+                .iterator()
+            ):
+                Blob.objects.filter(pk=blob.pk).update(ref_count=blob.actual)
+                fixed += 1
+            self.stdout.write(f"Fixed {fixed} reference counts")
+
+        uploads = attachments.cleanup_uploads(
+            timedelta(hours=options["upload_max_age_hours"])
+        )
+        blobs = attachments.collect_garbage(timedelta(hours=options["grace_hours"]))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Removed {blobs} unreferenced blobs and {uploads} stale uploads"
+            )
+        )
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from taskmanager import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Создает детерминированный синтетический набор данных заданного размера "
+        "для нагрузочных тестов: проекты, участников, статусы, метки, задачи с "
+        "исполнителями, метками, комментариями и журналом."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            default="small",
+            choices=sorted(synthetic.SCALES),
+            help="Готовый размер набора (отдельные параметры ниже его переопределяют)",
+        )
+        parser.add_argument("--projects", type=int, help="Число проектов")
+        parser.add_argument("--users", type=int, help="Число пользователей")
+        parser.add_argument("--members", type=int, help="Участников на проект")
+        parser.add_argument("--tasks", type=int, help="Задач на проект")
+        parser.add_argument("--comments", type=int, help="Комментариев на задачу в среднем")
+        parser.add_argument("--activities", type=int, help="Записей журнала на задачу в среднем")
+        parser.add_argument("--seed", type=int, default=1, help="Зерно генератора")
+        parser.add_argument(
+            "--password", default="synthetic", help="Пароль пользователей набора"
+        )
+        parser.add_argument(
+            "--clear", action="store_true", help="Удалить набор с тем же seed перед созданием"
+        )
+
+    def handle(self, *args, **options):
+        params = synthetic.SCALES[options["scale"]].as_dict()
+        for name in ("projects", "users", "members", "tasks", "comments", "activities"):
+            if options[name] is not None:
+                params[name] = options[name]
+        if params["users"] < 1 or params["projects"] < 1:
+            raise CommandError("--users and --projects must be at least 1")
+        scale = synthetic.Scale(**params)
+
+        if options["clear"]:
+            synthetic.clear(options["seed"])
+        elif synthetic.exists(options["seed"]):
+            raise CommandError(
+                f"Data set with seed {options['seed']} already exists, use --clear"
+            )
+
+        def progress(index):
+            self.stdout.write(f"Project {index + 1}/{scale.projects}")
+
+        owner, _, counts = synthetic.generate(
+            scale, seed=options["seed"], password=options["password"], progress=progress
+        )
+        for model, count in counts.items():
+            self.stdout.write(f"{model:<16} {count:>10}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created data set {synthetic.prefix(options['seed'])}*, "
+                f"owner of all projects: {owner.username}"
+            )
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from taskmanager import attachments
+from taskmanager.models import Blob
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит превью изображений, которые не успел обработать фоновый пул "
+        "(например, после перезапуска процесса)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Повторить и неудачные попытки",
+        )
+        parser.add_argument("--limit", type=int, help="Не больше N изображений")
+
+    def handle(self, *args, **options):
+        states = ["pending", "failed"] if options["retry_failed"] else ["pending"]
+        digests = Blob.objects.filter(thumbnail_status__in=states).order_by(
+            "created_at"
+        )
+        if options["limit"]:
+            digests = digests[: options["limit"]]
+
+        results = {"ready": 0, "failed": 0}
+        for digest in digests.values_list("pk", flat=True).iterator():
+            results[attachments.generate_thumbnail(digest)] += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built {results['ready']} thumbnails, {results['failed']} failed"
+            )
+        )
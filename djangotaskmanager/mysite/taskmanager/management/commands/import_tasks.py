@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from taskmanager.importexport import (
+    FORMATS,
+    TaskImporter,
+    detect_format,
+    iter_records,
+)
+from taskmanager.models import Project
+
+
+class Command(BaseCommand):
+    help = "Массовый импорт задач в проект из CSV или NDJSON файла"
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_id", type=int)
+        parser.add_argument("path", help="Путь к файлу")
+        parser.add_argument("--format", choices=FORMATS, help="По умолчанию по расширению")
+        parser.add_argument("--user", help="Автор задач без поля creator (username)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options["project_id"])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {options['project_id']} does not exist")
+
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        fmt = options["format"] or detect_format(options["path"])
+        importer = TaskImporter(project, user=user, batch_size=options["batch_size"])
+        with open(options["path"], encoding="utf-8", newline="") as stream:
+            result = importer.run(iter_records(stream, fmt))
+
+        for error in result.errors:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result.tasks} tasks, {result.assignees} assignees, "
+                f"{result.labels} labels, {result.comments} comments"
+            )
+        )
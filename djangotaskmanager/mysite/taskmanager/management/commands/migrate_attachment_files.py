@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from taskmanager import attachments
+from taskmanager.models import Attachment
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит файлы вложений, загруженных до хранилища по содержимому "
+        "(task_attachments/), в хранилище blobs/ с дедупликацией."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--delete-originals",
+            action="store_true",
+            help="Удалить исходные файлы после переноса",
+        )
+
+    def handle(self, *args, **options):
+        moved = failed = 0
+        queryset = Attachment.objects.filter(blob__isnull=True).exclude(file="")
+        for attachment in queryset.order_by("id").iterator():
+            try:
+                attachments.adopt_legacy_file(attachment)
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f"Attachment {attachment.pk}: {error}")
+                continue
+            if options["delete_originals"]:
+                attachment.file.delete(save=True)
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} attachments, {failed} failed"))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from taskmanager.models import Task
+from taskmanager.ordering import column_needs_rebalance, rebalance_column
+
+
+class Command(BaseCommand):
+    help = (
+        "Перенумеровывает колонки задач, в которых исчерпались промежутки "
+        "task_order. Предназначена для периодического запуска."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "project_ids", nargs="*", type=int, help="ID проектов (по умолчанию все)"
+        )
+        parser.add_argument(
+            "--min-gap",
+            type=int,
+            default=2,
+            help="Перенумеровать колонку, если соседние задачи ближе этого значения",
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Перенумеровать все колонки"
+        )
+
+    def handle(self, *args, **options):
+        columns = Task.objects.order_by().values_list("project_id", "status_id")
+        if options["project_ids"]:
+            columns = columns.filter(project_id__in=options["project_ids"])
+
+        rebalanced = 0
+        for project_id, status_id in columns.distinct():
+            if not options["force"] and not column_needs_rebalance(
+                project_id, status_id, options["min_gap"]
+            ):
+                continue
+            with transaction.atomic():
+                changed = rebalance_column(project_id, status_id)
+            rebalanced += 1
+            self.stdout.write(
+                f"Project {project_id}, status {status_id}: {changed} tasks renumbered"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebalanced {rebalanced} columns"))
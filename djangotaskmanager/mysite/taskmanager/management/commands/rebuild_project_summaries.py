@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from taskmanager.caching import bump_project_version
+from taskmanager.models import Project, ProjectSummary
+
+SUMMARY_FIELDS = [*ProjectSummary.COUNTERS, "status_counts", "owner_id"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает денормализованные сводки проектов. "
+        "Запускайте периодически, чтобы обновлять счетчики просроченных задач."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "project_ids", nargs="*", type=int, help="ID проектов (по умолчанию все)"
+        )
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by("id")
+        if options["project_ids"]:
+            projects = projects.filter(id__in=options["project_ids"])
+        project_ids = projects.values_list("id", flat=True).iterator()
+
+        rebuilt = 0
+        for project_id in project_ids:
+            with transaction.atomic():
+                before = (
+                    ProjectSummary.objects.filter(project_id=project_id)
+                    .values(*SUMMARY_FIELDS)
+                    .first()
+                )
+                summary = ProjectSummary.rebuild(project_id)
+                # Закэшированные страницы показывают счетчики сводки
+                if before != {field: getattr(summary, field) for field in SUMMARY_FIELDS}:
+                    bump_project_version(project_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} project summaries"))
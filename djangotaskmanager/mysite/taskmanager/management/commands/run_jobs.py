@@ -0,0 +1,59 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from taskmanager import jobs
+
+
+def _worker(once, sleep):
+    stopping = []
+    # Текущая задача дорабатывает, следующая не берется
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    jobs.work(once=once, sleep=sleep, should_stop=lambda: bool(stopping))
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет фоновые задачи из очереди в PostgreSQL (удаление проектов, "
+        "импорт). Несколько процессов разбирают очередь параллельно; "
+        "SIGTERM или Ctrl+C дают текущим задачам завершиться."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes", type=int, default=1, help="Число процессов-воркеров"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Выйти, когда готовых задач не осталось"
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=1.0, help="Пауза при пустой очереди, с"
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] <= 1:
+            processed = jobs.work(once=options["once"], sleep=options["sleep"])
+            self.stdout.write(f"Processed {processed} jobs")
+            return
+
+        # Соединения родителя не должны достаться дочерним процессам
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=_worker, args=(options["once"], options["sleep"]))
+            for _ in range(options["processes"])
+        ]
+        for process in workers:
+            process.start()
+        self.stdout.write(f"Started {len(workers)} workers")
+        try:
+            for process in workers:
+                process.join()
+        except KeyboardInterrupt:
+            for process in workers:
+                process.terminate()
+            for process in workers:
+                process.join()
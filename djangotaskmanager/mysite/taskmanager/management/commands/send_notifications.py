@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from taskmanager import notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Рассылает уведомления: раскладывает события очереди по получателям и "
+        "отправляет дайджесты пачками через одно соединение. Работает в цикле "
+        "или один проход с --once (например, из cron раз в минуту)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Один проход и выход")
+        parser.add_argument(
+            "--sleep", type=float, default=30, help="Пауза между проходами, с"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, help="Событий и писем в пачке (по умолчанию из настроек)"
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=30,
+            help="Удалять обработанные события старше N дней (0 - не удалять)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            events = 0
+            while processed := notifications.fan_out(options["batch_size"]):
+                events += processed
+            sent = notifications.send_digests(batch_size=options["batch_size"])
+            deleted = 0
+            if options["retention_days"]:
+                deleted = notifications.cleanup(options["retention_days"])
+            if events or sent or deleted or options["once"]:
+                self.stdout.write(
+                    f"Events {events}, digests sent {sent}, old events deleted {deleted}"
+                )
+            if options["once"]:
+                return
+            time.sleep(options["sleep"])
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0003_remove_project_owner_alter_projectmember_role'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['task', '-created_at'], name='activity_task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['task', '-created_at'], name='comment_task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-created_at', '-id'], name='project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'task_order', '-created_at'], name='task_project_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'status', 'task_order'], name='task_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['task_order', '-created_at', 'id'], name='task_order_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='projectmember',
+            constraint=models.UniqueConstraint(condition=models.Q(('role', 'owner')), fields=('project',), name='unique_project_owner'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0004_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='status',
+            name='is_closed',
+            field=models.BooleanField(default=False, verbose_name='Closes Task'),
+        ),
+        migrations.CreateModel(
+            name='ProjectSummary',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='taskmanager.project')),
+                ('task_count', models.PositiveIntegerField(default=0)),
+                ('open_task_count', models.PositiveIntegerField(default=0)),
+                ('overdue_task_count', models.PositiveIntegerField(default=0)),
+                ('status_counts', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Project summary',
+                'verbose_name_plural': 'Project summaries',
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:50
+
+import django.db.models.constraints
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0005_project_summary'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='status',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='status',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('project', 'order'), name='unique_status_order'),
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Помесячное секционирование taskmanager_activity на PostgreSQL.
+# На других СУБД миграция ничего не делает.
+
+import datetime
+
+from django.db import migrations
+
+TABLE = "taskmanager_activity"
+OLD_TABLE = "taskmanager_activity_unpartitioned"
+MONTHS_AHEAD = 3
+
+
+def _month_bound(year, month):
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return f"'{year:04d}-{month:02d}-01 00:00:00+00'"
+
+
+def partition_activity(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    execute = schema_editor.execute
+    execute(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}")
+    execute(f"ALTER INDEX IF EXISTS {TABLE}_pkey RENAME TO {OLD_TABLE}_pkey")
+    execute(f"ALTER SEQUENCE IF EXISTS {TABLE}_id_seq RENAME TO {OLD_TABLE}_id_seq")
+    # Первичный ключ секционированной таблицы обязан включать ключ секционирования
+    execute(
+        f"""
+        CREATE TABLE {TABLE} (
+            id bigint NOT NULL,
+            action_type varchar(50) NOT NULL,
+            old_values jsonb NULL,
+            new_values jsonb NULL,
+            created_at timestamp with time zone NOT NULL,
+            task_id bigint NOT NULL,
+            user_id integer NOT NULL,
+            CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+    execute(
+        f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')"
+    )
+    execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT min(created_at) FROM {OLD_TABLE}")
+        oldest = cursor.fetchone()[0]
+    now = datetime.datetime.now(datetime.timezone.utc)
+    first = oldest or now
+    year, month = first.year, first.month
+    last = now.year * 12 + now.month + MONTHS_AHEAD
+    while year * 12 + month <= last:
+        execute(
+            f"CREATE TABLE {TABLE}_p{year:04d}{month:02d} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ({_month_bound(year, month)}) "
+            f"TO ({_month_bound(year, month + 1)})"
+        )
+        year, month = year + month // 12, month % 12 + 1
+
+    execute(
+        f"INSERT INTO {TABLE} (id, action_type, old_values, new_values, created_at, "
+        f"task_id, user_id) SELECT id, action_type, old_values, new_values, "
+        f"created_at, task_id, user_id FROM {OLD_TABLE}"
+    )
+    execute(
+        f"SELECT setval('{TABLE}_id_seq', coalesce((SELECT max(id) FROM {TABLE}), 0) + 1, false)"
+    )
+    execute(f"DROP TABLE {OLD_TABLE}")
+
+    execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_task_id_fk FOREIGN KEY (task_id) "
+        f"REFERENCES taskmanager_task (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_user_id_fk FOREIGN KEY (user_id) "
+        f"REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    execute(
+        f"CREATE INDEX activity_task_created_idx ON {TABLE} (task_id, created_at DESC)"
+    )
+    execute(f"CREATE INDEX {TABLE}_user_id_idx ON {TABLE} (user_id)")
+
+
+def unpartition_activity(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    execute = schema_editor.execute
+    execute(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}")
+    execute(f"ALTER INDEX {TABLE}_pkey RENAME TO {OLD_TABLE}_pkey")
+    execute(f"ALTER INDEX activity_task_created_idx RENAME TO {OLD_TABLE}_task_idx")
+    execute(f"ALTER INDEX {TABLE}_user_id_idx RENAME TO {OLD_TABLE}_user_id_idx")
+    execute(f"ALTER SEQUENCE {TABLE}_id_seq RENAME TO {OLD_TABLE}_id_seq")
+    execute(
+        f"""
+        CREATE TABLE {TABLE} (
+            id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            action_type varchar(50) NOT NULL,
+            old_values jsonb NULL,
+            new_values jsonb NULL,
+            created_at timestamp with time zone NOT NULL,
+            task_id bigint NOT NULL REFERENCES taskmanager_task (id)
+                DEFERRABLE INITIALLY DEFERRED,
+            user_id integer NOT NULL REFERENCES auth_user (id)
+                DEFERRABLE INITIALLY DEFERRED
+        )
+        """
+    )
+    execute(f"INSERT INTO {TABLE} OVERRIDING SYSTEM VALUE SELECT * FROM {OLD_TABLE}")
+    execute(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+        f"coalesce((SELECT max(id) FROM {TABLE}), 0) + 1, false)"
+    )
+    execute(f"DROP TABLE {OLD_TABLE}")
+    execute(
+        f"CREATE INDEX activity_task_created_idx ON {TABLE} (task_id, created_at DESC)"
+    )
+    execute(f"CREATE INDEX {TABLE}_task_id_idx ON {TABLE} (task_id)")
+    execute(f"CREATE INDEX {TABLE}_user_id_idx ON {TABLE} (user_id)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("taskmanager", "0006_status_order_deferrable"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_activity, unpartition_activity),
+    ]
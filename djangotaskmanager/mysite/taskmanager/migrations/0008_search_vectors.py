@@ -0,0 +1,73 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:56
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Векторы поддерживаются триггерами, поэтому покрывают и bulk_create/update.
+# Конфигурация 'simple' не зависит от языка текста (см. taskmanager/search.py).
+TRIGGERS_SQL = """
+CREATE FUNCTION taskmanager_task_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER taskmanager_task_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description, search_vector
+    ON taskmanager_task
+    FOR EACH ROW EXECUTE FUNCTION taskmanager_task_search_vector();
+
+CREATE FUNCTION taskmanager_comment_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := setweight(to_tsvector('simple', coalesce(NEW.content, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER taskmanager_comment_search_vector_update
+    BEFORE INSERT OR UPDATE OF content, search_vector
+    ON taskmanager_comment
+    FOR EACH ROW EXECUTE FUNCTION taskmanager_comment_search_vector();
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS taskmanager_task_search_vector_update ON taskmanager_task;
+DROP FUNCTION IF EXISTS taskmanager_task_search_vector();
+DROP TRIGGER IF EXISTS taskmanager_comment_search_vector_update ON taskmanager_comment;
+DROP FUNCTION IF EXISTS taskmanager_comment_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0007_partition_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='comment_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='task_search_idx'),
+        ),
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0011_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='is_template',
+            field=models.BooleanField(default=False, verbose_name='Template'),
+        ),
+    ]
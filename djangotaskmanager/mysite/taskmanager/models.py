@@ -1,21 +1,42 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.forms import ValidationError
 from django.utils import timezone
 
 # Create your models here.
 
 
+class ProjectQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Проекты, в которых пользователь состоит (EXISTS вместо JOIN + DISTINCT)"""
+        return self.filter(
+            models.Exists(
+                ProjectMember.objects.filter(project=models.OuterRef("pk"), user=user)
+            )
+        )
+
+
 class Project(models.Model):
     name = models.CharField(
         max_length=100,
     )
     description = models.TextField()
+    # Шаблон: предлагается при создании проекта (см. cloning.py)
+    is_template = models.BooleanField(default=False, verbose_name="Template")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="project_created_idx"),
+        ]
         verbose_name = "Project"
         verbose_name_plural = "Projects"
 
@@ -30,8 +51,11 @@ class Project(models.Model):
             )
 
     def get_owner(self):
-        owner_member = self.members.filter(role="owner").first()
-        return owner_member.user if owner_member else None
+        try:
+            return self.summary.owner
+        except ProjectSummary.DoesNotExist:
+            owner_member = self.members.filter(role="owner").first()
+            return owner_member.user if owner_member else None
 
 
 class ProjectMember(models.Model):
@@ -50,6 +74,14 @@ class ProjectMember(models.Model):
 
     class Meta:
         unique_together = ["project", "user"]
+        constraints = [
+            # У проекта может быть только один владелец
+            models.UniqueConstraint(
+                fields=["project"],
+                condition=models.Q(role="owner"),
+                name="unique_project_owner",
+            ),
+        ]
         verbose_name = "Project member"
         verbose_name_plural = "Project members"
 
@@ -60,6 +92,9 @@ class ProjectMember(models.Model):
 class Status(models.Model):
     name = models.CharField(max_length=50, verbose_name="Status Name")
     order = models.IntegerField(verbose_name="Display Order")
+    is_closed = models.BooleanField(
+        default=False, verbose_name="Closes Task"
+    )  # Задачи в этом статусе считаются завершенными
     project = models.ForeignKey(
         Project, on_delete=models.CASCADE, related_name="statuses"
     )
@@ -67,7 +102,14 @@ class Status(models.Model):
 
     class Meta:
         ordering = ["order"]
-        unique_together = ["project", "order"]
+        constraints = [
+            # Отложенная проверка позволяет менять колонки местами одним UPDATE
+            models.UniqueConstraint(
+                fields=["project", "order"],
+                name="unique_status_order",
+                deferrable=models.Deferrable.DEFERRED,
+            ),
+        ]
         verbose_name = "Status"
         verbose_name_plural = "Statuses"
 
@@ -75,6 +117,17 @@ class Status(models.Model):
         return f"{self.name} ({self.project.name})"
 
 
+class TaskQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Задачи, созданные пользователем или назначенные на него"""
+        return self.filter(
+            models.Q(creator=user)
+            | models.Exists(
+                Assignee.objects.filter(task=models.OuterRef("pk"), user=user)
+            )
+        )
+
+
 class Task(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -114,9 +167,27 @@ class Task(models.Model):
         related_name="tasks",
         verbose_name="Task Status",
     )
+    # Заполняется триггером базы данных (см. миграцию 0008 и search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = TaskQuerySet.as_manager()
 
     class Meta:
         ordering = ["task_order", "-created_at"]
+        indexes = [
+            models.Index(
+                fields=["project", "task_order", "-created_at"],
+                name="task_project_order_idx",
+            ),
+            models.Index(
+                fields=["project", "status", "task_order"],
+                name="task_project_status_idx",
+            ),
+            models.Index(
+                fields=["task_order", "-created_at", "id"], name="task_order_idx"
+            ),
+            GinIndex(fields=["search_vector"], name="task_search_idx"),
+        ]
         verbose_name = "Task"
         verbose_name_plural = "Tasks"
 
@@ -128,6 +199,15 @@ class Task(models.Model):
         if self.due_date and self.due_date < timezone.now():
             raise ValidationError({"due_date": "Due date cannot be in the past"})
 
+    def save(self, *args, **kwargs):
+        # Сводка проекта обновляется сигналами в той же транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
 
 class Assignee(models.Model):
     ROLES = [
@@ -164,9 +244,15 @@ class Comment(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Заполняется триггером базы данных (см. миграцию 0008 и search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["task", "-created_at"], name="comment_task_created_idx"),
+            GinIndex(fields=["search_vector"], name="comment_search_idx"),
+        ]
         verbose_name = "Comment"
         verbose_name_plural = "Comments"
 
@@ -174,21 +260,115 @@ class Comment(models.Model):
         return f"Comment by {self.author.username} on {self.task.title}"
 
 
+class Blob(models.Model):
+    """Содержимое вложений, общее для одинаковых файлов
+
+    Файл лежит по SHA-256 содержимого (см. storage.py), ref_count - число
+    вложений со ссылкой на него (ведется сигналами). Блоки без ссылок
+    удаляет команда gc_attachments.
+    """
+
+    THUMBNAIL_STATES = [
+        ("none", "Not an image"),
+        ("pending", "Pending"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    ]
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    thumbnail_status = models.CharField(
+        max_length=10, choices=THUMBNAIL_STATES, default="none"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(ref_count=0),
+                name="blob_unreferenced_idx",
+            ),
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(thumbnail_status="pending"),
+                name="blob_thumbnail_pending_idx",
+            ),
+        ]
+        verbose_name = "Blob"
+        verbose_name_plural = "Blobs"
+
+    def __str__(self):
+        return self.sha256
+
+
 class Attachment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="attachments")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Файлы, загруженные до хранилища по содержимому (см. migrate_attachment_files)
     file = models.FileField(
-        upload_to="task_attachments/%Y/%m/%d/", verbose_name="Attached File"
+        upload_to="task_attachments/%Y/%m/%d/", blank=True, verbose_name="Attached File"
+    )
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="attachments",
     )
     name = models.CharField(max_length=255, blank=True, verbose_name="File Name")
+    content_type = models.CharField(max_length=100, blank=True)
+    uploaded_by = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["task", "-created_at"], name="attachment_task_created_idx"
+            ),
+        ]
         verbose_name = "Attachment"
         verbose_name_plural = "Attachments"
 
     def __str__(self):
         return self.name if self.name else f"Attachment {self.id}"
 
+    @property
+    def is_image(self):
+        return self.blob_id is not None and self.blob.thumbnail_status in (
+            "pending",
+            "ready",
+        )
+
+
+class UploadSession(models.Model):
+    """Незавершенная загрузка вложения по частям (см. attachments.py)"""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="+")
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="+"
+    )
+    name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Upload session"
+        verbose_name_plural = "Upload sessions"
+
+    def __str__(self):
+        return f"{self.name} ({self.offset}/{self.size})"
+
 
 class Activity(models.Model):
     ACTIONS = [
@@ -209,6 +389,11 @@ class Activity(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["task", "-created_at"], name="activity_task_created_idx"
+            ),
+        ]
         verbose_name = "Activity"
         verbose_name_plural = "Activities"
 
@@ -216,6 +401,74 @@ class Activity(models.Model):
         return f"{self.user.username} {self.action_type} task {self.task.id}"
 
 
+class NotificationEvent(models.Model):
+    """Событие исходящей очереди уведомлений (outbox)
+
+    Пишется в той же транзакции, что и изменение задачи (см. notifications.py).
+    Команда send_notifications раскладывает события получателям и отмечает
+    processed_at.
+    """
+
+    KINDS = [*Activity.ACTIONS, ("commented", "Commented")]
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="+")
+    actor = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    kind = models.CharField(max_length=30, choices=KINDS)
+    old_values = models.JSONField(blank=True, null=True)
+    new_values = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="notification_event_pending_idx",
+            ),
+        ]
+        verbose_name = "Notification event"
+        verbose_name_plural = "Notification events"
+
+    def __str__(self):
+        return f"{self.kind} task {self.task_id}"
+
+
+class Notification(models.Model):
+    """Уведомление пользователя о событии; sent_at - когда ушло в дайджесте"""
+
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="notifications"
+    )
+    event = models.ForeignKey(
+        NotificationEvent, on_delete=models.CASCADE, related_name="notifications"
+    )
+    # Роль получателя: исполнитель, наблюдатель, владелец проекта и т.п.
+    reason = models.CharField(max_length=20)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ["user", "event"]
+        indexes = [
+            models.Index(
+                fields=["user", "created_at"],
+                condition=models.Q(sent_at__isnull=True),
+                name="notification_pending_idx",
+            ),
+        ]
+        verbose_name = "Notification"
+        verbose_name_plural = "Notifications"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.event}"
+
+
 class ProjectLabel(models.Model):
     name = models.CharField(max_length=50, verbose_name="Label Name")
     project = models.ForeignKey(
@@ -249,3 +502,161 @@ class TaskLabel(models.Model):
 
     def __str__(self):
         return f"{self.task.title} - {self.label.name}"
+
+
+class ProjectSummary(models.Model):
+    """Денормализованная сводка по проекту
+
+    Обновляется сигналами (см. signals.py) при изменении задач, статусов и
+    участников. Пересобирается командой rebuild_project_summaries.
+    updated_at отмечает любое изменение проекта и его дочерних объектов
+    (см. touch) и служит валидатором ETag/Last-Modified (conditional.py).
+    Просроченность зависит от времени, поэтому overdue_task_count точен на
+    момент последнего изменения задачи или пересборки.
+    """
+
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, primary_key=True, related_name="summary"
+    )
+    owner = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    task_count = models.PositiveIntegerField(default=0)
+    open_task_count = models.PositiveIntegerField(default=0)
+    overdue_task_count = models.PositiveIntegerField(default=0)
+    status_counts = models.JSONField(
+        default=dict, blank=True
+    )  # {"<status_id>" | "none": количество задач}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTERS = ["task_count", "open_task_count", "overdue_task_count"]
+
+    class Meta:
+        verbose_name = "Project summary"
+        verbose_name_plural = "Project summaries"
+
+    def __str__(self):
+        return f"Summary of {self.project_id}"
+
+    @staticmethod
+    def status_key(status_id):
+        return str(status_id) if status_id else "none"
+
+    @classmethod
+    def rebuild(cls, project_id):
+        """Полный пересчет сводки агрегирующими запросами"""
+        now = timezone.now()
+        tasks = Task.objects.filter(project_id=project_id).order_by()
+        is_open = models.Q(status__isnull=True) | models.Q(status__is_closed=False)
+        totals = tasks.aggregate(
+            task_count=models.Count("id"),
+            open_task_count=models.Count("id", filter=is_open),
+            overdue_task_count=models.Count(
+                "id", filter=is_open & models.Q(due_date__lt=now)
+            ),
+        )
+        status_counts = {
+            cls.status_key(status_id): count
+            for status_id, count in tasks.values_list("status_id").annotate(
+                count=models.Count("id")
+            )
+        }
+        owner_id = (
+            ProjectMember.objects.filter(project_id=project_id, role="owner")
+            .values_list("user_id", flat=True)
+            .first()
+        )
+        summary, _ = cls.objects.update_or_create(
+            project_id=project_id,
+            defaults={**totals, "status_counts": status_counts, "owner_id": owner_id},
+        )
+        return summary
+
+    @classmethod
+    def touch(cls, project_id):
+        """Отметить изменение проекта в текущей транзакции"""
+        cls.objects.filter(project_id=project_id).update(updated_at=timezone.now())
+
+    def apply_task(self, state, sign):
+        """Добавить (sign=1) или убрать (sign=-1) вклад одной задачи"""
+        for counter in self.COUNTERS:
+            setattr(self, counter, max(0, getattr(self, counter) + sign * state[counter]))
+        key = state["status"]
+        count = self.status_counts.get(key, 0) + sign
+        if count > 0:
+            self.status_counts[key] = count
+        else:
+            self.status_counts.pop(key, None)
+
+
+class Job(models.Model):
+    """Фоновая задача очереди в PostgreSQL (см. jobs.py)
+
+    Воркеры команды run_jobs забирают задачи с SELECT ... FOR UPDATE SKIP
+    LOCKED; progress и total показываются на странице задачи.
+    """
+
+    STATES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    state = models.CharField(max_length=10, choices=STATES, default="queued")
+    created_by = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Не раньше этого времени: отложенный запуск и пауза перед повтором
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["run_at", "id"],
+                condition=models.Q(state="queued"),
+                name="job_queued_idx",
+            ),
+            models.Index(
+                fields=["locked_at"],
+                condition=models.Q(state="running"),
+                name="job_running_idx",
+            ),
+        ]
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.state})"
+
+    @property
+    def percent(self):
+        if self.state == "done":
+            return 100
+        if not self.total:
+            return 0
+        return min(100, self.progress * 100 // self.total)
+
+    @property
+    def is_finished(self):
+        return self.state in ("done", "failed")
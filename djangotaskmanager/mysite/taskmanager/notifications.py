@@ -0,0 +1,263 @@
+import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, Min, OuterRef
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import (
+    Assignee,
+    Notification,
+    NotificationEvent,
+    ProjectMember,
+    Status,
+    Task,
+)
+
+"""
+Уведомления об изменениях задач и дайджесты
+
+Запрос только добавляет строку NotificationEvent в той же транзакции, что и
+изменение (outbox): на каждую запись журнала (activity.record и record_bulk)
+и на каждый комментарий. Остальное делает команда send_notifications:
+
+    fan_out()      - раскладывает события пачками по получателям (Notification);
+    send_digests() - собирает неотправленные уведомления пользователя в одно
+                     письмо, когда самому старому из них больше
+                     TASKMANAGER_DIGEST_INTERVAL секунд, и отправляет письма
+                     пачками через одно SMTP-соединение.
+
+Получатели - исполнители задачи (Assignee с любой ролью), для новой задачи
+еще владелец и администраторы проекта, для назначения - назначенный или
+снятый пользователь. Все они должны быть участниками проекта на момент
+рассылки; автор изменения уведомление о своем действии не получает.
+"""
+
+NOTIFY_ON_CREATE = ["owner", "admin"]
+
+
+def is_enabled():
+    return getattr(settings, "TASKMANAGER_NOTIFICATIONS_ENABLED", True)
+
+
+def get_batch_size():
+    return getattr(settings, "TASKMANAGER_NOTIFICATION_BATCH_SIZE", 100)
+
+
+def enqueue(entries):
+    """Поставить в очередь события по записям журнала (Activity, можно без сохранения)"""
+    if not is_enabled():
+        return
+    NotificationEvent.objects.bulk_create(
+        NotificationEvent(
+            task_id=entry.task_id,
+            actor_id=entry.user_id,
+            kind=entry.action_type,
+            old_values=entry.old_values,
+            new_values=entry.new_values,
+        )
+        for entry in entries
+    )
+
+
+def enqueue_comment(comment):
+    if not is_enabled():
+        return
+    NotificationEvent.objects.create(
+        task_id=comment.task_id,
+        actor_id=comment.author_id,
+        kind="commented",
+        new_values={"comment_id": comment.pk, "content": comment.content[:500]},
+    )
+
+
+def _recipients(event, project_id, assignees, members):
+    """{user_id: reason} для события"""
+    recipients = dict(assignees.get(event.task_id, {}))
+    if event.kind == "created":
+        for user_id, role in members.get(project_id, {}).items():
+            if role in NOTIFY_ON_CREATE:
+                recipients.setdefault(user_id, role)
+    elif event.kind == "assigned":
+        for values in (event.new_values, event.old_values):
+            if values:
+                recipients.setdefault(values["user_id"], values.get("role", "assignee"))
+
+    project_members = members.get(project_id, {})
+    return {
+        user_id: reason
+        for user_id, reason in recipients.items()
+        if user_id != event.actor_id and user_id in project_members
+    }
+
+
+def fan_out(batch_size=None):
+    """Разложить пачку необработанных событий по получателям; число событий
+
+    Несколько воркеров не мешают друг другу: строки событий блокируются
+    с SKIP LOCKED.
+    """
+    batch_size = batch_size or get_batch_size()
+    with transaction.atomic():
+        events = list(
+            NotificationEvent.objects.filter(processed_at__isnull=True)
+            .select_for_update(skip_locked=True)
+            .order_by("id")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        task_ids = {event.task_id for event in events}
+        projects = dict(Task.objects.filter(pk__in=task_ids).values_list("pk", "project_id"))
+        assignees, members = {}, {}
+        for task_id, user_id, role in Assignee.objects.filter(
+            task_id__in=task_ids
+        ).values_list("task_id", "user_id", "role"):
+            assignees.setdefault(task_id, {})[user_id] = role
+        for project_id, user_id, role in ProjectMember.objects.filter(
+            project_id__in=set(projects.values())
+        ).values_list("project_id", "user_id", "role"):
+            members.setdefault(project_id, {})[user_id] = role
+
+        notifications = [
+            Notification(user_id=user_id, event=event, reason=reason)
+            for event in events
+            for user_id, reason in _recipients(
+                event, projects.get(event.task_id), assignees, members
+            ).items()
+        ]
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            processed_at=timezone.now()
+        )
+    return len(events)
+
+
+def _status_names(notifications):
+    status_ids = set()
+    for notification in notifications:
+        for values in (notification.event.old_values, notification.event.new_values):
+            if values and values.get("status_id"):
+                status_ids.add(values["status_id"])
+    return dict(Status.objects.filter(pk__in=status_ids).values_list("pk", "name"))
+
+
+def describe(event, status_names):
+    """Строка дайджеста о событии"""
+    old, new = event.old_values or {}, event.new_values or {}
+    if event.kind == "created":
+        return "создана задача"
+    if event.kind == "status_changed":
+        before = status_names.get(old.get("status_id"), "без статуса")
+        after = status_names.get(new.get("status_id"), "без статуса")
+        return f"статус: {before} → {after}"
+    if event.kind == "assigned":
+        if not new:
+            return "назначение снято"
+        if old:
+            return f"роль: {old['role']} → {new['role']}"
+        return f"назначение: {new['role']}"
+    if event.kind == "commented":
+        return f"комментарий: {new.get('content', '')[:200]}"
+    return f"изменены поля: {', '.join(sorted(new)) or '-'}"
+
+
+def build_digest(user, notifications, status_names):
+    limit = getattr(settings, "TASKMANAGER_DIGEST_MAX_ITEMS", 50)
+    items = [
+        {
+            "task": notification.event.task,
+            "actor": notification.event.actor,
+            "created_at": notification.event.created_at,
+            "text": describe(notification.event, status_names),
+        }
+        for notification in notifications[:limit]
+    ]
+    context = {
+        "user": user,
+        "items": items,
+        "total": len(notifications),
+        "hidden": max(len(notifications) - limit, 0),
+    }
+    return EmailMessage(
+        subject=f"Обновления задач: {len(notifications)}",
+        body=render_to_string("taskmanager/email/digest.txt", context),
+        to=[user.email],
+    )
+
+
+def due_users(now, interval):
+    """Пользователи, чье самое старое неотправленное уведомление старше interval"""
+    return list(
+        Notification.objects.filter(sent_at__isnull=True)
+        .values("user_id")
+        .annotate(first=Min("created_at"))
+        .filter(first__lte=now - datetime.timedelta(seconds=interval))
+        .order_by("first")
+        .values_list("user_id", flat=True)
+    )
+
+
+def send_digests(now=None, batch_size=None, connection=None):
+    """Отправить дайджесты всем, кому пора; число писем
+
+    Письма пачки уходят одним send_messages через одно соединение; уведомления
+    отмечаются отправленными в той же транзакции, так что при ошибке
+    отправки пачка будет отправлена повторно.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or get_batch_size()
+    interval = getattr(settings, "TASKMANAGER_DIGEST_INTERVAL", 900)
+    user_ids = due_users(now, interval)
+    if not user_ids:
+        return 0
+
+    connection = connection or get_connection()
+    sent = 0
+    with connection:
+        for start in range(0, len(user_ids), batch_size):
+            sent += _send_batch(user_ids[start : start + batch_size], now, connection)
+    return sent
+
+
+def _send_batch(user_ids, now, connection):
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects.filter(user_id__in=user_ids, sent_at__isnull=True)
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("user", "event__task__project", "event__actor")
+            .order_by("user_id", "event__created_at", "event_id")
+        )
+        if not notifications:
+            return 0
+
+        by_user = {}
+        for notification in notifications:
+            by_user.setdefault(notification.user_id, []).append(notification)
+        status_names = _status_names(notifications)
+        messages = [
+            build_digest(items[0].user, items, status_names)
+            for items in by_user.values()
+            # Без адреса уведомления просто отмечаются отправленными
+            if items[0].user.email
+        ]
+        if messages:
+            connection.send_messages(messages)
+        Notification.objects.filter(pk__in=[item.pk for item in notifications]).update(
+            sent_at=now
+        )
+    return len(messages)
+
+
+def cleanup(retention_days):
+    """Удалить обработанные события старше retention_days, по которым все отправлено"""
+    threshold = timezone.now() - datetime.timedelta(days=retention_days)
+    pending = Notification.objects.filter(event=OuterRef("pk"), sent_at__isnull=True)
+    _, deleted = (
+        NotificationEvent.objects.filter(processed_at__lt=threshold)
+        .exclude(Exists(pending))
+        .delete()
+    )
+    return deleted.get(NotificationEvent._meta.label, 0)
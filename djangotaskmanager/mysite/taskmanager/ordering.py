@@ -0,0 +1,254 @@
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import realtime
+from .caching import bump_project_version
+from .models import ProjectSummary, Status, Task
+
+"""
+Порядок задач в колонке с промежутками
+
+task_order задач одной колонки (project, status) идут с шагом ORDER_STEP,
+поэтому перемещение задачи между соседями обычно меняет одну строку:
+новое значение берется посередине промежутка. Когда промежуток исчерпан,
+колонка перенумеровывается одним bulk_update (см. rebalance_column и
+команду rebalance_task_order).
+"""
+
+ORDER_STEP = 1024
+BULK_BATCH_SIZE = 1000
+
+
+class MoveError(ValueError):
+    """Некорректное перемещение (чужой проект, сосед из другой колонки и т.п.)"""
+
+
+def column_queryset(project_id, status_id):
+    return Task.objects.filter(project_id=project_id, status_id=status_id).order_by(
+        "task_order", "-created_at", "id"
+    )
+
+
+def rebalance_column(project_id, status_id):
+    """Перенумеровать колонку с шагом ORDER_STEP, обновив только изменившиеся строки"""
+    changed, changes = [], []
+    for position, (task_id, task_order) in enumerate(
+        column_queryset(project_id, status_id).values_list("id", "task_order").iterator(),
+        start=1,
+    ):
+        if task_order != position * ORDER_STEP:
+            task = Task(id=task_id, status_id=status_id, task_order=position * ORDER_STEP)
+            changed.append(task)
+            changes.append(realtime.task_changed(task, {"task_order": task_order}))
+
+    Task.objects.bulk_update(changed, ["task_order"], batch_size=BULK_BATCH_SIZE)
+    if changed:
+        bump_project_version(project_id)
+        realtime.publish(project_id, *changes)
+    return len(changed)
+
+
+def column_needs_rebalance(project_id, status_id, min_gap=2):
+    """Есть ли в колонке соседи с промежутком меньше min_gap"""
+    previous = None
+    for task_order in column_queryset(project_id, status_id).values_list(
+        "task_order", flat=True
+    ).iterator():
+        if previous is not None and task_order - previous < min_gap:
+            return True
+        previous = task_order
+    return False
+
+
+def _resolve_neighbour(project_id, status_id, task_id, exclude):
+    if task_id is None:
+        return None
+    neighbour = (
+        Task.objects.filter(pk=task_id, project_id=project_id)
+        .exclude(pk__in=exclude)
+        .values("status_id", "task_order")
+        .first()
+    )
+    if neighbour is None or neighbour["status_id"] != status_id:
+        raise MoveError(f"Task {task_id} is not in the target column")
+    return neighbour["task_order"]
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_ids(*values):
+    """Необязательные id из JSON клиента: целые числа или None"""
+    for value in values:
+        if value is not None and not _is_id(value):
+            raise MoveError(f"Invalid id: {value!r}")
+
+
+def _nearest_order(project_id, status_id, exclude, below=None, above=None):
+    """task_order ближайшей задачи колонки: наибольший не больше below,
+    наименьший не меньше above, без ограничений - последний в колонке"""
+    column = Task.objects.filter(project_id=project_id, status_id=status_id).exclude(
+        pk__in=exclude
+    )
+    if above is not None:
+        return column.filter(task_order__gte=above).aggregate(value=Min("task_order"))["value"]
+    if below is not None:
+        column = column.filter(task_order__lte=below)
+    return column.aggregate(value=Max("task_order"))["value"]
+
+
+def _slots(lower, upper, count):
+    """count значений строго между lower и upper или None, если места нет"""
+    if lower is None and upper is None:
+        return [ORDER_STEP * (i + 1) for i in range(count)]
+    if lower is None:
+        return [upper - ORDER_STEP * (count - i) for i in range(count)]
+    if upper is None:
+        return [lower + ORDER_STEP * (i + 1) for i in range(count)]
+
+    step = (upper - lower) // (count + 1)
+    if step < 1:
+        return None
+    return [lower + step * (i + 1) for i in range(count)]
+
+
+def _check_status(project_id, status_id):
+    if (
+        status_id is not None
+        and not Status.objects.filter(pk=status_id, project_id=project_id).exists()
+    ):
+        raise MoveError(f"Status {status_id} does not belong to the project")
+
+
+def _target_slots(project_id, status_id, after_id, before_id, moved_ids):
+    # Недостающий сосед - ближайшая задача колонки: без него новое значение
+    # могло бы совпасть с соседом или перескочить его. Задача с тем же
+    # task_order, что и сосед, дает пустой промежуток и перенумерацию
+    exclude = [task_id for task_id in (*moved_ids, after_id, before_id) if task_id is not None]
+
+    def bounds():
+        lower = _resolve_neighbour(project_id, status_id, after_id, moved_ids)
+        upper = _resolve_neighbour(project_id, status_id, before_id, moved_ids)
+        if lower is None and upper is None:
+            # Без соседей - в конец колонки
+            lower = _nearest_order(project_id, status_id, exclude)
+        elif lower is None:
+            lower = _nearest_order(project_id, status_id, exclude, below=upper)
+        elif upper is None:
+            upper = _nearest_order(project_id, status_id, exclude, above=lower)
+        return lower, upper
+
+    lower, upper = bounds()
+    if after_id is not None and before_id is not None and lower > upper:
+        raise MoveError("'after' must be above 'before'")
+
+    slots = _slots(lower, upper, len(moved_ids))
+    if slots is None:
+        # Промежуток исчерпан - перенумеровываем колонку и пробуем снова
+        rebalance_column(project_id, status_id)
+        lower, upper = bounds()
+        slots = _slots(lower, upper, len(moved_ids))
+        if slots is None:
+            raise MoveError("Too many tasks to fit between 'after' and 'before'")
+    return slots
+
+
+def move_tasks(project, task_ids, status_id=None, after_id=None, before_id=None):
+    """Переместить задачи в колонку status_id между after и before
+
+    after - задача, которая окажется над перемещаемыми, before - под ними.
+    Задачи встают подряд в переданном порядке, запись одним bulk_update.
+    """
+    if not all(_is_id(task_id) for task_id in task_ids):
+        raise MoveError("Task ids must be integers")
+    _check_ids(status_id, after_id, before_id)
+    task_ids = list(dict.fromkeys(task_ids))
+    if not task_ids:
+        return []
+
+    with transaction.atomic():
+        _check_status(project.pk, status_id)
+        tasks = {
+            task.pk: task
+            for task in Task.objects.select_for_update().filter(
+                pk__in=task_ids, project=project
+            )
+        }
+        missing = [task_id for task_id in task_ids if task_id not in tasks]
+        if missing:
+            raise MoveError(f"Tasks not found in the project: {missing}")
+
+        slots = _target_slots(project.pk, status_id, after_id, before_id, task_ids)
+
+        now = timezone.now()
+        status_changed = False
+        changes = []
+        for task_id, task_order in zip(task_ids, slots):
+            task = tasks[task_id]
+            previous = {"status_id": task.status_id, "task_order": task.task_order}
+            status_changed |= task.status_id != status_id
+            task.status_id = status_id
+            task.task_order = task_order
+            task.updated_at = now
+            changes.append(realtime.task_changed(task, previous))
+
+        Task.objects.bulk_update(
+            [tasks[task_id] for task_id in task_ids],
+            ["status", "task_order", "updated_at"],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        if status_changed:
+            # bulk_update не вызывает сигналы сводки
+            ProjectSummary.rebuild(project.pk)
+        bump_project_version(project.pk)
+        # bulk_update не вызывает и сигналы доски в реальном времени
+        realtime.publish(project.pk, *changes)
+
+    return [tasks[task_id] for task_id in task_ids]
+
+
+def move_task(task, status_id=None, after_id=None, before_id=None):
+    """Переместить одну задачу; в обычном случае меняется одна строка"""
+    _check_ids(status_id, after_id, before_id)
+    with transaction.atomic():
+        _check_status(task.project_id, status_id)
+        slots = _target_slots(task.project_id, status_id, after_id, before_id, [task.pk])
+        previous_order = task.task_order
+        task.task_order = slots[0]
+        if task.status_id != status_id:
+            # Смена колонки обновляет сводку проекта через сигналы
+            task.status_id = status_id
+            task.save(update_fields=["status", "task_order", "updated_at"])
+        else:
+            task.updated_at = timezone.now()
+            Task.objects.filter(pk=task.pk).update(
+                task_order=task.task_order, updated_at=task.updated_at
+            )
+            bump_project_version(task.project_id)
+            realtime.publish(
+                task.project_id, realtime.task_changed(task, {"task_order": previous_order})
+            )
+    return task
+
+
+def reorder_statuses(project, status_ids):
+    """Задать порядок колонок одним bulk_update
+
+    Ограничение уникальности (project, order) отложено до конца транзакции,
+    поэтому промежуточные совпадения при обмене колонок допустимы.
+    """
+    if not all(_is_id(status_id) for status_id in status_ids):
+        raise MoveError("Status ids must be integers")
+    statuses = {status.pk: status for status in Status.objects.filter(project=project)}
+    if sorted(status_ids) != sorted(statuses):
+        raise MoveError("All statuses of the project must be listed exactly once")
+
+    for position, status_id in enumerate(status_ids, start=1):
+        statuses[status_id].order = position * ORDER_STEP
+
+    with transaction.atomic():
+        Status.objects.bulk_update(list(statuses.values()), ["order"])
+        bump_project_version(project.pk)
+    return [statuses[status_id] for status_id in status_ids]
@@ -0,0 +1,140 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.http import Http404
+
+
+class KeysetPage:
+    """Страница курсорной пагинации"""
+
+    def __init__(self, object_list, cursor, next_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+
+class KeysetPaginator:
+    """Курсорная (keyset) пагинация
+
+    Вместо OFFSET страница начинается строго после последней строки
+    предыдущей страницы, поэтому глубокие страницы стоят столько же,
+    сколько первая.
+
+    **ordering**: Поля сортировки, последнее поле должно быть уникальным (обычно id)
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self._fields = [
+            queryset.model._meta.get_field(name.lstrip("-")) for name in self.ordering
+        ]
+
+    def page(self, cursor=None):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+
+        rows = list(queryset[: self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[: self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+
+        return KeysetPage(rows, cursor or None, next_cursor)
+
+    def encode_cursor(self, obj):
+        values = [self._cursor_value(field, obj) for field in self._fields]
+        raw = json.dumps(values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _cursor_value(field, obj):
+        if not isinstance(obj, dict):
+            return field.value_to_string(obj)
+        # Строка .values(): ключи - имена полей сортировки
+        value = obj[field.name]
+        return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self._fields):
+                raise ValueError
+            return [
+                field.to_python(value) for field, value in zip(self._fields, values)
+            ]
+        except Exception:
+            raise Http404("Invalid cursor")
+
+    def _after(self, values):
+        """Условие "строка идет после курсора" с учетом направлений сортировки
+
+        (a, -b, c) > (x, y, z) раскрывается в
+        a > x OR (a = x AND b < y) OR (a = x AND b = y AND c > z)
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            column = name.lstrip("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{column}__{lookup}": value})
+            equal[column] = value
+        return condition
+
+
+class KeysetPaginationMixin:
+    """Миксин для ListView с курсорной пагинацией
+
+    Размер страницы и курсор передаются в URL: ?page_size=50&cursor=...
+    """
+
+    keyset_ordering = None
+    paginate_by = 50
+    max_paginate_by = 200
+    cursor_kwarg = "cursor"
+    page_size_kwarg = "page_size"
+
+    def get_paginate_by(self, queryset):
+        try:
+            page_size = int(self.request.GET.get(self.page_size_kwarg, self.paginate_by))
+        except ValueError:
+            page_size = self.paginate_by
+        return max(1, min(page_size, self.max_paginate_by))
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.get_keyset_ordering(), page_size)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        is_paginated = page.has_next() or page.has_previous()
+        return paginator, page, page.object_list, is_paginated
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get("page_obj")
+        if page is not None and page.has_next():
+            params = self.request.GET.copy()
+            params[self.cursor_kwarg] = page.next_cursor
+            context["next_page_url"] = f"?{params.urlencode()}"
+        if page is not None and page.has_previous():
+            params = self.request.GET.copy()
+            params.pop(self.cursor_kwarg, None)
+            context["first_page_url"] = f"?{params.urlencode()}"
+        return context
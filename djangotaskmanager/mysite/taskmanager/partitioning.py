@@ -0,0 +1,168 @@
+import datetime
+import gzip
+import json
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Activity
+
+"""
+Помесячное секционирование таблицы Activity (только PostgreSQL)
+
+Таблица переводится в секционированную миграцией 0007. Секции называются
+<таблица>_pYYYYMM и покрывают [1 число месяца, 1 число следующего месяца).
+Строки вне созданных секций попадают в секцию <таблица>_default и
+переносятся в месячную секцию при ее создании.
+"""
+
+PARENT_TABLE = Activity._meta.db_table
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_RE = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$")
+
+
+def is_supported():
+    return connection.vendor == "postgresql"
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def month_bound(month):
+    """Граница секции как литерал timestamptz в UTC"""
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def partition_name(month):
+    return f"{PARENT_TABLE}_p{month:%Y%m}"
+
+
+def list_partitions():
+    """Месячные секции: [(month, имя таблицы)] по возрастанию"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions.append(
+                (datetime.date(int(match[1]), int(match[2]), 1), name)
+            )
+    return sorted(partitions)
+
+
+def create_partition(month):
+    """Создать секцию месяца, перенеся ее строки из секции по умолчанию"""
+    name = partition_name(month)
+    start, end = month_bound(month), month_bound(add_months(month, 1))
+    quote = connection.ops.quote_name
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} "
+            f"(LIKE {quote(PARENT_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} "
+            f"WHERE created_at >= {start} AND created_at < {end} RETURNING *) "
+            f"INSERT INTO {quote(name)} SELECT * FROM moved"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(PARENT_TABLE)} ATTACH PARTITION {quote(name)} "
+            f"FOR VALUES FROM ({start}) TO ({end})"
+        )
+    return name
+
+
+def ensure_partitions(months_ahead=3, start=None):
+    """Создать недостающие секции с месяца start (по умолчанию текущего)
+    до months_ahead месяцев вперед"""
+    current = month_start(timezone.now())
+    month = month_start(start) if start else current
+    existing = {month for month, _ in list_partitions()}
+
+    created = []
+    while month <= add_months(current, months_ahead):
+        if month not in existing:
+            created.append(create_partition(month))
+        month = add_months(month, 1)
+    return created
+
+
+def archive_partition(name, archive_dir, drop=True):
+    """Выгрузить строки секции в <archive_dir>/<name>.ndjson.gz и отсоединить ее
+
+    Выгрузка, DETACH и DROP идут в одной транзакции: если выгрузка не
+    удалась, секция остается присоединенной и будет заархивирована позже.
+    Файл пишется во временный и переименовывается до отсоединения секции.
+    """
+    quote = connection.ops.quote_name
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"{name}.ndjson.gz"
+    partial = archive_dir / f"{name}.ndjson.gz.partial"
+
+    columns = [field.column for field in Activity._meta.concrete_fields]
+    try:
+        with transaction.atomic():
+            # Серверный курсор: строки читаются порциями, а не целиком
+            with connection.chunked_cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {', '.join(quote(column) for column in columns)} "
+                    f"FROM {quote(name)} ORDER BY created_at, id"
+                )
+                with gzip.open(partial, "wt", encoding="utf-8") as archive:
+                    for row in cursor:
+                        record = dict(zip(columns, row))
+                        record["created_at"] = record["created_at"].isoformat()
+                        for column in ("old_values", "new_values"):
+                            # Драйвер отдает jsonb строкой, JSONField разбирает ее сам
+                            if isinstance(record[column], str):
+                                record[column] = json.loads(record[column])
+                        archive.write(json.dumps(record, ensure_ascii=False) + "\n")
+            partial.replace(path)
+
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"ALTER TABLE {quote(PARENT_TABLE)} DETACH PARTITION {quote(name)}"
+                )
+                if drop:
+                    cursor.execute(f"DROP TABLE {quote(name)}")
+    finally:
+        partial.unlink(missing_ok=True)
+    return path
+
+
+def archive_old_partitions(retention_months=None, archive_dir=None, drop=True):
+    """Архивировать секции, целиком старше retention_months месяцев"""
+    if retention_months is None:
+        retention_months = settings.TASKMANAGER_ACTIVITY_RETENTION_MONTHS
+    if archive_dir is None:
+        archive_dir = settings.TASKMANAGER_ACTIVITY_ARCHIVE_DIR
+
+    cutoff = add_months(month_start(timezone.now()), -retention_months)
+    return [
+        archive_partition(name, archive_dir, drop=drop)
+        for month, name in list_partitions()
+        if add_months(month, 1) <= cutoff
+    ]
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .caching import bump_version, get_version
+from .instrumentation import record_cache
+from .models import ProjectMember
+
+"""
+Кэш ролей пользователя в проектах
+
+Карта {project_id: role} загружается одним запросом, хранится в кэше Django
+под ключом с версией пользователя и живет на объекте request до конца запроса.
+Изменение ProjectMember увеличивает версию (см. signals.py), старые записи
+просто перестают читаться и вытесняются по таймауту. Кэш в памяти процесса
+(locmem) не видит новых версий из других воркеров, поэтому с ним таймаут по
+умолчанию - несколько секунд (см. TASKMANAGER_ROLE_CACHE_TIMEOUT).
+"""
+
+ROLE_CACHE_TIMEOUT = getattr(settings, "TASKMANAGER_ROLE_CACHE_TIMEOUT", 300)
+
+ROLE_VERSION_KEY = "taskmanager:roles:version:{user_id}"
+ROLE_MAP_KEY = "taskmanager:roles:{user_id}:{version}"
+
+
+def invalidate_project_roles(user_id):
+    """Сбросить кэш ролей пользователя увеличением версии"""
+    bump_version(ROLE_VERSION_KEY.format(user_id=user_id))
+
+
+def load_project_roles(user):
+    """Карта {project_id: role} пользователя из кэша или базы"""
+    if not user.is_authenticated:
+        return {}
+
+    version = get_version(ROLE_VERSION_KEY.format(user_id=user.pk))
+    key = ROLE_MAP_KEY.format(user_id=user.pk, version=version)
+    roles = cache.get(key)
+    record_cache("roles", roles is not None)
+    if roles is None:
+        # Из основной базы: роли кэшируются до следующего изменения участников,
+        # отставшая реплика закэшировала бы старые
+        roles = dict(
+            ProjectMember.objects.using(DEFAULT_DB_ALIAS)
+            .filter(user=user)
+            .values_list("project_id", "role")
+        )
+        cache.set(key, roles, ROLE_CACHE_TIMEOUT)
+    return roles
+
+
+def get_project_roles(request):
+    """Карта ролей, загружаемая не более одного раза за запрос"""
+    if not hasattr(request, "_project_roles"):
+        request._project_roles = load_project_roles(request.user)
+    return request._project_roles
+
+
+def get_project_role(request, project):
+    project_id = getattr(project, "pk", project)
+    return get_project_roles(request).get(project_id)
+
+
+def has_project_role(request, project, *roles):
+    """Есть ли у пользователя одна из ролей; без ролей - любое членство"""
+    role = get_project_role(request, project)
+    if role is None:
+        return False
+    return not roles or role in roles
+
+
+class ProjectRoleMixin:
+    """Миксин представлений для проверки ролей в проекте за O(1)"""
+
+    def get_project_role(self, project):
+        return get_project_role(self.request, project)
+
+    def has_project_role(self, project, *roles):
+        return has_project_role(self.request, project, *roles)
+
+    def is_project_owner(self, project):
+        return self.has_project_role(project, "owner")
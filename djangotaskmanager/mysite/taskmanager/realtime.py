@@ -0,0 +1,168 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .activity import serialize_value
+from .models import Assignee, Task
+
+"""
+Обновления доски в реальном времени
+
+Изменения задач, комментариев и исполнителей превращаются в компактные
+сообщения (change) и после коммита рассылаются в группу проекта слоя
+каналов. BoardConsumer (consumers.py) копит сообщения
+TASKMANAGER_REALTIME_COALESCE_DELAY секунд, сливает изменения одной
+сущности (merge_change) и отправляет браузеру один кадр.
+
+Формат change: {"key": "task:12", "event": "task.moved", "id": 12,
+"fields": {"status": 3, "order": 2048}} - в fields только изменившиеся поля.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Поля задачи, которые видны на доске: поле модели -> имя в сообщении
+TASK_FIELDS = {
+    "title": "title",
+    "priority": "priority",
+    "due_date": "due_date",
+    "status_id": "status",
+    "task_order": "order",
+}
+
+# При слиянии событие с большим приоритетом определяет тип итогового
+EVENT_PRIORITY = {"task.updated": 0, "task.moved": 1, "task.created": 2}
+
+
+def project_group(project_id):
+    return f"taskmanager.project.{project_id}"
+
+
+def task_fields(task, names=TASK_FIELDS):
+    return {TASK_FIELDS[name]: serialize_value(getattr(task, name)) for name in names}
+
+
+def task_created(task):
+    return {
+        "key": f"task:{task.pk}",
+        "event": "task.created",
+        "id": task.pk,
+        "fields": task_fields(task),
+    }
+
+
+def task_changed(task, previous):
+    """Изменение задачи относительно previous (значения полей до сохранения)
+
+    None, если видимые на доске поля не изменились.
+    """
+    changed = [
+        name
+        for name in TASK_FIELDS
+        if name in previous and previous[name] != getattr(task, name)
+    ]
+    if not changed:
+        return None
+    moved = "status_id" in changed or "task_order" in changed
+    if moved:
+        # Положение карточки задается парой (колонка, порядок)
+        changed = list(dict.fromkeys([*changed, "status_id", "task_order"]))
+    return {
+        "key": f"task:{task.pk}",
+        "event": "task.moved" if moved else "task.updated",
+        "id": task.pk,
+        "fields": task_fields(task, changed),
+    }
+
+
+def task_deleted(task_id):
+    return {"key": f"task:{task_id}", "event": "task.deleted", "id": task_id}
+
+
+def comment_added(comment):
+    return {
+        "key": f"comment:{comment.pk}",
+        "event": "comment.added",
+        "id": comment.pk,
+        "task": comment.task_id,
+        "author": comment.author_id,
+    }
+
+
+def assignees_changed(task_id, usernames=None):
+    """Текущий состав исполнителей: при слиянии побеждает последний
+
+    usernames передают массовые операции, уже знающие состав; иначе он
+    читается из базы.
+    """
+    if usernames is None:
+        usernames = list(
+            Assignee.objects.filter(task_id=task_id)
+            .order_by("id")
+            .values_list("user__username", flat=True)
+        )
+    return {
+        "key": f"assignees:{task_id}",
+        "event": "task.assignees",
+        "task": task_id,
+        "assignees": usernames,
+    }
+
+
+def merge_change(pending, change):
+    """Добавить change в словарь pending {key: change}, слив с прежним"""
+    key = change["key"]
+    previous = pending.get(key)
+    if previous is None:
+        pending[key] = change
+        return pending
+
+    if change["event"] == "task.deleted":
+        if previous["event"] == "task.created":
+            # Задача появилась и исчезла за одно окно - клиенту сообщать нечего
+            del pending[key]
+        else:
+            pending[key] = change
+        return pending
+
+    if "fields" in change and "fields" in previous:
+        event = max(previous["event"], change["event"], key=EVENT_PRIORITY.get)
+        fields = {**previous["fields"], **change["fields"]}
+        pending[key] = {**change, "event": event, "fields": fields}
+    else:
+        pending[key] = change
+    return pending
+
+
+def send(project_id, changes):
+    layer = get_channel_layer()
+    if layer is None or not changes:
+        return
+    try:
+        async_to_sync(layer.group_send)(
+            project_group(project_id), {"type": "board.changes", "changes": changes}
+        )
+    except Exception:
+        # Доска в реальном времени не должна ломать сохранение данных
+        logger.exception("Failed to publish board changes for project %s", project_id)
+
+
+def publish(project_id, *changes):
+    """Разослать изменения после коммита текущей транзакции"""
+    changes = [change for change in changes if change is not None]
+    if changes:
+        transaction.on_commit(lambda: send(project_id, changes))
+
+
+def publish_assignees(task_id):
+    """Состав исполнителей читается после коммита, когда он уже окончательный"""
+
+    def send_assignees():
+        project_id = (
+            Task.objects.filter(pk=task_id).values_list("project_id", flat=True).first()
+        )
+        if project_id is not None:
+            send(project_id, [assignees_changed(task_id)])
+
+    transaction.on_commit(send_assignees)
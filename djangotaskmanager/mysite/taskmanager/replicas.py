@@ -0,0 +1,175 @@
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.connection import ConnectionDoesNotExist
+
+"""
+Чтение с реплик PostgreSQL
+
+Реплики - базы из TASKMANAGER_DB_REPLICAS (см. DB_REPLICAS в settings.py).
+На реплику идут только чтения GET/HEAD-запросов к представлениям с атрибутом
+replica_reads = True (списки, карточки, дашборд, поиск, доска, GET API);
+все остальное, в том числе любые чтения после записи в том же запросе и
+SELECT ... FOR UPDATE, идет в основную базу.
+
+Read-your-writes: после запроса, который что-то записал, пользователь на
+TASKMANAGER_REPLICA_PIN_SECONDS читает только основную базу, так что отставание
+реплики не прячет от него его же изменения. Отметка хранится в кэше, для
+нескольких процессов нужен общий кэш (CACHE_BACKEND).
+
+Реплика, к которой не удалось подключиться, на TASKMANAGER_REPLICA_RETRY_SECONDS
+исключается из выбора; если доступных реплик нет, чтение идет в основную базу.
+
+Кэш: ключи строятся из версий, которые запись меняет сразу, а реплика может
+еще не получить саму запись. Данные для кэша при промахе читаются в
+primary_reads(), иначе под новой версией осталась бы старая копия.
+"""
+
+logger = logging.getLogger(__name__)
+
+PIN_KEY = "taskmanager:replica-pin:{user_id}"
+
+_state = contextvars.ContextVar("taskmanager_replica_state", default=None)
+# {alias: время, до которого реплика считается недоступной}; на процесс
+_unavailable = {}
+
+
+class RoutingState:
+    """Маршрутизация чтений текущего запроса"""
+
+    def __init__(self):
+        self.allow_replica = False
+        self.wrote = False
+        self.alias = None
+
+
+def get_replicas():
+    return list(getattr(settings, "TASKMANAGER_DB_REPLICAS", []))
+
+
+def is_available(alias):
+    """Подключена ли реплика; неудачная попытка запоминается на время retry"""
+    if _unavailable.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except (ConnectionDoesNotExist, DatabaseError) as error:
+        logger.warning("Replica %s is unavailable: %s", alias, error)
+        _unavailable[alias] = time.monotonic() + getattr(
+            settings, "TASKMANAGER_REPLICA_RETRY_SECONDS", 30
+        )
+        return False
+    _unavailable.pop(alias, None)
+    return True
+
+
+def choose_replica():
+    """Случайная доступная реплика или None"""
+    replicas = get_replicas()
+    random.shuffle(replicas)
+    for alias in replicas:
+        if is_available(alias):
+            return alias
+    return None
+
+
+def pin_key(user_id):
+    return PIN_KEY.format(user_id=user_id)
+
+
+def pin(user_id):
+    """Читать только основную базу для пользователя ближайшие PIN_SECONDS"""
+    cache.set(pin_key(user_id), True, getattr(settings, "TASKMANAGER_REPLICA_PIN_SECONDS", 5))
+
+
+def is_pinned(user_id):
+    return cache.get(pin_key(user_id)) is not None
+
+
+def used_replica():
+    """Читал ли текущий запрос что-нибудь с реплики"""
+    state = _state.get()
+    return state is not None and state.alias not in (None, DEFAULT_DB_ALIAS)
+
+
+@contextmanager
+def primary_reads():
+    """Чтения внутри блока идут в основную базу"""
+    state = _state.get()
+    if state is None or not state.allow_replica:
+        yield
+        return
+    state.allow_replica = False
+    try:
+        yield
+    finally:
+        state.allow_replica = True
+
+
+class ReplicaRouter:
+    """Роутер Django: чтения на реплику, если запрос это разрешил"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.allow_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if state.alias is None:
+            # Одна реплика на весь запрос: страница не смешивает разные моменты
+            state.alias = choose_replica() or DEFAULT_DB_ALIAS
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
+
+
+def _allows_replica(request, view_func):
+    if request.method not in ("GET", "HEAD"):
+        return False
+    view_class = getattr(view_func, "view_class", None)
+    if not getattr(view_class, "replica_reads", False):
+        return False
+    user = request.user
+    return not (user.is_authenticated and is_pinned(user.pk))
+
+
+class ReplicaRoutingMiddleware:
+    """Включает чтение с реплик для представлений с replica_reads = True
+
+    Ставится после AuthenticationMiddleware. После запроса с записью
+    закрепляет пользователя за основной базой (pin).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        user = getattr(request, "user", None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin(user.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if get_replicas() and _allows_replica(request, view_func):
+            _state.get().allow_replica = True
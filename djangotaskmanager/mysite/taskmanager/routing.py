@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import consumers
+
+
+websocket_urlpatterns = [
+    path('ws/projects/<int:pk>/board/', consumers.BoardConsumer.as_asgi()),
+]
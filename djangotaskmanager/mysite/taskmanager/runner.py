@@ -0,0 +1,31 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+"""
+Запуск тестов (settings.TEST_RUNNER)
+
+Журнал пишется синхронно: буфер процесса мог бы дожить до выхода и записать
+записи тестов уже в рабочую базу. Тесты буферизованного режима включают его
+сами через override_settings. Превышение query_budget представления роняет
+тест, а не только пишется в лог.
+"""
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._settings = override_settings(
+            TASKMANAGER_ACTIVITY_MODE="sync", TASKMANAGER_QUERY_BUDGET_STRICT=True
+        )
+        self._settings.enable()
+
+    def teardown_databases(self, old_config, **kwargs):
+        from . import activity
+
+        # Записи тестовой базы не переживают ее удаление
+        activity.buffer.clear()
+        super().teardown_databases(old_config, **kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        self._settings.disable()
+        super().teardown_test_environment(**kwargs)
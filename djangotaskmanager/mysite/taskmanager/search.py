@@ -0,0 +1,127 @@
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db.models import F
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Comment, Project, Task
+
+"""
+Полнотекстовый поиск по задачам и комментариям (только PostgreSQL)
+
+Векторы Task.search_vector и Comment.search_vector хранятся в таблицах и
+поддерживаются триггерами из миграции 0008 (заголовок задачи с весом A,
+описание - B, текст комментария - C). Поиск идет по GIN-индексам и
+ограничен проектами, в которых состоит пользователь.
+"""
+
+SEARCH_CONFIG = "simple"
+SEARCH_LIMIT = 50
+
+# Те же выражения, что и в триггерах; используются для заполнения векторов
+TASK_VECTOR = SearchVector("title", weight="A", config=SEARCH_CONFIG) + SearchVector(
+    "description", weight="B", config=SEARCH_CONFIG
+)
+COMMENT_VECTOR = SearchVector("content", weight="C", config=SEARCH_CONFIG)
+
+# Маркеры подсветки, заменяемые на <mark> после экранирования текста
+_START, _STOP = "\x02", "\x03"
+
+
+def build_query(text):
+    """Запрос в синтаксисе поисковиков: слова, "фразы", -исключения, or"""
+    return SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+
+
+def _headline(field, query, **options):
+    # Без HighlightAll ts_headline выбрасывает из фрагментов похожие на теги слова
+    options = options or {"max_fragments": 2, "min_words": 5, "max_words": 20}
+    return SearchHeadline(
+        field, query, config=SEARCH_CONFIG, start_sel=_START, stop_sel=_STOP, **options
+    )
+
+
+def highlight(text):
+    """Экранировать фрагмент и превратить маркеры в <mark>"""
+    return mark_safe(
+        escape(text or "").replace(_START, "<mark>").replace(_STOP, "</mark>")
+    )
+
+
+class SearchResult:
+    def __init__(self, task, rank):
+        self.task = task
+        self.rank = rank
+        self.title = highlight(task.title_headline)
+        self.snippet = highlight(task.description_headline) if task.description else ""
+        self.comment = None
+        self.comment_snippet = ""
+
+
+def search(user, text, limit=SEARCH_LIMIT):
+    """Задачи из проектов пользователя по убыванию релевантности
+
+    Задача находится по своему тексту или по комментариям; ранг задачи -
+    максимум из ранга ее текста и рангов ее комментариев. Подсветка
+    (ts_headline) считается только для попавших в выдачу строк.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    query = build_query(text)
+    projects = Project.objects.for_user(user)
+
+    ranks = {}
+    task_hits = (
+        Task.objects.filter(project__in=projects, search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "id")
+        .values_list("id", "rank")[:limit]
+    )
+    for task_id, rank in task_hits:
+        ranks[task_id] = rank
+
+    # Лучший комментарий каждой задачи (DISTINCT ON task_id) во вложенном
+    # запросе; наружу - только limit лучших, сортировка и LIMIT в базе
+    best_per_task = (
+        Comment.objects.filter(task__project__in=projects, search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("task_id", "-rank", "id")
+        .distinct("task_id")
+        .values("id")
+    )
+    comment_hits = (
+        Comment.objects.filter(pk__in=best_per_task)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "id")
+        .values_list("id", "task_id", "rank")[:limit]
+    )
+    best_comments = {}
+    for comment_id, task_id, rank in comment_hits:
+        best_comments[task_id] = comment_id
+        ranks[task_id] = max(ranks.get(task_id, 0), rank)
+
+    top = sorted(ranks, key=lambda task_id: (-ranks[task_id], task_id))[:limit]
+    if not top:
+        return []
+
+    tasks = Task.objects.filter(pk__in=top).select_related("project", "status").annotate(
+        title_headline=_headline("title", query, highlight_all=True),
+        description_headline=_headline("description", query),
+    )
+    results = {task.pk: SearchResult(task, ranks[task.pk]) for task in tasks}
+
+    comment_ids = [best_comments[task_id] for task_id in top if task_id in best_comments]
+    comments = Comment.objects.filter(pk__in=comment_ids).select_related("author").annotate(
+        content_headline=_headline("content", query)
+    )
+    for comment in comments:
+        result = results[comment.task_id]
+        result.comment = comment
+        result.comment_snippet = highlight(comment.content_headline)
+
+    return [results[task_id] for task_id in top if task_id in results]
@@ -0,0 +1,343 @@
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.functions import Greatest
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import activity, notifications, realtime
+from .caching import bump_project_version, bump_user_version
+from .models import (
+    Assignee,
+    Attachment,
+    Blob,
+    Comment,
+    Project,
+    ProjectLabel,
+    ProjectMember,
+    ProjectSummary,
+    Status,
+    Task,
+    TaskLabel,
+)
+from .permissions import invalidate_project_roles
+
+"""
+Поддержка денормализованной сводки ProjectSummary, версий проектов для кэша,
+кэша ролей и журнала изменений
+"""
+
+
+def _deleted_with(origin, *models):
+    """Удаление каскадом от объекта или QuerySet одной из моделей"""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(origin_model, models)
+
+
+def _task_state(status_id, is_closed, due_date, now):
+    """Вклад одной задачи в счетчики сводки"""
+    is_open = not is_closed
+    return {
+        "task_count": 1,
+        "open_task_count": int(is_open),
+        "overdue_task_count": int(is_open and due_date is not None and due_date < now),
+        "status": ProjectSummary.status_key(status_id),
+    }
+
+
+def _apply_task_states(project_id, removed=None, added=None):
+    summary = (
+        ProjectSummary.objects.select_for_update().filter(project_id=project_id).first()
+    )
+    if summary is None:
+        # Сводки еще нет - пересчитываем целиком по текущему состоянию
+        if added is not None:
+            ProjectSummary.rebuild(project_id)
+        return
+
+    if removed is not None:
+        summary.apply_task(removed, -1)
+    if added is not None:
+        summary.apply_task(added, 1)
+    summary.save()
+
+
+@receiver(post_save, sender=Project)
+def create_project_summary(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProjectSummary.objects.get_or_create(project_id=instance.pk)
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_state(sender, instance, raw=False, **kwargs):
+    # Одно чтение прежнего состояния для сводки и журнала изменений
+    instance._previous_values = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_values = (
+        Task.objects.filter(pk=instance.pk)
+        .values(*activity.TRACKED_TASK_FIELDS, "task_order", "status__is_closed")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Task)
+def update_summary_on_task_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    state = _task_state(
+        instance.status_id,
+        bool(instance.status_id and instance.status.is_closed),
+        instance.due_date,
+        timezone.now(),
+    )
+    previous = getattr(instance, "_previous_values", None)
+    if previous is None:
+        _apply_task_states(instance.project_id, added=state)
+        return
+
+    previous_state = _task_state(
+        previous["status_id"],
+        bool(previous["status__is_closed"]),
+        previous["due_date"],
+        timezone.now(),
+    )
+    if previous["project_id"] == instance.project_id:
+        _apply_task_states(instance.project_id, removed=previous_state, added=state)
+    else:
+        _apply_task_states(previous["project_id"], removed=previous_state)
+        _apply_task_states(instance.project_id, added=state)
+
+
+@receiver(post_save, sender=Task)
+def record_task_activity(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_values = activity.task_values(instance)
+    previous = getattr(instance, "_previous_values", None)
+    if created or previous is None:
+        activity.record(instance, "created", new_values=new_values)
+        return
+
+    old_values = {
+        field: activity.serialize_value(previous[field])
+        for field in activity.TRACKED_TASK_FIELDS
+    }
+    old_values, new_values = activity.diff_values(old_values, new_values)
+    if new_values:
+        action_type = "status_changed" if "status_id" in new_values else "updated"
+        activity.record(instance, action_type, old_values, new_values)
+
+
+@receiver(post_save, sender=Assignee)
+def record_assignment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.record(
+            instance.task,
+            "assigned",
+            new_values={"user_id": instance.user_id, "role": instance.role},
+        )
+
+
+@receiver(post_delete, sender=Assignee)
+def record_unassignment(sender, instance, origin=None, **kwargs):
+    # При каскадном удалении задачи или проекта журнал удаляется вместе с задачей
+    if _deleted_with(origin, Task, Project):
+        return
+    task = Task(pk=instance.task_id)
+    if activity.get_actor_id() is None:
+        # Вне запроса изменение приписывается автору задачи (см. get_actor_id)
+        task = Task.objects.only("creator_id").filter(pk=instance.task_id).first() or task
+    activity.record(
+        task,
+        "assigned",
+        old_values={"user_id": instance.user_id, "role": instance.role},
+    )
+
+
+@receiver(post_delete, sender=Task)
+def update_summary_on_task_delete(sender, instance, origin=None, **kwargs):
+    # При каскадном удалении проекта сводка удаляется вместе с ним
+    if _deleted_with(origin, Project):
+        return
+    is_closed = instance.status_id is not None and (
+        Status.objects.filter(pk=instance.status_id, is_closed=True).exists()
+    )
+    state = _task_state(
+        instance.status_id,
+        is_closed,
+        instance.due_date,
+        timezone.now(),
+    )
+    _apply_task_states(instance.project_id, removed=state)
+
+
+@receiver(post_save, sender=Status)
+def update_summary_on_status_save(sender, instance, created, raw=False, **kwargs):
+    # У нового статуса еще нет задач, а смена is_closed меняет открытые задачи
+    if not created and not raw:
+        ProjectSummary.rebuild(instance.project_id)
+
+
+@receiver(post_delete, sender=Status)
+def update_summary_on_status_delete(sender, instance, **kwargs):
+    # Задачи удаленного статуса переходят в "none" через SET_NULL без сигналов.
+    # При каскадном удалении проекта сводка могла уже удалиться - не создаем заново
+    if ProjectSummary.objects.filter(project_id=instance.project_id).exists():
+        ProjectSummary.rebuild(instance.project_id)
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def update_summary_owner(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    owner_id = (
+        ProjectMember.objects.filter(project_id=instance.project_id, role="owner")
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    ProjectSummary.objects.filter(project_id=instance.project_id).update(
+        owner_id=owner_id
+    )
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def invalidate_member_roles(sender, instance, **kwargs):
+    # После коммита, иначе параллельный запрос закэширует старые роли
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_project_roles(user_id))
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=Status)
+@receiver(post_delete, sender=Status)
+@receiver(post_save, sender=ProjectLabel)
+@receiver(post_delete, sender=ProjectLabel)
+def bump_version_on_project_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_project_version(instance.project_id)
+
+
+@receiver(post_save, sender=Assignee)
+@receiver(post_delete, sender=Assignee)
+@receiver(post_save, sender=TaskLabel)
+@receiver(post_delete, sender=TaskLabel)
+def bump_version_on_task_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    project_id = (
+        Task.objects.filter(pk=instance.task_id).values_list("project_id", flat=True).first()
+    )
+    if project_id is not None:
+        bump_project_version(project_id)
+
+
+@receiver(post_save, sender=Project)
+def bump_version_on_project_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_project_version(instance.pk)
+
+
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def bump_versions_on_member_change(sender, instance, raw=False, **kwargs):
+    # Список участников проекта и список проектов пользователя
+    if not raw:
+        bump_project_version(instance.project_id)
+        bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Assignee)
+@receiver(post_delete, sender=Assignee)
+def bump_user_version_on_assignment(sender, instance, raw=False, **kwargs):
+    # Задачи пользователя на дашборде
+    if not raw:
+        bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Comment)
+def notify_on_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        notifications.enqueue_comment(instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_project_on_comment(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _deleted_with(origin, Task, Project):
+        return
+    project_id = (
+        Task.objects.filter(pk=instance.task_id).values_list("project_id", flat=True).first()
+    )
+    if project_id is not None:
+        ProjectSummary.touch(project_id)
+
+
+@receiver(post_save, sender=Attachment)
+def reference_blob(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.blob_id:
+        Blob.objects.filter(pk=instance.blob_id).update(
+            ref_count=F("ref_count") + 1, updated_at=timezone.now()
+        )
+
+
+@receiver(post_delete, sender=Attachment)
+def release_blob(sender, instance, **kwargs):
+    # Файл остается до gc_attachments: блок без ссылок может понадобиться снова
+    if instance.blob_id:
+        Blob.objects.filter(pk=instance.blob_id).update(
+            ref_count=Greatest(F("ref_count") - 1, 0), updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Attachment)
+@receiver(post_delete, sender=Attachment)
+def touch_project_on_attachment(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _deleted_with(origin, Task, Project):
+        return
+    project_id = (
+        Task.objects.filter(pk=instance.task_id).values_list("project_id", flat=True).first()
+    )
+    if project_id is not None:
+        ProjectSummary.touch(project_id)
+
+
+@receiver(post_save, sender=Task)
+def publish_task_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_values", None)
+    if created or previous is None:
+        realtime.publish(instance.project_id, realtime.task_created(instance))
+    elif previous["project_id"] != instance.project_id:
+        realtime.publish(previous["project_id"], realtime.task_deleted(instance.pk))
+        realtime.publish(instance.project_id, realtime.task_created(instance))
+    else:
+        realtime.publish(instance.project_id, realtime.task_changed(instance, previous))
+
+
+@receiver(post_delete, sender=Task)
+def publish_task_delete(sender, instance, origin=None, **kwargs):
+    # Удаленный проект больше некому показывать
+    if not _deleted_with(origin, Project):
+        realtime.publish(instance.project_id, realtime.task_deleted(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        realtime.publish(instance.task.project_id, realtime.comment_added(instance))
+
+
+@receiver(post_save, sender=Assignee)
+@receiver(post_delete, sender=Assignee)
+def publish_assignees(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not _deleted_with(origin, Task, Project):
+        realtime.publish_assignees(instance.task_id)
+
+
+request_finished.connect(activity.flush_buffer, dispatch_uid="taskmanager_activity_flush")
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+
+"""
+Хранилище вложений по содержимому
+
+Файл лежит под именем SHA-256 своего содержимого:
+    blobs/ab/cd/abcd...      - содержимое
+    thumbnails/ab/abcd.webp  - превью изображения
+    uploads/                 - временные файлы загрузок
+    imports/                 - файлы импорта задач в очереди run_jobs
+
+Одинаковые файлы хранятся один раз. Содержимое пишется во временный файл
+потоково, с подсчетом хэша по ходу записи, и переносится на место
+атомарным rename; файл с тем же хэшем уже на месте не перезаписывается.
+"""
+
+CHUNK_SIZE = 64 * 1024
+
+
+def hash_file(path):
+    """(sha256, размер) файла, читаемого блоками"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class BlobStorage(FileSystemStorage):
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == "TASKMANAGER_ATTACHMENT_ROOT":
+            self.__dict__.pop("base_location", None)
+            self.__dict__.pop("location", None)
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(
+            self._location, settings.TASKMANAGER_ATTACHMENT_ROOT
+        )
+
+    @staticmethod
+    def blob_name(digest):
+        return f"blobs/{digest[:2]}/{digest[2:4]}/{digest}"
+
+    @staticmethod
+    def thumbnail_name(digest):
+        return f"thumbnails/{digest[:2]}/{digest}.webp"
+
+    def upload_path(self, name):
+        return self.path(f"uploads/{name}")
+
+    def temp_file(self, suffix="", directory="uploads"):
+        """Временный файл в том же разделе, что и блоки (rename без копирования)"""
+        directory = self.path(directory)
+        os.makedirs(directory, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=directory, suffix=suffix, delete=False)
+
+    def write_temp(self, chunks, directory="uploads"):
+        """Записать поток блоков во временный файл: (путь, sha256, размер)
+
+        Старые файлы uploads/ удаляет gc_attachments; файлы, которые ждут
+        обработки дольше, пишутся в другой каталог.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with self.temp_file(directory=directory) as f:
+            try:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        return f.name, digest.hexdigest(), size
+
+    def ingest(self, uploaded_file):
+        """Временный файл с содержимым загруженного файла: (путь, sha256, размер)
+
+        Большие файлы Django уже сохранил на диск (TemporaryUploadedFile) -
+        они хэшируются и переносятся без повторной записи.
+        """
+        if hasattr(uploaded_file, "temporary_file_path"):
+            source = uploaded_file.temporary_file_path()
+            digest, size = hash_file(source)
+            with self.temp_file() as f:
+                path = f.name
+            file_move_safe(source, path, allow_overwrite=True)
+            return path, digest, size
+        return self.write_temp(uploaded_file.chunks(CHUNK_SIZE))
+
+    def place(self, temp_path, digest):
+        """Поставить временный файл на место блока или удалить его, если блок уже есть"""
+        target = self.path(self.blob_name(digest))
+        if os.path.exists(target):
+            os.unlink(temp_path)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+
+    def delete_blob(self, digest):
+        for name in (self.blob_name(digest), self.thumbnail_name(digest)):
+            self.delete(name)
+
+
+blob_storage = BlobStorage()
@@ -0,0 +1,273 @@
+import datetime
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Activity,
+    Assignee,
+    Comment,
+    Project,
+    ProjectLabel,
+    ProjectMember,
+    ProjectSummary,
+    Status,
+    Task,
+    TaskLabel,
+)
+from .ordering import ORDER_STEP
+
+"""
+Синтетические данные для нагрузочных тестов
+
+generate() создает детерминированный набор (одинаковый при одном seed):
+пользователей, проекты с участниками и ролями, статусы, метки, задачи с
+исполнителями, метками, комментариями и записями журнала. Строки пишутся
+bulk_create пачками, без сигналов, поэтому сводки проектов пересчитываются
+в конце. Первый пользователь набора - владелец всех проектов, от его имени
+работает команда benchmark_views.
+
+Имена пользователей и проектов начинаются с префикса synthetic-<seed>-,
+по нему clear() удаляет набор.
+"""
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+
+WORDS = (
+    "api auth backend billing board cache client dashboard deploy docs export "
+    "filter import invoice login mobile notify onboarding payment profile "
+    "report search settings signup sync upload webhook"
+).split()
+VERBS = "add fix refactor remove review test update migrate document speed".split()
+STATUSES = [
+    ("Backlog", False),
+    ("To do", False),
+    ("In progress", False),
+    ("Review", False),
+    ("Done", True),
+]
+LABEL_COLORS = ["#d73a4a", "#0075ca", "#a2eeef", "#7057ff", "#008672", "#e4e669"]
+MEMBER_ROLES = ["admin", "member", "member", "member", "viewer"]
+ASSIGNEE_ROLES = ["assignee", "assignee", "reviewer", "watcher"]
+
+
+class Scale:
+    """Размер набора: tasks, comments и activities - на проект и на задачу"""
+
+    def __init__(self, projects, users, members, tasks, comments, activities, labels=6):
+        self.projects = projects
+        self.users = users
+        self.members = members
+        self.tasks = tasks
+        self.comments = comments
+        self.activities = activities
+        self.labels = labels
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+SCALES = {
+    "small": Scale(projects=5, users=20, members=5, tasks=100, comments=2, activities=3),
+    "medium": Scale(projects=20, users=100, members=15, tasks=500, comments=3, activities=4),
+    "large": Scale(projects=50, users=500, members=40, tasks=2000, comments=4, activities=5),
+}
+
+
+def prefix(seed):
+    return f"synthetic-{seed}-"
+
+
+def exists(seed):
+    return User.objects.filter(username__startswith=prefix(seed)).exists()
+
+
+def clear(seed):
+    """Удалить набор seed: проекты (с задачами каскадом) и пользователей"""
+    with transaction.atomic():
+        Project.objects.filter(name__startswith=prefix(seed)).delete()
+        User.objects.filter(username__startswith=prefix(seed)).delete()
+
+
+def _by_project(objects):
+    grouped = {}
+    for item in objects:
+        grouped.setdefault(item.project_id, []).append(item)
+    return grouped
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+class Generator:
+    def __init__(self, scale, seed=1, password="synthetic"):
+        self.scale = scale
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.password = password
+        self.now = timezone.now()
+        self.counts = {}
+
+    def _bulk(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(created)
+        return created
+
+    def create_users(self):
+        # Один хэш на всех: хэширование пароля занимает десятки миллисекунд
+        password = make_password(self.password)
+        return self._bulk(
+            User,
+            [
+                User(username=f"{prefix(self.seed)}user{index}", password=password)
+                for index in range(self.scale.users)
+            ],
+        )
+
+    def create_projects(self, users):
+        owner = users[0]
+        projects = self._bulk(
+            Project,
+            [
+                Project(
+                    name=f"{prefix(self.seed)}project{index}",
+                    description=_sentence(self.rng, 12),
+                )
+                for index in range(self.scale.projects)
+            ],
+        )
+
+        members = {}
+        rows = []
+        for project in projects:
+            others = self.rng.sample(users[1:], min(self.scale.members, len(users) - 1))
+            members[project.pk] = [owner, *others]
+            rows.append(ProjectMember(project=project, user=owner, role="owner"))
+            rows += [
+                ProjectMember(project=project, user=user, role=self.rng.choice(MEMBER_ROLES))
+                for user in others
+            ]
+        self._bulk(ProjectMember, rows)
+        return projects, members
+
+    def create_statuses_and_labels(self, projects):
+        statuses = self._bulk(
+            Status,
+            [
+                Status(project=project, name=name, order=order, is_closed=is_closed)
+                for project in projects
+                for order, (name, is_closed) in enumerate(STATUSES)
+            ],
+        )
+        labels = self._bulk(
+            ProjectLabel,
+            [
+                ProjectLabel(
+                    project=project,
+                    name=f"{WORDS[index % len(WORDS)]}-{index}",
+                    color=LABEL_COLORS[index % len(LABEL_COLORS)],
+                )
+                for project in projects
+                for index in range(self.scale.labels)
+            ],
+        )
+        return _by_project(statuses), _by_project(labels)
+
+    def task(self, project, members, status, order):
+        rng = self.rng
+        due_date = None
+        if rng.random() < 0.6:
+            # Часть сроков в прошлом: просроченные задачи
+            due_date = self.now + datetime.timedelta(days=rng.randint(-30, 90))
+        return Task(
+            project=project,
+            title=f"{rng.choice(VERBS).capitalize()} {_sentence(rng, 3)}",
+            description=_sentence(rng, rng.randint(5, 40)),
+            priority=rng.choice("12345"),
+            due_date=due_date,
+            estimated_hours=datetime.timedelta(hours=rng.randint(1, 40)),
+            status=status,
+            task_order=order,
+            creator=rng.choice(members),
+        )
+
+    def create_tasks(self, project, members, statuses, labels):
+        rng = self.rng
+        orders = {}
+        tasks = []
+        for _ in range(self.scale.tasks):
+            status = rng.choice(statuses)
+            orders[status.pk] = orders.get(status.pk, 0) + ORDER_STEP
+            tasks.append(self.task(project, members, status, orders[status.pk]))
+        tasks = self._bulk(Task, tasks)
+
+        assignees, task_labels, comments, activities = [], [], [], []
+        for task in tasks:
+            for user in rng.sample(members, min(rng.randint(0, 3), len(members))):
+                assignees.append(
+                    Assignee(task=task, user=user, role=rng.choice(ASSIGNEE_ROLES))
+                )
+            for label in rng.sample(labels, min(rng.randint(0, 3), len(labels))):
+                task_labels.append(TaskLabel(task=task, label=label))
+            for _ in range(rng.randint(0, 2 * self.scale.comments)):
+                comments.append(
+                    Comment(
+                        task=task,
+                        author=rng.choice(members),
+                        content=_sentence(rng, rng.randint(3, 30)),
+                    )
+                )
+            activities.append(
+                Activity(
+                    task=task,
+                    user=task.creator,
+                    action_type="created",
+                    new_values={"title": task.title},
+                )
+            )
+            for _ in range(rng.randint(0, 2 * (self.scale.activities - 1))):
+                status = rng.choice(statuses)
+                activities.append(
+                    Activity(
+                        task=task,
+                        user=rng.choice(members),
+                        action_type="status_changed",
+                        old_values={"status": task.status_id},
+                        new_values={"status": status.pk},
+                    )
+                )
+        self._bulk(Assignee, assignees)
+        self._bulk(TaskLabel, task_labels)
+        self._bulk(Comment, comments)
+        self._bulk(Activity, activities)
+
+    def run(self, progress=None):
+        """Создать набор; progress(project_index) вызывается после каждого проекта"""
+        users = self.create_users()
+        projects, members = self.create_projects(users)
+        statuses, labels = self.create_statuses_and_labels(projects)
+        for index, project in enumerate(projects):
+            # Транзакция на проект: большой набор не держит одну длинную транзакцию
+            with transaction.atomic():
+                self.create_tasks(
+                    project, members[project.pk], statuses[project.pk], labels[project.pk]
+                )
+                ProjectSummary.rebuild(project.pk)
+            if progress:
+                progress(index)
+        return users[0], projects
+
+
+def generate(scale, seed=1, password="synthetic", progress=None):
+    """Создать набор размера scale: (владелец проектов, проекты, счетчики строк)"""
+    if isinstance(scale, str):
+        scale = SCALES[scale]
+    generator = Generator(scale, seed=seed, password=password)
+    owner, projects = generator.run(progress)
+    return owner, projects, generator.counts
@@ -0,0 +1,70 @@
+from django import template
+from django.template.base import token_kwargs
+
+from taskmanager.caching import fragment_key, get_fragment, set_fragment
+from taskmanager.permissions import get_project_role, has_project_role
+from taskmanager.replicas import primary_reads
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def project_role(context, project):
+    """Роль текущего пользователя в проекте: {% project_role project as role %}"""
+    request = context.get("request")
+    if request is None:
+        return None
+    return get_project_role(request, project)
+
+
+@register.simple_tag(takes_context=True)
+def is_project_owner(context, project):
+    """{% is_project_owner project as owner %}"""
+    request = context.get("request")
+    return request is not None and has_project_role(request, project, "owner")
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, options):
+        self.nodelist = nodelist
+        self.name = name
+        self.options = options
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        options = {key: value.resolve(context) for key, value in self.options.items()}
+        timeout = options.pop("timeout", None)
+
+        key = fragment_key(name, **options)
+        html = get_fragment(name, key)
+        if html is None:
+            # Данные фрагмента - из основной базы: реплика может отставать от
+            # версий в ключе
+            with primary_reads():
+                html = self.nodelist.render(context)
+            set_fragment(key, html, timeout)
+        return html
+
+
+@register.tag
+def cachefragment(parser, token):
+    """Кэш фрагмента с ключом по версиям проектов и пользователя
+
+    {% cachefragment "name" project=project user=user projects=ids timeout=600 %}
+    ...
+    {% endcachefragment %}
+
+    Остальные именованные аргументы тоже входят в ключ. Внутри фрагмента
+    нельзя использовать {% csrf_token %} и данные, не отраженные в ключе.
+    Данные фрагмента должны загружаться лениво внутри него: при промахе они
+    читаются из основной базы, а не с реплики.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' requires a fragment name")
+    options = token_kwargs(bits[2:], parser)
+    if len(options) != len(bits) - 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' accepts only keyword arguments")
+    nodelist = parser.parse(("endcachefragment",))
+    parser.delete_first_token()
+    return CachedFragmentNode(nodelist, parser.compile_filter(bits[1]), options)
@@ -1,13 +1,69 @@
-from django.test import TestCase, Client
+import datetime
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+from urllib.parse import parse_qsl
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.test import RequestFactory, TestCase, TransactionTestCase, Client, override_settings
 from django.contrib.auth.models import User
+from django.db import DataError, IntegrityError, ProgrammingError, connection, transaction
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from taskmanager import (
+    activity,
+    attachments,
+    board,
+    cloning,
+    importexport,
+    jobs,
+    notifications,
+    ordering,
+    partitioning,
+    permissions,
+    replicas,
+    search,
+    synthetic,
+)
+from taskmanager.caching import fragment_key
+from taskmanager.instrumentation import QueryBudgetExceeded, SharedCounters, metrics_cache
 from taskmanager.views import (
+    DashboardView,
     RegisterView,
     ProjectCreateView,
     ProjectListView,
     ProjectDetailView,
     ProjectUpdateView,
 )
+from taskmanager.routing import websocket_urlpatterns
+from taskmanager.models import (
+    Activity,
+    Assignee,
+    Attachment,
+    Blob,
+    Comment,
+    Job,
+    Project,
+    ProjectLabel,
+    ProjectMember,
+    ProjectSummary,
+    Status,
+    Task,
+    TaskLabel,
+    UploadSession,
+)
 
 # Create your tests here.
 # class RegisterViewTestCase(TestCase):
@@ -20,4 +76,1798 @@ from taskmanager.views import (
 #             'password1': 'testpassword123456789',
 #             'password2': 'testpassword123456789'
 #         }
-#     def 
\ No newline at end of file
+#     def 
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN-проверки только для PostgreSQL")
+class IndexUsageTestCase(TestCase):
+    """Основные запросы представлений должны идти по индексам, а не Seq Scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.project = Project.objects.create(name="Indexed", description="")
+        ProjectMember.objects.create(project=cls.project, user=cls.user, role="owner")
+        statuses = Status.objects.bulk_create(
+            Status(project=cls.project, name=f"Status {i}", order=i) for i in range(5)
+        )
+        cls.status = statuses[0]
+
+        other = Project.objects.create(name="Other", description="")
+        tasks = Task.objects.bulk_create(
+            Task(
+                project=cls.project if i % 2 else other,
+                title=f"Task {i}",
+                task_order=i % 10,
+                status=statuses[i // 2 % 5] if i % 2 else None,
+                creator=cls.user,
+            )
+            for i in range(500)
+        )
+        Comment.objects.bulk_create(
+            Comment(task=task, author=cls.user, content="text") for task in tasks
+        )
+        Activity.objects.bulk_create(
+            Activity(task=task, user=cls.user, action_type="created")
+            for task in tasks
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def view_plans(self, url):
+        """Планы всех SELECT, которые выполнило представление"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            # На маленьком наборе данных планировщик предпочтет Seq Scan или
+            # Bitmap Scan с сортировкой, поэтому проверяем, что индекс вообще
+            # пригоден для фильтра и порядка запроса
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_bitmapscan = off")
+            cursor.execute("SET LOCAL enable_sort = off")
+            for query in queries.captured_queries:
+                if query["sql"].startswith("SELECT"):
+                    cursor.execute("EXPLAIN " + query["sql"])
+                    plans.append("\n".join(row[0] for row in cursor.fetchall()))
+        return plans
+
+    def index_names(self, index):
+        """Индекс и его копии на секциях (для секционированной таблицы)"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                WHERE parent.relname = %s
+                """,
+                [index],
+            )
+            return [index] + [row[0] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, url, index):
+        plans = "\n\n".join(self.view_plans(url))
+        names = self.index_names(index)
+        self.assertTrue(any(f"using {name} on" in plans for name in names), plans)
+
+    def test_project_list(self):
+        self.assertUsesIndex(reverse("project_list"), "project_created_idx")
+
+    def test_task_list(self):
+        self.assertUsesIndex(reverse("task_list"), "task_order_idx")
+
+    def test_project_tasks(self):
+        self.assertUsesIndex(
+            reverse("project_detail", args=[self.project.pk]), "task_project_order_idx"
+        )
+
+    def test_board_column(self):
+        self.assertUsesIndex(
+            reverse("board_column", args=[self.project.pk, self.status.pk]),
+            "task_project_status_idx",
+        )
+
+    def test_task_comments(self):
+        task = Task.objects.filter(project=self.project).first()
+        self.assertUsesIndex(reverse("task_detail", args=[task.pk]), "comment_task_created_idx")
+
+    def test_task_activity(self):
+        task = Task.objects.filter(project=self.project).first()
+        self.assertUsesIndex(
+            reverse("task_activity", args=[task.pk]), "activity_task_created_idx"
+        )
+
+    def test_single_owner_constraint(self):
+        second = User.objects.create_user(username="second", password="password")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ProjectMember.objects.create(project=self.project, user=second, role="owner")
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    TASKMANAGER_REALTIME_COALESCE_DELAY=0.2,
+)
+class BoardConsumerTestCase(TransactionTestCase):
+    """Изменения доходят до подписчиков доски одним кадром после коммита"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="member", password="password")
+        self.outsider = User.objects.create_user(username="outsider", password="password")
+        self.project = Project.objects.create(name="Realtime", description="")
+        ProjectMember.objects.create(project=self.project, user=self.user, role="owner")
+        self.todo = Status.objects.create(project=self.project, name="Todo", order=1)
+        self.done = Status.objects.create(project=self.project, name="Done", order=2)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f"/ws/projects/{self.project.pk}/board/"
+        )
+        communicator.scope["user"] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_outsider_is_rejected(self):
+        communicator, connected = await self.connect(self.outsider)
+        self.assertFalse(connected)
+
+    async def test_changes_are_coalesced(self):
+        communicator, connected = await self.connect(self.user)
+        self.assertTrue(connected)
+
+        @database_sync_to_async
+        def change_board():
+            task = Task.objects.create(
+                project=self.project, title="Draft", status=self.todo, creator=self.user
+            )
+            task.title = "Final"
+            task.status = self.done
+            task.save()
+            Comment.objects.create(task=task, author=self.user, content="Done")
+            return task
+
+        task = await change_board()
+        frame = await communicator.receive_json_from(timeout=2)
+        changes = {change["key"]: change for change in frame["changes"]}
+
+        self.assertEqual(len(changes), 2)
+        created = changes[f"task:{task.pk}"]
+        self.assertEqual(created["event"], "task.created")
+        self.assertEqual(created["fields"]["title"], "Final")
+        self.assertEqual(created["fields"]["status"], self.done.pk)
+        self.assertEqual(
+            [change["event"] for change in changes.values()],
+            ["task.created", "comment.added"],
+        )
+        self.assertTrue(await communicator.receive_nothing(timeout=0.3))
+        await communicator.disconnect()
+
+
+@override_settings(TASKMANAGER_ACTIVITY_MODE="sync")
+class TaskBulkViewTestCase(TestCase):
+    """Операции пачки проверяются вместе и применяются все или ни одной"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.reviewer = User.objects.create_user(username="reviewer", password="password")
+        cls.project = Project.objects.create(name="Bulk", description="")
+        ProjectMember.objects.create(project=cls.project, user=cls.user, role="owner")
+        ProjectMember.objects.create(project=cls.project, user=cls.reviewer, role="member")
+        cls.done = Status.objects.create(project=cls.project, name="Done", order=1)
+        cls.label = ProjectLabel.objects.create(project=cls.project, name="urgent")
+        cls.tasks = [
+            Task.objects.create(project=cls.project, title=f"Task {i}", creator=cls.user)
+            for i in range(20)
+        ]
+
+    def setUp(self):
+        self.client.login(username="owner", password="password")
+        self.url = reverse("project_task_bulk", args=[self.project.pk])
+
+    def post(self, operations):
+        return self.client.post(
+            self.url, {"operations": operations}, content_type="application/json"
+        )
+
+    def test_operations_are_applied_in_bulk(self):
+        operations = [
+            {"op": "update", "id": task.pk, "fields": {"status": self.done.pk}}
+            for task in self.tasks
+        ]
+        operations += [
+            {"op": "assign", "task": task.pk, "user": self.reviewer.pk, "role": "reviewer"}
+            for task in self.tasks
+        ]
+        operations.append(
+            {
+                "op": "create",
+                "fields": {"title": "New", "priority": "1"},
+                "labels": [self.label.pk],
+            }
+        )
+        # Число запросов не зависит от числа задач (41 операция)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(operations)
+        self.assertLess(len(queries), 30)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data["applied"])
+        created = Task.objects.get(pk=data["results"][-1]["id"])
+        self.assertEqual(created.task_labels.get().label, self.label)
+        self.assertEqual(Task.objects.filter(status=self.done).count(), 20)
+        self.assertEqual(Assignee.objects.filter(role="reviewer").count(), 20)
+        self.assertEqual(Activity.objects.filter(action_type="status_changed").count(), 20)
+        self.assertEqual(Activity.objects.filter(action_type="assigned").count(), 20)
+        self.assertEqual(self.project.summary.status_counts[str(self.done.pk)], 20)
+
+    def test_invalid_operation_rolls_back_batch(self):
+        response = self.post(
+            [
+                {"op": "update", "id": self.tasks[0].pk, "fields": {"title": "Renamed"}},
+                {
+                    "op": "update",
+                    "id": self.tasks[1].pk,
+                    "fields": {"due_date": "2000-01-01T00:00:00Z"},
+                },
+            ]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        results = response.json()["results"]
+        self.assertEqual(results[0]["status"], "ok")
+        self.assertIn("due_date", results[1]["errors"])
+        self.tasks[0].refresh_from_db()
+        self.assertEqual(self.tasks[0].title, "Task 0")
+
+    def test_only_members_can_be_assigned(self):
+        outsider = User.objects.create_user(username="outsider", password="password")
+        response = self.post(
+            [
+                {"op": "assign", "task": self.tasks[0].pk, "user": outsider.pk},
+                {
+                    "op": "create",
+                    "fields": {"title": "New"},
+                    "assignees": [{"user": outsider.pk}],
+                },
+            ]
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("outsider", response.content.decode())
+        for result in response.json()["results"]:
+            self.assertEqual(
+                result["errors"]["user"],
+                [f"User {outsider.pk} is not a member of the project"],
+            )
+        self.assertFalse(Assignee.objects.exists())
+
+        # Исполнителя, покинувшего проект, можно снять
+        Assignee.objects.create(task=self.tasks[0], user=outsider)
+        response = self.post(
+            [{"op": "unassign", "task": self.tasks[0].pk, "user": outsider.pk}]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Assignee.objects.exists())
+
+
+@override_settings(TASKMANAGER_ACTIVITY_MODE="sync")
+class ActivityTestCase(TestCase):
+    """Журнал хранит только изменившиеся поля; буфер пишет записи пачкой"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.member = User.objects.create_user(username="member", password="password")
+        self.project = Project.objects.create(name="Activity", description="")
+        self.todo = Status.objects.create(project=self.project, name="Todo", order=1)
+        self.task = Task.objects.create(project=self.project, title="Task", creator=self.user)
+
+    def entries(self, task):
+        return list(
+            Activity.objects.filter(task=task)
+            .order_by("id")
+            .values_list("action_type", "user_id", "old_values", "new_values")
+        )
+
+    def test_sync_records_changed_fields(self):
+        self.task.title = "Renamed"
+        self.task.save()
+        self.task.status = self.todo
+        self.task.save()
+        self.task.save()
+
+        self.assertEqual(
+            self.entries(self.task)[1:],
+            [
+                ("updated", self.user.pk, {"title": "Task"}, {"title": "Renamed"}),
+                ("status_changed", self.user.pk, {"status_id": None}, {"status_id": self.todo.pk}),
+            ],
+        )
+
+    def test_unassignment_outside_request_is_attributed_to_creator(self):
+        assignee = Assignee.objects.create(task=self.task, user=self.member, role="assignee")
+        assignee.delete()
+
+        self.assertEqual(
+            self.entries(self.task)[-1],
+            ("assigned", self.user.pk, {"user_id": self.member.pk, "role": "assignee"}, None),
+        )
+
+    @override_settings(
+        TASKMANAGER_ACTIVITY_MODE="buffered", TASKMANAGER_ACTIVITY_FLUSH_INTERVAL=3600
+    )
+    def test_buffered_entries_are_written_after_commit(self):
+        activity.buffer.flush()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.title = "Buffered"
+            self.task.save()
+            other = Task.objects.create(project=self.project, title="Other", creator=self.user)
+            self.assertEqual(len(activity.buffer), 0)
+
+        self.assertEqual(len(activity.buffer), 2)
+        other.delete()
+        # Запись удаленной задачи отбрасывается
+        self.assertEqual(activity.buffer.flush(), 1)
+        self.assertEqual(self.entries(self.task)[-1][3], {"title": "Buffered"})
+
+    def test_flush_failure_is_logged(self):
+        buffer = activity.ActivityBuffer()
+        buffer.add(Activity(task=self.task, user=self.user, action_type="updated"))
+        with mock.patch.object(
+            activity.ActivityBuffer, "_existing_task_ids", side_effect=ProgrammingError
+        ), self.assertLogs("taskmanager.activity", "ERROR"):
+            self.assertEqual(buffer.flush(), 0)
+
+    def test_entries_of_another_database_are_dropped(self):
+        buffer = activity.ActivityBuffer()
+        buffer.add(Activity(task=self.task, user=self.user, action_type="updated"))
+        # Тестовая база удалена, соединение вернулось к рабочей
+        with mock.patch.object(activity, "_database_name", return_value="tm"), \
+                self.assertLogs("taskmanager.activity", "WARNING"):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(len(buffer), 0)
+        self.assertFalse(Activity.objects.filter(action_type="updated").exists())
+
+
+@override_settings(TASKMANAGER_ACTIVITY_MODE="sync")
+class ActivityBufferTestCase(TransactionTestCase):
+    """Задача, удаленная во время записи пачки, не теряет записи остальных"""
+
+    def test_falls_back_to_single_inserts(self):
+        user = User.objects.create_user(username="owner", password="password")
+        project = Project.objects.create(name="Activity", description="")
+        kept = Task.objects.create(project=project, title="Kept", creator=user)
+        gone = Task.objects.create(project=project, title="Gone", creator=user)
+        buffer = activity.ActivityBuffer()
+        for task_id in (kept.pk, gone.pk):
+            buffer.add(Activity(task_id=task_id, user=user, action_type="updated"))
+        gone.delete()
+
+        # Проверка существования прошла до удаления
+        with mock.patch.object(
+            activity.ActivityBuffer, "_existing_task_ids", return_value={kept.pk, gone.pk}
+        ):
+            self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(
+            list(Activity.objects.filter(action_type="updated").values_list("task_id", flat=True)),
+            [kept.pk],
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "Секционирование только для PostgreSQL")
+@override_settings(TASKMANAGER_ACTIVITY_MODE="sync")
+class ActivityPartitionTestCase(TestCase):
+    """Секция отсоединяется только после успешной выгрузки"""
+
+    month = datetime.date(2001, 1, 1)
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        user = User.objects.create_user(username="owner", password="password")
+        project = Project.objects.create(name="Archive", description="")
+        task = Task.objects.create(project=project, title="Old", creator=user)
+        self.name = partitioning.create_partition(self.month)
+        # Строка переезжает в секцию января 2001
+        Activity.objects.filter(task=task).update(
+            created_at=datetime.datetime(2001, 1, 15, tzinfo=datetime.timezone.utc)
+        )
+        # Отложенные проверки FK иначе не дают удалить секцию в транзакции теста
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def test_failed_export_keeps_partition_attached(self):
+        with mock.patch.object(partitioning.gzip, "open", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                partitioning.archive_partition(self.name, self.archive_dir)
+
+        self.assertIn((self.month, self.name), partitioning.list_partitions())
+        self.assertEqual(Activity.objects.filter(created_at__year=2001).count(), 1)
+        self.assertEqual(os.listdir(self.archive_dir), [])
+
+    def test_archive_exports_and_drops(self):
+        path = partitioning.archive_partition(self.name, self.archive_dir)
+
+        self.assertNotIn((self.month, self.name), partitioning.list_partitions())
+        self.assertFalse(Activity.objects.filter(created_at__year=2001).exists())
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            records = [json.loads(line) for line in archive]
+        self.assertEqual([record["action_type"] for record in records], ["created"])
+
+
+class TaskOrderingTestCase(TestCase):
+    """Перемещение встает между реальными соседями колонки"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.project = Project.objects.create(name="Ordering", description="")
+        ProjectMember.objects.create(project=self.project, user=self.user, role="owner")
+        self.todo = Status.objects.create(project=self.project, name="Todo", order=1)
+        self.done = Status.objects.create(project=self.project, name="Done", order=2)
+
+    def task(self, title, task_order, status=None):
+        return Task.objects.create(
+            project=self.project,
+            title=title,
+            task_order=task_order,
+            status=status or self.todo,
+            creator=self.user,
+        )
+
+    def column(self, status=None):
+        return list(
+            ordering.column_queryset(self.project.pk, (status or self.todo).pk).values_list(
+                "title", flat=True
+            )
+        )
+
+    def test_only_before_lands_after_predecessor(self):
+        self.task("A", 1024)
+        b = self.task("B", 1536)
+        moved = self.task("C", 0, self.done)
+
+        ordering.move_task(moved, status_id=self.todo.pk, before_id=b.pk)
+        self.assertEqual(self.column(), ["A", "C", "B"])
+        self.assertEqual(moved.task_order, 1280)
+
+    def test_only_after_stays_above_next_task(self):
+        a = self.task("A", 1024)
+        self.task("B", 1100)
+        moved = self.task("C", 4096)
+
+        ordering.move_task(moved, status_id=self.todo.pk, after_id=a.pk)
+        self.assertEqual(self.column(), ["A", "C", "B"])
+
+    def test_without_neighbours_appends(self):
+        self.task("A", 1024)
+        self.task("B", 2048)
+        moved = self.task("C", 0, self.done)
+        other = self.task("D", 0, self.done)
+
+        tasks = ordering.move_tasks(self.project, [moved.pk, other.pk], status_id=self.todo.pk)
+        self.assertEqual(self.column(), ["A", "B", "C", "D"])
+        self.assertEqual([task.task_order for task in tasks], [3072, 4096])
+
+    def test_tie_with_neighbour_rebalances_column(self):
+        self.task("A", 1024)
+        b = self.task("B", 1024)
+        b.created_at = b.created_at - datetime.timedelta(minutes=1)
+        b.save(update_fields=["created_at"])
+        moved = self.task("C", 0, self.done)
+
+        # B выше A: при равном task_order раньше идет более новая задача
+        self.assertEqual(self.column(), ["A", "B"])
+        ordering.move_task(moved, status_id=self.todo.pk, before_id=b.pk)
+        self.assertEqual(self.column(), ["A", "C", "B"])
+
+    def test_invalid_ids(self):
+        moved = self.task("A", 1024)
+        with self.assertRaises(ordering.MoveError):
+            ordering.move_task(moved, status_id=self.todo.pk, after_id="1")
+        with self.assertRaises(ordering.MoveError):
+            ordering.reorder_statuses(self.project, [self.todo.pk, "x"])
+
+        self.client.login(username="owner", password="password")
+        response = self.client.post(
+            reverse("status_reorder", args=[self.project.pk]),
+            {"statuses": [self.done.pk, None]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            reverse("status_reorder", args=[self.project.pk]),
+            {"statuses": [self.done.pk, self.todo.pk]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(self.project.statuses.order_by("order").values_list("name", flat=True)),
+            ["Done", "Todo"],
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "Полнотекстовый поиск только для PostgreSQL")
+class SearchTestCase(TestCase):
+    """Поиск по задачам и комментариям проектов пользователя"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.project = Project.objects.create(name="Search", description="")
+        ProjectMember.objects.create(project=self.project, user=self.user, role="owner")
+        self.other = Project.objects.create(name="Other", description="")
+
+    def task(self, title, description="", project=None):
+        return Task.objects.create(
+            project=project or self.project,
+            title=title,
+            description=description,
+            creator=self.user,
+        )
+
+    def test_ranks_tasks_and_comments(self):
+        titled = self.task("Deploy <b>script</b>", "run deploy")
+        commented = self.task("Unrelated", "nothing here")
+        Comment.objects.create(task=commented, author=self.user, content="deploy after review")
+        self.task("Deploy elsewhere", project=self.other)
+
+        results = search.search(self.user, "deploy")
+
+        self.assertEqual([result.task for result in results], [titled, commented])
+        self.assertIn("<mark>Deploy</mark> &lt;b&gt;script", results[0].title)
+        self.assertEqual(results[1].comment.task_id, commented.pk)
+        self.assertIn("<mark>deploy</mark>", results[1].comment_snippet)
+
+    def test_comment_hits_are_limited_in_sql(self):
+        for number in range(5):
+            task = self.task(f"Task {number}")
+            Comment.objects.bulk_create(
+                Comment(task=task, author=self.user, content="apple " * (count + 1))
+                for count in range(number + 1)
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            results = search.search(self.user, "apple", limit=2)
+
+        self.assertEqual([result.task.title for result in results], ["Task 4", "Task 3"])
+        self.assertEqual(results[0].comment.content, "apple " * 5)
+        comment_query = next(
+            query["sql"] for query in queries.captured_queries if "DISTINCT ON" in query["sql"]
+        )
+        self.assertTrue(comment_query.endswith("LIMIT 2"), comment_query)
+
+
+@override_settings(TASKMANAGER_ACTIVITY_MODE="sync")
+class ApiTestCase(TestCase):
+    """JSON API: поля, связи, курсор и проверка параметров"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.member = User.objects.create_user(username="member", password="password")
+        cls.project = Project.objects.create(name="Api", description="")
+        ProjectMember.objects.create(project=cls.project, user=cls.user, role="owner")
+        ProjectMember.objects.create(project=cls.project, user=cls.member, role="member")
+        cls.status = Status.objects.create(project=cls.project, name="Todo", order=1)
+        label = ProjectLabel.objects.create(project=cls.project, name="bug")
+        cls.tasks = [
+            Task.objects.create(
+                project=cls.project,
+                title=f"Task {number}",
+                task_order=number,
+                status=cls.status if number % 2 else None,
+                creator=cls.user,
+            )
+            for number in range(5)
+        ]
+        Assignee.objects.create(task=cls.tasks[1], user=cls.member, role="reviewer")
+        TaskLabel.objects.create(task=cls.tasks[1], label=label)
+        hidden = Project.objects.create(name="Hidden", description="")
+        cls.hidden_task = Task.objects.create(project=hidden, title="Hidden", creator=cls.user)
+
+    def setUp(self):
+        self.client.login(username="owner", password="password")
+
+    def get(self, name, expected=200, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, expected, response.content)
+        return response.json()
+
+    def test_task_list_fields_and_includes(self):
+        data = self.get(
+            "api_task_list",
+            fields="id,title",
+            include="assignees,labels,status,creator",
+            status=self.status.pk,
+        )["data"]
+
+        self.assertEqual([item["title"] for item in data], ["Task 1", "Task 3"])
+        self.assertEqual(
+            data[0],
+            {
+                "id": self.tasks[1].pk,
+                "title": "Task 1",
+                "assignees": [{"user": self.member.pk, "username": "member", "role": "reviewer"}],
+                "labels": [{"id": data[0]["labels"][0]["id"], "name": "bug", "color": "#808080"}],
+                "status": {"id": self.status.pk, "name": "Todo", "is_closed": False},
+                "creator": {"id": self.user.pk, "username": "owner"},
+            },
+        )
+        self.assertEqual(data[1]["assignees"], [])
+
+    def test_cursor_pages_through_visible_tasks(self):
+        titles, cursor = [], None
+        while True:
+            params = {"fields": "title", "page_size": 2}
+            if cursor:
+                params["cursor"] = cursor
+            page = self.get("api_task_list", **params)
+            titles += [item["title"] for item in page["data"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(titles, [f"Task {number}" for number in range(5)])
+        self.get("api_task_list", expected=404, cursor="garbage")
+
+    def test_filters_and_errors(self):
+        data = self.get("api_task_list", fields="title", status="none")["data"]
+        self.assertEqual([item["title"] for item in data], ["Task 0", "Task 2", "Task 4"])
+
+        self.get("api_task_list", expected=400, fields="title,secret")
+        self.get("api_task_list", expected=400, include="everything")
+        self.get("api_task_list", expected=400, project="x")
+        self.get("api_task_list", expected=400, project="9" * 30)
+        self.get("api_activity_list", expected=400)
+        self.get("api_activity_list", expected=400, task="none")
+        self.get("api_activity_list", expected=404, task=10**9)
+
+        self.client.logout()
+        self.get("api_task_list", expected=401)
+
+    def test_activity_and_detail(self):
+        task = self.tasks[1]
+        data = self.get("api_activity_list", task=task.pk, include="user")["data"]
+        self.assertEqual(
+            [(item["action_type"], item["user"]) for item in data],
+            [
+                ("assigned", {"id": self.user.pk, "username": "owner"}),
+                ("created", {"id": self.user.pk, "username": "owner"}),
+            ],
+        )
+
+        response = self.client.get(reverse("api_task", args=[task.pk]), {"fields": "id,status"})
+        self.assertEqual(response.json(), {"data": {"id": task.pk, "status": self.status.pk}})
+        self.assertEqual(
+            self.client.get(reverse("api_task", args=[self.hidden_task.pk])).status_code, 404
+        )
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Списки задач и проектов листаются курсором по порядку сортировки"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.projects = []
+        for number in range(5):
+            project = Project.objects.create(name=f"Project {number}", description="")
+            ProjectMember.objects.create(project=project, user=cls.user, role="owner")
+            cls.projects.append(project)
+        cls.tasks = [
+            Task.objects.create(
+                project=cls.projects[0],
+                title=f"Task {number}",
+                # Одинаковый порядок: дальше решают created_at и id
+                task_order=number // 2,
+                creator=cls.user,
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        self.client.login(username="owner", password="password")
+
+    def pages(self, url):
+        pages, params = [], {"page_size": 2}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append([obj.pk for obj in response.context["object_list"]])
+            next_url = response.context.get("next_page_url")
+            if next_url is None:
+                return pages
+            params = dict(parse_qsl(next_url.lstrip("?")))
+
+    def test_task_list(self):
+        expected = Task.objects.order_by("task_order", "-created_at", "id")
+        ids = list(expected.values_list("pk", flat=True))
+        self.assertEqual(self.pages(reverse("task_list")), [ids[:2], ids[2:4], ids[4:]])
+
+    def test_project_list(self):
+        ids = [project.pk for project in reversed(self.projects)]
+        self.assertEqual(
+            self.pages(reverse("project_list")), [ids[:2], ids[2:4], ids[4:]]
+        )
+
+    def test_invalid_cursor(self):
+        for cursor in ("garbage", "eyJ4IjogMX0"):
+            response = self.client.get(reverse("task_list"), {"cursor": cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+class ProjectDetailQueriesTestCase(TestCase):
+    """Число запросов страницы проекта не растет с числом участников и задач"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", password="password")
+        self.project = Project.objects.create(name="Detail", description="")
+        ProjectMember.objects.create(project=self.project, user=self.owner, role="owner")
+        self.statuses = [
+            Status.objects.create(project=self.project, name=f"Status {number}", order=number)
+            for number in range(3)
+        ]
+        self.client.login(username="owner", password="password")
+
+    def grow(self, count):
+        offset = self.project.members.count()
+        for number in range(offset, offset + count):
+            user = User.objects.create(username=f"member{number}")
+            ProjectMember.objects.create(project=self.project, user=user, role="member")
+            Task.objects.create(
+                project=self.project,
+                title=f"Task {number}",
+                status=self.statuses[number % 3],
+                creator=user,
+            )
+
+    def count_queries(self):
+        # Холодный кэш фрагментов: участники и задачи читаются из базы
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("project_detail", args=[self.project.pk]))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_constant_queries(self):
+        self.grow(2)
+        small = self.count_queries()
+        self.grow(30)
+        self.assertEqual(self.count_queries(), small)
+
+
+class BoardTestCase(TestCase):
+    """Колонки доски: лимит карточек, подгрузка курсором и сброс кэша"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.project = Project.objects.create(name="Board", description="")
+        ProjectMember.objects.create(project=cls.project, user=cls.user, role="owner")
+        cls.todo = Status.objects.create(project=cls.project, name="Todo", order=1)
+        cls.done = Status.objects.create(project=cls.project, name="Done", order=2)
+        cls.tasks = [
+            Task.objects.create(
+                project=cls.project,
+                title=f"Task {number}",
+                status=cls.todo,
+                task_order=(number + 1) * 1024,
+                creator=cls.user,
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="owner", password="password")
+
+    def column(self, html, status):
+        """(id карточек, ссылка "Показать еще") колонки статуса"""
+        match = re.search(
+            rf'<section class="board-column" data-status="{status.pk}">(.*?)</section>',
+            html,
+            re.S,
+        )
+        html = match.group(1) if match else html
+        cards = [int(pk) for pk in re.findall(r'data-task="(\d+)"', html)]
+        more = re.search(r'<li class="board-more">\s*<a href="([^"]+)"', html)
+        return cards, more and more.group(1).replace("&amp;", "&")
+
+    def board(self, **params):
+        url = reverse("project_board", args=[self.project.pk])
+        return self.client.get(url, params).content.decode()
+
+    def test_column_limit_and_load_more(self):
+        cards, more = self.column(self.board(limit=2), self.todo)
+        pages = [cards]
+        while more:
+            cards, more = self.column(self.client.get(more).content.decode(), self.todo)
+            pages.append(cards)
+
+        ids = [task.pk for task in self.tasks]
+        self.assertEqual(pages, [ids[:2], ids[2:4], ids[4:]])
+
+    def test_move_invalidates_cached_columns(self):
+        self.board()
+        self.assertEqual(self.column(self.board(), self.done)[0], [])
+
+        moved = self.tasks[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("task_move", args=[moved.pk]),
+                {"status": self.done.pk},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+
+        html = self.board()
+        self.assertEqual(self.column(html, self.done)[0], [moved.pk])
+        self.assertNotIn(moved.pk, self.column(html, self.todo)[0])
+
+    @override_settings(TASKMANAGER_FRAGMENT_CACHE_TIMEOUT=42)
+    def test_columns_use_fragment_timeout(self):
+        with mock.patch.object(board, "cache", wraps=cache) as wrapped:
+            self.board()
+        self.assertEqual(wrapped.set_many.call_args.args[1], 42)
+
+
+class ProjectSummaryTestCase(TestCase):
+    """Счетчики сводки проекта поддерживаются сигналами без пересчета"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.project = Project.objects.create(name="Summary", description="")
+        self.other = Project.objects.create(name="Other", description="")
+        self.todo = Status.objects.create(project=self.project, name="Todo", order=1)
+        self.done = Status.objects.create(project=self.project, name="Done", order=2)
+        past = timezone.now() - datetime.timedelta(days=1)
+        self.overdue = Task.objects.create(
+            project=self.project,
+            title="Overdue",
+            status=self.todo,
+            due_date=past,
+            creator=self.user,
+        )
+        self.plain = Task.objects.create(project=self.project, title="Plain", creator=self.user)
+
+    def counters(self, project):
+        summary = ProjectSummary.objects.get(project=project)
+        counters = (
+            summary.task_count,
+            summary.open_task_count,
+            summary.overdue_task_count,
+            summary.status_counts,
+        )
+        # Те же значения, что и при полном пересчете
+        rebuilt = ProjectSummary.rebuild(project.pk)
+        self.assertEqual(
+            counters,
+            (
+                rebuilt.task_count,
+                rebuilt.open_task_count,
+                rebuilt.overdue_task_count,
+                rebuilt.status_counts,
+            ),
+        )
+        return counters
+
+    def test_create_and_status_change(self):
+        todo = str(self.todo.pk)
+        self.assertEqual(self.counters(self.project), (2, 2, 1, {todo: 1, "none": 1}))
+
+        self.overdue.status = self.done
+        self.overdue.save()
+        self.assertEqual(
+            self.counters(self.project), (2, 2, 1, {str(self.done.pk): 1, "none": 1})
+        )
+
+    def test_closing_a_status(self):
+        self.todo.is_closed = True
+        self.todo.save()
+        self.assertEqual(
+            self.counters(self.project), (2, 1, 0, {str(self.todo.pk): 1, "none": 1})
+        )
+
+        # Удаление задачи закрытого статуса не трогает открытые
+        self.overdue.delete()
+        self.assertEqual(self.counters(self.project), (1, 1, 0, {"none": 1}))
+
+    def test_move_between_projects(self):
+        self.overdue.project = self.other
+        self.overdue.status = None
+        self.overdue.save()
+
+        self.assertEqual(self.counters(self.project), (1, 1, 0, {"none": 1}))
+        self.assertEqual(self.counters(self.other), (1, 1, 1, {"none": 1}))
+
+    def test_delete(self):
+        self.overdue.delete()
+        self.assertEqual(self.counters(self.project), (1, 1, 0, {"none": 1}))
+        self.plain.delete()
+        self.assertEqual(self.counters(self.project), (0, 0, 0, {}))
+
+
+class ConditionalGetTestCase(TestCase):
+    """ETag меняется при изменении проекта; актуальный ETag дает 304"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.project = Project.objects.create(name="Etag", description="")
+        ProjectMember.objects.create(project=cls.project, user=cls.user, role="owner")
+        cls.task = Task.objects.create(project=cls.project, title="Task", creator=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="owner", password="password")
+        self.urls = [
+            reverse("project_detail", args=[self.project.pk]),
+            reverse("task_detail", args=[self.task.pk]),
+            reverse("api_task", args=[self.task.pk]),
+        ]
+
+    def test_not_modified_until_task_changes(self):
+        # Первый ответ ставит CSRF-cookie, которая входит в ETag страниц
+        self.client.get(self.urls[0])
+        etags = {}
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etags[url] = response["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 304, url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.title = "Renamed"
+            self.task.save()
+
+        for url in self.urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response["ETag"], etags[url])
+            self.assertIn("Renamed", response.content.decode())
+
+    def test_no_validators_without_summary(self):
+        # Проекты до появления сводки, пока не запущен rebuild_project_summaries
+        ProjectSummary.objects.filter(project=self.project).delete()
+        for url in (self.urls[0], self.urls[2]):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+            self.assertEqual(response.status_code, 200, url)
+            self.assertFalse(response.has_header("ETag"))
+
+
+class ProjectRoleCacheTestCase(TestCase):
+    """Кэш ролей сбрасывается после коммита изменения участника"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="member", password="password")
+        self.project = Project.objects.create(name="Roles", description="")
+
+    def roles(self):
+        # Новый запрос: карта ролей живет на объекте request
+        request = RequestFactory().get("/")
+        request.user = self.user
+        return (
+            permissions.get_project_roles(request),
+            permissions.has_project_role(request, self.project),
+            permissions.has_project_role(request, self.project, "owner"),
+        )
+
+    def test_member_changes_invalidate_roles(self):
+        self.assertEqual(self.roles(), ({}, False, False))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            member = ProjectMember.objects.create(
+                project=self.project, user=self.user, role="member"
+            )
+        self.assertEqual(self.roles(), ({self.project.pk: "member"}, True, False))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            member.role = "owner"
+            member.save()
+        self.assertEqual(self.roles(), ({self.project.pk: "owner"}, True, True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            member.delete()
+        self.assertEqual(self.roles(), ({}, False, False))
+
+    def test_roles_are_served_from_cache(self):
+        ProjectMember.objects.create(project=self.project, user=self.user, role="member")
+        self.roles()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.roles()[0], {self.project.pk: "member"})
+
+
+class FragmentCacheTestCase(TestCase):
+    """Изменение задач, статусов и участников сбрасывает фрагменты проекта"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.project = Project.objects.create(name="Fragments", description="")
+        ProjectMember.objects.create(project=cls.project, user=cls.user, role="owner")
+        cls.status = Status.objects.create(project=cls.project, name="Todo", order=1)
+        cls.task = Task.objects.create(
+            project=cls.project, title="First title", status=cls.status, creator=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="owner", password="password")
+        self.url = reverse("project_detail", args=[self.project.pk])
+
+    def page(self):
+        return self.client.get(self.url).content.decode()
+
+    def change(self, func):
+        """Применить изменение; версии проекта увеличиваются после коммита"""
+        self.assertIn("First title", self.page())
+        with self.captureOnCommitCallbacks(execute=True):
+            func()
+        return self.page()
+
+    def test_cached_fragments_are_reused(self):
+        def sql():
+            with CaptureQueriesContext(connection) as queries:
+                self.page()
+            return " ".join(query["sql"] for query in queries)
+
+        tables = ['FROM "taskmanager_task"', '"taskmanager_projectmember"."joined_at"']
+        cold = sql()
+        for table in tables:
+            self.assertIn(table, cold)
+        # Фрагменты из кэша: запросы участников и задач не выполняются
+        warm = sql()
+        for table in tables:
+            self.assertNotIn(table, warm)
+
+    def test_task_change(self):
+        def rename():
+            self.task.title = "Second title"
+            self.task.save()
+
+        page = self.change(rename)
+        self.assertIn("Second title", page)
+        self.assertNotIn("First title", page)
+
+    def test_status_change(self):
+        def rename():
+            self.status.name = "In review"
+            self.status.save()
+
+        self.assertIn("In review", self.change(rename))
+
+    def test_member_change(self):
+        other = User.objects.create_user(username="newcomer", password="password")
+        page = self.change(
+            lambda: ProjectMember.objects.create(project=self.project, user=other, role="member")
+        )
+        self.assertIn("newcomer", page)
+
+    def test_key_varies_by_user_and_role(self):
+        other = User.objects.create_user(username="other", password="password")
+        keys = {
+            fragment_key("name", project=self.project, user=self.user, role="owner"),
+            fragment_key("name", project=self.project, user=self.user, role="member"),
+            fragment_key("name", project=self.project, user=other, role="owner"),
+        }
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(
+            fragment_key("name", project=self.project, user=self.user, role="owner"),
+            fragment_key("name", project=self.project.pk, user=self.user.pk, role="owner"),
+        )
+
+
+class QueryBudgetTestCase(TestCase):
+    """Число запросов страниц не растет с объемом данных (query_budget представлений)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="owner", password="password", is_staff=True
+        )
+        other = User.objects.create_user(username="member", password="password")
+        for index in range(3):
+            project = Project.objects.create(name=f"Project {index}", description="")
+            ProjectMember.objects.create(project=project, user=cls.user, role="owner")
+            ProjectMember.objects.create(project=project, user=other, role="member")
+            statuses = [
+                Status.objects.create(project=project, name=f"Status {order}", order=order)
+                for order in range(3)
+            ]
+            label = ProjectLabel.objects.create(project=project, name=f"label {index}")
+            for number in range(6):
+                task = Task.objects.create(
+                    project=project,
+                    title=f"Task {number}",
+                    creator=cls.user,
+                    status=statuses[number % 3],
+                    task_order=number,
+                )
+                Assignee.objects.create(task=task, user=cls.user, role="assignee")
+                Assignee.objects.create(task=task, user=other, role="reviewer")
+                Comment.objects.create(task=task, author=other, content="comment")
+                TaskLabel.objects.create(task=task, label=label)
+        cls.project = project
+        cls.task = task
+
+    def setUp(self):
+        self.client.login(username="owner", password="password")
+        # Холодный кэш: роли и фрагменты читаются из базы
+        cache.clear()
+
+    def test_pages_fit_query_budget(self):
+        urls = [
+            reverse("dashboard"),
+            reverse("project_list"),
+            reverse("project_detail", args=[self.project.pk]),
+            reverse("project_board", args=[self.project.pk]),
+            reverse("task_list"),
+            reverse("task_detail", args=[self.task.pk]),
+            reverse("task_activity", args=[self.task.pk]),
+            reverse("search") + "?q=Task",
+            reverse("api_task_list") + "?include=assignees,labels,status,creator",
+            reverse("api_task", args=[self.task.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("db;dur=", response["Server-Timing"])
+
+    def test_exceeded_budget_fails(self):
+        with mock.patch.object(DashboardView, "query_budget", 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse("dashboard"))
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("dashboard"))
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('taskmanager_requests_total{view="dashboard"}', response.content.decode())
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+    def test_evicted_counter_is_recreated(self):
+        counters = SharedCounters("test", ["hits"])
+        self.addCleanup(counters.reset)
+        counters.add("fragment", hits=2)
+        # Ключ есть при add и вытеснен до incr
+        with mock.patch.object(metrics_cache(), "add", return_value=False), \
+                mock.patch.object(metrics_cache(), "incr", side_effect=ValueError):
+            counters.flush()
+        self.assertEqual(counters.stats(), {"fragment": {"hits": 2}})
+
+
+class DashboardTestCase(TestCase):
+    """Сводка дашборда считается одним запросом и сбрасывается при изменении задач"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        now = timezone.now()
+        cls.project = Project.objects.create(name="Own", description="")
+        ProjectMember.objects.create(project=cls.project, user=cls.user, role="owner")
+        todo = Status.objects.create(project=cls.project, name="Todo", order=1)
+        done = Status.objects.create(
+            project=cls.project, name="Done", order=2, is_closed=True
+        )
+        # Чужой проект: пользователь только исполнитель задачи
+        other = Project.objects.create(name="Other", description="")
+
+        def task(project, status, days, assigned=True, hours=2):
+            task = Task.objects.create(
+                project=project,
+                title=f"Task {Task.objects.count()}",
+                status=status,
+                due_date=now + datetime.timedelta(days=days),
+                estimated_hours=datetime.timedelta(hours=hours),
+            )
+            if assigned:
+                Assignee.objects.create(task=task, user=cls.user)
+            return task
+
+        cls.overdue = task(cls.project, todo, -2)
+        task(cls.project, todo, 1)
+        task(cls.project, done, -5)
+        task(cls.project, todo, -1, assigned=False)
+        task(other, None, 10, hours=3)
+
+    def setUp(self):
+        self.client.login(username="owner", password="password")
+        cache.clear()
+
+    def get_dashboard(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        return response.context["dashboard"]
+
+    def test_summary(self):
+        data = self.get_dashboard()
+
+        self.assertEqual(
+            data["workload"],
+            {
+                "open": 3,
+                "overdue": 1,
+                "due_soon": 1,
+                "high_priority": 0,
+                "estimated_hours": 7.0,
+                "actual_hours": 0,
+            },
+        )
+        # В списке проектов только проекты, где пользователь участник
+        [project] = data["projects"]
+        self.assertEqual(project["task_count"], 4)
+        self.assertEqual(project["open_count"], 3)
+        self.assertEqual(project["overdue_count"], 2)
+        self.assertEqual(project["my_overdue_count"], 1)
+        self.assertEqual(data["tasks"][0]["id"], self.overdue.pk)
+        self.assertTrue(data["tasks"][0]["overdue"])
+
+    def test_cached_until_task_changes(self):
+        self.get_dashboard()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_dashboard()
+        # Сессия, пользователь и проекты назначенных задач
+        self.assertEqual(len(queries), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.overdue.due_date = timezone.now() + datetime.timedelta(days=30)
+            self.overdue.save()
+        self.assertEqual(self.get_dashboard()["workload"]["overdue"], 0)
+
+
+class NotificationTestCase(TestCase):
+    """События очереди собираются в один дайджест на получателя"""
+
+    @classmethod
+    def setUpTestData(cls):
+        def user(name, role=None):
+            user = User.objects.create_user(
+                username=name, password="password", email=f"{name}@example.com"
+            )
+            if role:
+                ProjectMember.objects.create(project=cls.project, user=user, role=role)
+            return user
+
+        cls.project = Project.objects.create(name="Notify", description="")
+        cls.owner = user("owner", "owner")
+        cls.admin = user("admin", "admin")
+        cls.reviewer = user("reviewer", "member")
+        cls.stranger = user("stranger")
+        cls.done = Status.objects.create(
+            project=cls.project, name="Done", order=1, is_closed=True
+        )
+        cls.task = Task.objects.create(project=cls.project, title="Release", creator=cls.owner)
+        Assignee.objects.create(task=cls.task, user=cls.owner)
+
+    def send_due_digests(self):
+        interval = datetime.timedelta(seconds=settings.TASKMANAGER_DIGEST_INTERVAL + 1)
+        return notifications.send_digests(now=timezone.now() + interval)
+
+    def test_digest_per_recipient(self):
+        token = activity.set_actor(self.owner)
+        try:
+            Assignee.objects.create(task=self.task, user=self.reviewer, role="reviewer")
+            # Не участник проекта уведомлений не получает
+            Assignee.objects.create(task=self.task, user=self.stranger)
+            self.task.status = self.done
+            self.task.save()
+        finally:
+            activity.reset_actor(token)
+        Comment.objects.create(task=self.task, author=self.reviewer, content="Looks good")
+
+        while notifications.fan_out(batch_size=2):
+            pass
+        self.assertEqual(notifications.send_digests(), 0)
+        self.assertEqual(self.send_due_digests(), 3)
+
+        digests = {message.to[0]: message.body for message in mail.outbox}
+        self.assertEqual(
+            set(digests), {"owner@example.com", "admin@example.com", "reviewer@example.com"}
+        )
+        self.assertIn("создана задача", digests["admin@example.com"])
+        self.assertIn("статус: без статуса → Done", digests["reviewer@example.com"])
+        self.assertIn("назначение: reviewer", digests["reviewer@example.com"])
+        # Автор действия о нем не уведомляется
+        self.assertNotIn("статус", digests["owner@example.com"])
+        self.assertIn("Looks good", digests["owner@example.com"])
+
+        self.assertEqual(self.send_due_digests(), 0)
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class TaskImportTestCase(TestCase):
+    """Ошибочные записи импорта сообщаются построчно и не мешают остальным"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", password="password")
+        self.member = User.objects.create_user(username="member", password="password")
+        self.project = Project.objects.create(name="Import", description="")
+        ProjectMember.objects.create(project=self.project, user=self.owner, role="owner")
+        self.client.login(username="owner", password="password")
+
+    def post(self, name, content):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(
+            reverse("project_task_import", args=[self.project.pk]), {"file": upload}
+        )
+
+    def test_malformed_ndjson_values(self):
+        lines = [
+            {
+                "title": "Valid",
+                "status": "Doing",
+                "assignees": ["member:reviewer"],
+                "labels": ["bug"],
+                "comments": [{"author": "member", "content": "Hi"}],
+            },
+            {"title": 5},
+            {"title": "Bad assignees", "assignees": 5},
+            {"title": "Bad creator", "creator": ["x"]},
+            {"title": "Bad labels", "labels": [1]},
+            {"title": "Bad priority", "priority": [2]},
+            {"title": "Bad comment", "comments": [{"author": 1, "content": "x"}]},
+            {"title": "Bad order", "task_order": 2**40},
+            {"title": "Plain", "priority": 2, "task_order": "4"},
+        ]
+        response = self.post("tasks.ndjson", "\n".join(json.dumps(line) for line in lines))
+
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result["tasks"], 2)
+        self.assertEqual([error["line"] for error in result["errors"]], [2, 3, 4, 5, 6, 7, 8])
+
+        task = Task.objects.get(project=self.project, title="Valid")
+        self.assertEqual(task.status.name, "Doing")
+        self.assertEqual(task.creator, self.owner)
+        self.assertEqual(
+            list(task.assignees.values_list("user__username", "role")), [("member", "reviewer")]
+        )
+        self.assertEqual(task.comments.get().author, self.member)
+        plain = Task.objects.get(project=self.project, title="Plain")
+        self.assertEqual((plain.priority, plain.task_order), ("2", 4))
+
+    def test_csv_lists(self):
+        content = (
+            "title,priority,assignees,labels\n"
+            "First,1,member|owner:reviewer,bug|ui\n"
+            "Unknown user,1,nobody,\n"
+        )
+        result = self.post("tasks.csv", content).json()
+
+        self.assertEqual(result["tasks"], 1)
+        self.assertEqual(result["errors"], [{"line": 3, "error": "Unknown user: nobody"}])
+        task = Task.objects.get(project=self.project, title="First")
+        self.assertEqual(task.assignees.count(), 2)
+        self.assertEqual(
+            sorted(task.task_labels.values_list("label__name", flat=True)), ["bug", "ui"]
+        )
+
+    def test_tasks_are_appended_with_order_gaps(self):
+        todo = Status.objects.create(project=self.project, name="Todo", order=1)
+        Task.objects.create(
+            project=self.project,
+            title="Existing",
+            status=todo,
+            task_order=1024,
+            creator=self.owner,
+        )
+        lines = [
+            {"title": "First", "status": "Todo"},
+            {"title": "Second", "status": "Todo"},
+            {"title": "No status"},
+            {"title": "Explicit", "task_order": 5},
+        ]
+        self.post("tasks.ndjson", "\n".join(json.dumps(line) for line in lines))
+
+        orders = dict(
+            Task.objects.filter(project=self.project).values_list("title", "task_order")
+        )
+        self.assertEqual(
+            orders,
+            {"Existing": 1024, "First": 2048, "Second": 3072, "No status": 1024, "Explicit": 5},
+        )
+
+    def test_failed_chunk_keeps_summary_and_forgets_its_labels(self):
+        importer = importexport.TaskImporter(self.project, user=self.owner, batch_size=1)
+        records = [
+            (1, {"title": "Kept", "labels": ["bug"]}),
+            # Метка создается, затем слишком длинное имя статуса откатывает пачку
+            (2, {"title": "Lost", "labels": ["ui"], "status": "x" * 100}),
+        ]
+        with self.assertRaises(DataError):
+            importer.run(records)
+
+        self.assertEqual(
+            list(Task.objects.filter(project=self.project).values_list("title", flat=True)),
+            ["Kept"],
+        )
+        self.assertEqual(ProjectSummary.objects.get(project=self.project).task_count, 1)
+        self.assertEqual(sorted(importer.labels), ["bug"])
+
+        result = importer.run([(1, {"title": "Again", "labels": ["ui"]})])
+        self.assertEqual((result.tasks, result.labels), (1, 1))
+        self.assertTrue(ProjectLabel.objects.filter(project=self.project, name="ui").exists())
+
+    def test_queued_file_survives_upload_cleanup(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with self.settings(TASKMANAGER_ATTACHMENT_ROOT=root):
+            upload = SimpleUploadedFile("tasks.csv", b"title\nQueued\n")
+            response = self.client.post(
+                reverse("project_task_import", args=[self.project.pk]),
+                {"file": upload, "background": "1"},
+            )
+            self.assertEqual(response.status_code, 202)
+            path = Job.objects.get().payload["path"]
+            self.assertEqual(os.path.dirname(path), os.path.join(root, "imports"))
+
+            # gc_attachments удаляет из uploads/ все файлы старше max_age
+            attachments.cleanup_uploads(datetime.timedelta(0))
+            self.assertTrue(os.path.exists(path))
+
+            self.assertTrue(jobs.run(jobs.claim("test")))
+            self.assertTrue(Task.objects.filter(title="Queued").exists())
+            self.assertFalse(os.path.exists(path))
+
+
+class JobTestCase(TestCase):
+    """Фоновые задачи: удаление проекта пачками и повторы с паузой"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", password="password")
+        self.project = Project.objects.create(name="Doomed", description="")
+        ProjectMember.objects.create(project=self.project, user=self.owner, role="owner")
+        self.blob = Blob.objects.create(sha256="0" * 64, size=1)
+        for index in range(5):
+            task = Task.objects.create(
+                project=self.project, title=f"Task {index}", creator=self.owner
+            )
+            Assignee.objects.create(task=task, user=self.owner)
+            Comment.objects.create(task=task, author=self.owner, content="Comment")
+            Attachment.objects.create(task=task, blob=self.blob, name="file.txt")
+        self.client.login(username="owner", password="password")
+
+    def run_next(self):
+        # work() закрывает устаревшие соединения, в транзакции теста - только claim и run
+        return jobs.run(jobs.claim("test"))
+
+    @override_settings(TASKMANAGER_JOB_DELETE_BATCH_SIZE=2)
+    def test_delete_project_in_batches(self):
+        response = self.client.post(reverse("project_delete", args=[self.project.pk]))
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse("job_detail", args=[job.pk]))
+        # Проект пропадает сразу, задачи удаляет воркер
+        self.assertFalse(Project.objects.for_user(self.owner).exists())
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 5)
+
+        self.assertTrue(self.run_next())
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.progress, job.total), ("done", 5, 5))
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Activity.objects.exists())
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 0)
+
+        response = self.client.get(reverse("job_detail", args=[job.pk]), {"format": "json"})
+        self.assertEqual(response.json()["percent"], 100)
+
+    def test_project_page_is_hidden_until_deleted(self):
+        url = reverse("project_detail", args=[self.project.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("project_delete", args=[self.project.pk]))
+        # Задача еще в очереди, но участников уже нет
+        self.assertTrue(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        def flaky(job):
+            if job.attempts < 2:
+                raise RuntimeError("Temporary failure")
+            return {"ok": True}
+
+        with mock.patch.dict(jobs.HANDLERS, {"flaky": flaky}):
+            job = jobs.enqueue("flaky", max_attempts=3)
+            self.assertFalse(self.run_next())
+            job.refresh_from_db()
+            self.assertEqual(job.state, "queued")
+            self.assertGreater(job.run_at, timezone.now())
+            self.assertIsNone(jobs.claim("test"))
+
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            self.assertTrue(self.run_next())
+            job.refresh_from_db()
+            self.assertEqual((job.state, job.attempts, job.result), ("done", 2, {"ok": True}))
+
+
+class ProjectCloneTestCase(TestCase):
+    """Копия проекта собирается пачками с подменой id статусов, меток и задач"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", password="password")
+        self.member = User.objects.create_user(username="member", password="password")
+        self.source = Project.objects.create(name="Source", description="Boilerplate")
+        ProjectMember.objects.create(project=self.source, user=self.owner, role="owner")
+        ProjectMember.objects.create(project=self.source, user=self.member, role="member")
+        todo = Status.objects.create(project=self.source, name="To do", order=1)
+        done = Status.objects.create(project=self.source, name="Done", order=2, is_closed=True)
+        label = ProjectLabel.objects.create(project=self.source, name="bug")
+        for index in range(5):
+            task = Task.objects.create(
+                project=self.source,
+                title=f"Task {index}",
+                status=done if index == 0 else todo,
+                creator=self.member,
+            )
+            TaskLabel.objects.create(task=task, label=label)
+            Assignee.objects.create(task=task, user=self.member)
+
+    def clone(self, batch_size):
+        with CaptureQueriesContext(connection) as queries:
+            clone = cloning.ProjectCloner(
+                self.source, self.owner, include_assignees=True, batch_size=batch_size
+            ).run("Clone")
+        return clone, len(queries)
+
+    def test_clone_with_assignees(self):
+        _, one_batch = self.clone(batch_size=5)
+        clone, five_batches = self.clone(batch_size=1)
+        # Пачка задач - выборка задач, меток и исполнителей и три вставки;
+        # batch_size действует и на вставку двух статусов
+        self.assertEqual(five_batches - one_batch, 4 * 6 + 1)
+
+        self.assertEqual(clone.description, "Boilerplate")
+        self.assertEqual(
+            list(clone.statuses.values_list("name", "is_closed")),
+            [("To do", False), ("Done", True)],
+        )
+        self.assertEqual(
+            TaskLabel.objects.filter(task__project=clone, label__project=clone).count(), 5
+        )
+        self.assertEqual(Assignee.objects.filter(task__project=clone).count(), 5)
+        self.assertEqual(clone.members.get(user=self.member).role, "member")
+        self.assertEqual(clone.summary.open_task_count, 4)
+        self.assertFalse(Task.objects.filter(project=clone, status__project=self.source).exists())
+
+    def test_create_from_template(self):
+        Project.objects.filter(pk=self.source.pk).update(is_template=True)
+        self.client.login(username="owner", password="password")
+        response = self.client.post(
+            reverse("project_create"),
+            {"name": "From template", "description": "New", "template": self.source.pk},
+        )
+
+        project = Project.objects.get(name="From template")
+        self.assertRedirects(response, reverse("project_detail", args=[project.pk]))
+        self.assertEqual(project.tasks.count(), 5)
+        self.assertEqual(
+            list(project.members.values_list("user", "role")), [(self.owner.pk, "owner")]
+        )
+        self.assertFalse(Assignee.objects.filter(task__project=project).exists())
+
+
+@override_settings(TASKMANAGER_DB_REPLICAS=["replica1"])
+class ReplicaRoutingTestCase(TestCase):
+    """Чтения разрешенных представлений - с реплики, после записи - с основной базы"""
+
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.state = replicas.RoutingState()
+        self.state.allow_replica = True
+        token = replicas._state.set(self.state)
+        self.addCleanup(replicas._state.reset, token)
+        replicas._unavailable.clear()
+
+    def test_reads_after_write_go_to_primary(self):
+        with mock.patch.object(replicas, "is_available", return_value=True):
+            self.assertEqual(self.router.db_for_read(Task), "replica1")
+            self.assertEqual(self.router.db_for_write(Task), "default")
+            self.assertEqual(self.router.db_for_read(Task), "default")
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        # Базы replica1 в тестовых настройках нет - подключение не удается
+        self.assertEqual(self.router.db_for_read(Task), "default")
+        self.assertIn("replica1", replicas._unavailable)
+
+    def test_write_pins_user_to_primary(self):
+        cache.clear()
+        user = User.objects.create_user(username="writer", password="password")
+        self.client.login(username="writer", password="password")
+        self.assertFalse(replicas.is_pinned(user.pk))
+
+        self.client.post(reverse("project_create"), {"name": "Pinned", "description": "x"})
+        self.assertTrue(replicas.is_pinned(user.pk))
+
+        request = mock.Mock(method="GET", user=user)
+        view = ProjectListView.as_view()
+        self.assertFalse(replicas._allows_replica(request, view))
+        cache.delete(replicas.pin_key(user.pk))
+        self.assertTrue(replicas._allows_replica(request, view))
+
+    def test_cache_misses_read_from_primary(self):
+        cache.clear()
+        user = User.objects.create_user(username="reader", password="password")
+        self.state.wrote = False
+        template = Template(
+            '{% load taskmanager_tags %}'
+            '{% cachefragment "routing" user=user %}{{ db }}{% endcachefragment %}'
+        )
+        context = Context({"user": user, "db": lambda: self.router.db_for_read(Task)})
+
+        with mock.patch.object(replicas, "is_available", return_value=True):
+            self.assertEqual(self.router.db_for_read(Task), "replica1")
+            self.assertTrue(replicas.used_replica())
+            # Промах кэша рендерится по основной базе, после него - снова реплика
+            self.assertEqual(template.render(context), "default")
+            self.assertEqual(self.router.db_for_read(Task), "replica1")
+
+
+# Запросы самого теста идут внутри представления дашборда
+@override_settings(TASKMANAGER_QUERY_BUDGET_STRICT=False)
+class StatementTimeoutTestCase(TestCase):
+    """Таймаут представления ставится на соединение и снимается после запроса"""
+
+    def setUp(self):
+        User.objects.create_user(username="slow", password="password")
+        self.client.login(username="slow", password="password")
+
+    def show_timeout(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            return cursor.fetchone()[0]
+
+    def test_timeout_returns_503_and_is_reset(self):
+        before = self.show_timeout()
+        seen = []
+
+        def slow_dashboard(view):
+            seen.append(self.show_timeout())
+            # Точка сохранения: отмененный запрос не ломает транзакцию теста
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SELECT pg_sleep(1)")
+
+        with mock.patch.object(DashboardView, "statement_timeout", 50, create=True), \
+                mock.patch.object(DashboardView, "get_dashboard", slow_dashboard):
+            response = self.client.get(reverse("dashboard"))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(seen, ["50ms"])
+        self.assertEqual(self.show_timeout(), before)
+
+    @override_settings(TASKMANAGER_STATEMENT_TIMEOUT=2000)
+    def test_streamed_response_keeps_timeout(self):
+        user = User.objects.get(username="slow")
+        project = Project.objects.create(name="Export", description="")
+        ProjectMember.objects.create(project=project, user=user, role="owner")
+        before = self.show_timeout()
+
+        def export(project, fmt):
+            # Запрос выполняется при отдаче, после middleware
+            Task.objects.count()
+            yield self.show_timeout()
+
+        with mock.patch.object(importexport, "iter_export", export):
+            response = self.client.get(reverse("project_task_export", args=[project.pk]))
+            self.assertEqual(b"".join(response.streaming_content), b"2s")
+        self.assertEqual(self.show_timeout(), before)
+
+
+class SyntheticDataTestCase(TestCase):
+    """Один seed дает один и тот же набор данных"""
+
+    scale = synthetic.Scale(
+        projects=2, users=6, members=3, tasks=15, comments=2, activities=2
+    )
+
+    def snapshot(self):
+        return list(
+            Task.objects.filter(project__name__startswith=synthetic.prefix(3))
+            .order_by("project__name", "status__order", "task_order")
+            .values_list("project__name", "title", "priority", "status__name", "creator__username")
+        )
+
+    def test_generate_is_deterministic(self):
+        owner, projects, counts = synthetic.generate(self.scale, seed=3)
+        first = self.snapshot()
+
+        self.assertEqual(counts["Task"], 30)
+        self.assertEqual(len(first), 30)
+        self.assertEqual(
+            ProjectMember.objects.filter(user=owner, role="owner").count(), 2
+        )
+        self.assertEqual(projects[0].summary.task_count, 15)
+
+        synthetic.clear(3)
+        self.assertFalse(synthetic.exists(3))
+        synthetic.generate(self.scale, seed=3)
+        self.assertEqual(self.snapshot(), first)
+
+
+class AttachmentTestCase(TestCase):
+    """Одинаковые файлы хранятся один раз, выдача поддерживает Range"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="owner", password="password")
+        cls.project = Project.objects.create(name="Files", description="")
+        ProjectMember.objects.create(project=cls.project, user=cls.user, role="owner")
+        cls.task = Task.objects.create(project=cls.project, title="Task", creator=cls.user)
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = self.settings(TASKMANAGER_ATTACHMENT_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.login(username="owner", password="password")
+
+    def upload(self, name, content):
+        url = reverse("attachment_upload", args=[self.task.pk])
+        return self.client.post(url, {"file": SimpleUploadedFile(name, content)})
+
+    def test_identical_files_share_blob(self):
+        content = b"0123456789" * 1000
+        self.upload("first.txt", content)
+        self.upload("second.txt", content)
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.size, len(content))
+        self.assertEqual(self.task.attachments.count(), 2)
+
+        self.task.attachments.first().delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_range_request(self):
+        content = bytes(range(256)) * 40
+        self.upload("data.bin", content)
+        url = reverse("attachment_download", args=[Attachment.objects.get().pk])
+
+        response = self.client.get(url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(content)}")
+        self.assertEqual(b"".join(response.streaming_content), content[100:200])
+
+        response = self.client.get(url, HTTP_RANGE=f"bytes={len(content)}-")
+        self.assertEqual(response.status_code, 416)
+
+    def test_chunked_upload_resumes_from_offset(self):
+        content = b"chunk" * 2000
+        response = self.client.post(
+            reverse("upload_create", args=[self.task.pk]),
+            {"name": "big.bin", "size": len(content)},
+            content_type="application/json",
+        )
+        url = response.json()["url"]
+
+        def send(offset, data):
+            return self.client.generic(
+                "PATCH",
+                url,
+                data,
+                content_type="application/offset+octet-stream",
+                HTTP_UPLOAD_OFFSET=str(offset),
+            )
+
+        self.assertEqual(send(0, content[:4000]).json()["offset"], 4000)
+        # Повтор уже принятой части отклоняется с текущим смещением
+        self.assertEqual(send(0, content[:4000]).json()["offset"], 4000)
+        response = send(4000, content[4000:])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["attachment"]["size"], len(content))
+        self.assertFalse(UploadSession.objects.exists())
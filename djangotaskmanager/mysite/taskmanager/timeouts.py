@@ -0,0 +1,132 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, connections
+from django.http import HttpResponse
+
+"""
+Серверный таймаут SQL-запросов веб-запросов (statement_timeout PostgreSQL)
+
+Таймаут - атрибут statement_timeout представления (мс) или
+TASKMANAGER_STATEMENT_TIMEOUT. Он ставится перед первым SQL-запросом на каждом
+соединении, которое запрос действительно использует (основная база, реплика),
+и сбрасывается в конце запроса: соединение переживает запрос (CONN_MAX_AGE,
+пул) и не должно унести таймаут в команды и воркеры. Служебные SET/RESET идут
+мимо execute_wrapper, поэтому не попадают в счетчики и бюджеты запросов.
+
+Запрос, прерванный по таймауту, получает 503 вместо 500. Запросы, которые
+StreamingHttpResponse (экспорт) делает уже при отдаче, идут с тем же
+таймаутом, он сбрасывается после отдачи; прерванный поток просто обрывается.
+"""
+
+logger = logging.getLogger(__name__)
+
+SET_TIMEOUT_SQL = "SELECT set_config('statement_timeout', %s, false)"
+RESET_TIMEOUT_SQL = "RESET statement_timeout"
+# SQLSTATE query_canceled
+QUERY_CANCELED = "57014"
+
+
+def get_default_timeout():
+    return getattr(settings, "TASKMANAGER_STATEMENT_TIMEOUT", 30000)
+
+
+def get_view_timeout(view_func):
+    view_class = getattr(view_func, "view_class", None)
+    timeout = getattr(view_class, "statement_timeout", None)
+    return get_default_timeout() if timeout is None else timeout
+
+
+def is_statement_timeout(error):
+    return isinstance(error, OperationalError) and (
+        getattr(error.__cause__, "sqlstate", None) == QUERY_CANCELED
+    )
+
+
+class StatementTimeout:
+    """execute_wrapper: таймаут на соединении перед первым запросом"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        # {alias: (соединение, поставленный таймаут)}
+        self.applied = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        connection = context["connection"]
+        # Без SET на соединении действует таймаут сервера - считаем его нулевым
+        _, current = self.applied.get(connection.alias, (None, 0))
+        if current != self.timeout:
+            # Сырой курсор драйвера: мимо остальных обработчиков и счетчиков
+            context["cursor"].cursor.execute(SET_TIMEOUT_SQL, [str(self.timeout)])
+            self.applied[connection.alias] = (connection, self.timeout)
+        return execute(sql, params, many, context)
+
+    def reset(self):
+        for connection, _ in self.applied.values():
+            if connection.connection is None:
+                continue
+            try:
+                with connection.wrap_database_errors:
+                    with connection.connection.cursor() as cursor:
+                        cursor.execute(RESET_TIMEOUT_SQL)
+            except DatabaseError:
+                # Соединение сломано - Django закроет его в конце запроса
+                logger.warning("Could not reset statement_timeout on %s", connection.alias)
+        self.applied.clear()
+
+
+def _limit_streaming(wrapper, content):
+    """Поток ответа с таймаутом на запросах, выполненных при его отдаче"""
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            yield from content
+    finally:
+        wrapper.reset()
+
+
+class StatementTimeoutMiddleware:
+    """Ставится после AuthenticationMiddleware и ReplicaRoutingMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._statement_timeout = wrapper = StatementTimeout(get_default_timeout())
+        streaming = False
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(wrapper))
+                response = self.get_response(request)
+            if response.streaming:
+                # Сброс - после отдачи потока
+                response.streaming_content = _limit_streaming(
+                    wrapper, response.streaming_content
+                )
+                streaming = True
+            return response
+        finally:
+            if not streaming:
+                wrapper.reset()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._statement_timeout.timeout = get_view_timeout(view_func)
+
+    def process_exception(self, request, exception):
+        if not is_statement_timeout(exception):
+            return None
+        logger.warning(
+            "Statement timeout (%s ms) in %s %s",
+            request._statement_timeout.timeout,
+            request.method,
+            request.path,
+        )
+        return HttpResponse(
+            "The request took too long, try again later",
+            status=503,
+            content_type="text/plain",
+            headers={"Retry-After": "30"},
+        )
@@ -1,7 +1,7 @@
 from django.urls import path
 from django.contrib.auth.views import LoginView, LogoutView
 
-from . import views
+from . import api, views
 
 
 urlpatterns = [
@@ -13,5 +13,35 @@ urlpatterns = [
     path('projects/', views.ProjectListView.as_view(), name='project_list'),
     path('projects/create/', views.ProjectCreateView.as_view(), name='project_create'),
     path('projects/<int:pk>/', views.ProjectDetailView.as_view(), name='project_detail'),
-    path('project/<int:pk>/update',views.ProjectUpdateView.as_view(), name='project_update')
+    path('project/<int:pk>/update',views.ProjectUpdateView.as_view(), name='project_update'),
+    path('projects/<int:pk>/clone/', views.ProjectCloneView.as_view(), name='project_clone'),
+    path('projects/<int:pk>/delete/', views.ProjectDeleteView.as_view(), name='project_delete'),
+    path('tasks/', views.TaskListView.as_view(), name='task_list'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('projects/<int:pk>/board/', views.ProjectBoardView.as_view(), name='project_board'),
+    path('projects/<int:pk>/board/<str:status>/', views.BoardColumnView.as_view(), name='board_column'),
+    path('projects/<int:pk>/tasks/import/', views.ProjectTaskImportView.as_view(), name='project_task_import'),
+    path('projects/<int:pk>/tasks/export/', views.ProjectTaskExportView.as_view(), name='project_task_export'),
+    path('projects/<int:pk>/tasks/move/', views.ProjectTaskBulkMoveView.as_view(), name='project_task_bulk_move'),
+    path('projects/<int:pk>/tasks/bulk/', views.ProjectTaskBulkView.as_view(), name='project_task_bulk'),
+    path('projects/<int:pk>/statuses/reorder/', views.StatusReorderView.as_view(), name='status_reorder'),
+    path('tasks/<int:pk>/', views.TaskDetailView.as_view(), name='task_detail'),
+    path('tasks/<int:pk>/move/', views.TaskMoveView.as_view(), name='task_move'),
+    path('tasks/<int:pk>/activity/', views.TaskActivityView.as_view(), name='task_activity'),
+    path('tasks/<int:pk>/attachments/', views.AttachmentUploadView.as_view(), name='attachment_upload'),
+    path('tasks/<int:pk>/uploads/', views.UploadSessionCreateView.as_view(), name='upload_create'),
+    path('uploads/<uuid:pk>/', views.UploadSessionView.as_view(), name='upload_session'),
+    path('attachments/<int:pk>/', views.AttachmentDownloadView.as_view(), name='attachment_download'),
+    path('attachments/<int:pk>/thumbnail/', views.AttachmentThumbnailView.as_view(), name='attachment_thumbnail'),
+    path('jobs/<int:pk>/', views.JobDetailView.as_view(), name='job_detail'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('api/v1/projects/', api.ResourceListView.as_view(resource_class=api.ProjectResource), name='api_project_list'),
+    path('api/v1/projects/<int:pk>/', api.ResourceDetailView.as_view(resource_class=api.ProjectResource), name='api_project'),
+    path('api/v1/tasks/', api.ResourceListView.as_view(resource_class=api.TaskResource), name='api_task_list'),
+    path('api/v1/tasks/<int:pk>/', api.ResourceDetailView.as_view(resource_class=api.TaskResource), name='api_task'),
+    path('api/v1/comments/', api.ResourceListView.as_view(resource_class=api.CommentResource), name='api_comment_list'),
+    path('api/v1/comments/<int:pk>/', api.ResourceDetailView.as_view(resource_class=api.CommentResource), name='api_comment'),
+    path('api/v1/activities/', api.ResourceListView.as_view(resource_class=api.ActivityResource), name='api_activity_list'),
+    path('api/v1/labels/', api.ResourceListView.as_view(resource_class=api.LabelResource), name='api_label_list'),
+    path('api/v1/labels/<int:pk>/', api.ResourceDetailView.as_view(resource_class=api.LabelResource), name='api_label'),
 ]
\ No newline at end of file
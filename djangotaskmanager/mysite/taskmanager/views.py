@@ -1,23 +1,61 @@
 # from django.shortcuts import render, redirect, get_object_or_404
-from django.shortcuts import get_object_or_404
+import hmac
+import json
+
+from django import forms
+from django.conf import settings
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse, reverse_lazy
 from django.views.generic import (
     ListView,
     DetailView,
     CreateView,
+    FormView,
     UpdateView,
     TemplateView,
+    View,
 )
+from django.utils.functional import SimpleLazyObject
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth import login, logout
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Q # Если нужны будут обращения к разным моделям использовать Q
-
-from .models import Project, ProjectMember, Task
-from .forms import ProjectChangeOwnerForm
+from django.db import transaction
+from django.db.models import F, Prefetch
+
+from .models import (
+    Activity,
+    Assignee,
+    Attachment,
+    Comment,
+    Job,
+    Project,
+    ProjectMember,
+    Task,
+    UploadSession,
+)
+from .forms import ProjectChangeOwnerForm, ProjectCloneForm
+from . import (
+    attachments,
+    board,
+    bulk,
+    cloning,
+    conditional,
+    dashboard,
+    importexport,
+    instrumentation,
+    jobs,
+    ordering,
+    search,
+)
+from .caching import fragment_metrics
+from .conditional import ConditionalGetMixin
+from .pagination import KeysetPaginationMixin
+from .permissions import ProjectRoleMixin
+from .storage import blob_storage
 
 """
 Регистрация
@@ -54,21 +92,34 @@ class RegisterView(CreateView):
         return response
 
 
-class DashboardView(LoginRequiredMixin, ListView):
+class DashboardView(LoginRequiredMixin, ConditionalGetMixin, TemplateView):
     """
     Представление для отображение задач и проектов пользовтеля
     """
 
+    # Запросов на страницу вместе с сессией и пользователем; с холодным кэшем
+    # (см. instrumentation.RequestMetricsMiddleware)
+    query_budget = 6
+    # GET читает с реплики, если они настроены (см. replicas.py)
+    replica_reads = True
+
     template_name = "taskmanager/dashboard.html"
-    context_object_name = "user_projects"
     login_url = "login"  # Указываем куда перенаправлять если не аутентифицирован
 
-    def get_queryset(self):
-        return Project.objects.filter(members__user=self.request.user).distinct()
+    def get_dashboard(self):
+        # Сводка нужна и для ETag, и для страницы: загружается один раз
+        if not hasattr(self, "_dashboard"):
+            self._dashboard = dashboard.get_dashboard(self.request)
+        return self._dashboard
+
+    def get_validators(self):
+        data = self.get_dashboard()
+        return [data["key"], data["generated_at"].timestamp()], data["generated_at"]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["user_tasks"] = Task.objects.filter(assignees__user=self.request.user)
+        context["dashboard"] = self.get_dashboard()
+        context["dashboard_timeout"] = settings.TASKMANAGER_DASHBOARD_CACHE_TIMEOUT
         return context
 
 
@@ -82,7 +133,30 @@ class ProjectCreateView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse_lazy("project_detail", kwargs={"pk": self.object.pk})
 
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        templates = cloning.templates_for(self.request.user)
+        if templates.exists():
+            form.fields["template"] = forms.ModelChoiceField(
+                queryset=templates,
+                required=False,
+                empty_label="Empty project",
+                label="Template",
+            )
+        return form
+
     def form_valid(self, form):
+        template = form.cleaned_data.get("template")
+        if template is not None:
+            # Статусы, метки и задачи шаблона копируются пачками
+            self.object = cloning.clone_project(
+                template,
+                self.request.user,
+                form.cleaned_data["name"],
+                form.cleaned_data["description"],
+            )
+            return redirect(self.get_success_url())
+
         # Создаем проект, участника, а потом назначаем владельцем
         project = form.save(commit=False)
         project.save()
@@ -93,32 +167,82 @@ class ProjectCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class ProjectListView(LoginRequiredMixin, ListView):
+class ProjectListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """Представления для отображения списка проектов"""
 
+    query_budget = 4
+    replica_reads = True
+
     model = Project
     template_name = "taskmanager/project_list.html"
     login_url = "login"
+    keyset_ordering = ["-created_at", "-id"]
 
     def get_queryset(self):
-        return Project.objects.filter(members__user=self.request.user).distinct()
+        return Project.objects.for_user(self.request.user).select_related("summary")
 
 
-class ProjectDetailView(LoginRequiredMixin, DetailView):
+class ProjectDetailView(LoginRequiredMixin, ConditionalGetMixin, ProjectRoleMixin, DetailView):
     """Представление для просмотра проекта"""
 
+    query_budget = 7
+    replica_reads = True
+
     model = Project
     template_name = "taskmanager/project_detail.html"
 
+    def get_validators(self):
+        changed_at = conditional.project_changed_at(self.kwargs["pk"])
+        if changed_at is None:
+            return None
+        role = self.get_project_role(self.kwargs["pk"])
+        if role is None:
+            # Не участник (или проект уже удаляется) получает 404, а не 304
+            return None
+        return [changed_at.isoformat(), role], changed_at
+
+    def get_object(self, queryset=None):
+        project = super().get_object(queryset)
+        if not self.has_project_role(project):
+            raise Http404("Project not found")
+        return project
+
     def get_context_data(self, **kwargs):
-        return super().get_context_data(**kwargs)
+        context = super().get_context_data(**kwargs)
+        # Участники с пользователями и задачи со статусами грузятся двумя
+        # запросами и только если их фрагменты не нашлись в кэше
+        context["members"] = self.object.members.select_related("user").order_by(
+            "joined_at"
+        )
+        context["is_owner"] = self.is_project_owner(self.object)
+        context["task_groups"] = SimpleLazyObject(self.get_task_groups)
+        return context
+
+    def get_task_groups(self):
+        return self._group_tasks_by_status(
+            list(self.object.tasks.select_related("status"))
+        )
+
+    @staticmethod
+    def _group_tasks_by_status(tasks):
+        """Группировка задач по статусу в порядке колонок, задачи без статуса в конце"""
+        groups = {}
+        for task in tasks:
+            if task.status_id not in groups:
+                groups[task.status_id] = (task.status, [])
+            groups[task.status_id][1].append(task)
+
+        return sorted(
+            groups.values(),
+            key=lambda group: (group[0] is None, group[0].order if group[0] else 0),
+        )
 
 
-class ProjectUpdateView(LoginRequiredMixin, UpdateView):
+class ProjectUpdateView(LoginRequiredMixin, ProjectRoleMixin, UpdateView):
     """Представление для редактирования проекта"""
 
     model = Project
-    fields = ["name", "description"]
+    fields = ["name", "description", "is_template"]
     template_name = "taskmanager/project_update_form.html"
 
     def get_success_url(self):
@@ -135,7 +259,9 @@ class ProjectUpdateView(LoginRequiredMixin, UpdateView):
         form = ProjectChangeOwnerForm()
 
         current_owner = project.get_owner()
-        members = project.members.exclude(user=current_owner)
+        members = project.members.exclude(user=current_owner).select_related(
+            "user", "project"
+        )
 
         choices = []
         choices.append(("", "Do not change"))
@@ -152,13 +278,13 @@ class ProjectUpdateView(LoginRequiredMixin, UpdateView):
         return context
 
     def _user_is_project_owner(self, project):
-        return project.members.filter(user=self.request.user, role="owner").exists()
+        return self.is_project_owner(project)
 
     def form_valid(self, form):
         project = form.save()
 
         new_owner_id = self.request.POST.get("new_owner")
-        if new_owner_id:
+        if new_owner_id and self._user_is_project_owner(project):
             self._transfer_ownership(project, new_owner_id)
 
         messages.success(self.request, "Project updated")
@@ -188,6 +314,61 @@ class ProjectUpdateView(LoginRequiredMixin, UpdateView):
             messages.error(self.request, "Project member does not exist")
 
 
+class ProjectCloneView(LoginRequiredMixin, ProjectRoleMixin, FormView):
+    """Копия проекта: статусы, метки, задачи и по выбору участники с исполнителями"""
+
+    form_class = ProjectCloneForm
+    template_name = "taskmanager/project_clone.html"
+    clone_roles = ["owner", "admin", "member"]
+    statement_timeout = 120000
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        self.project = get_object_or_404(Project, pk=kwargs["pk"])
+        if not self.has_project_role(self.project, *self.clone_roles):
+            raise Http404("Project not found")
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_initial(self):
+        return {"name": f"Copy of {self.project.name}"[:100], "include_tasks": True}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["project"] = self.project
+        return context
+
+    def form_valid(self, form):
+        clone = cloning.clone_project(
+            self.project,
+            self.request.user,
+            form.cleaned_data["name"],
+            include_tasks=form.cleaned_data["include_tasks"],
+            include_assignees=form.cleaned_data["include_assignees"],
+        )
+        messages.success(self.request, f"Project {self.project.name} is copied")
+        return redirect("project_detail", pk=clone.pk)
+
+
+class ProjectDeleteView(LoginRequiredMixin, ProjectRoleMixin, View):
+    """Удаление проекта в фоне (задача delete_project, см. jobs.py)
+
+    В запросе удаляются только участники - проект сразу пропадает у всех,
+    задачи с комментариями, вложениями и журналом удаляет воркер пачками.
+    """
+
+    def post(self, request, pk):
+        project = get_object_or_404(Project, pk=pk)
+        if not self.is_project_owner(project):
+            raise Http404("Project not found")
+
+        with transaction.atomic():
+            job = jobs.enqueue("delete_project", {"project_id": project.pk}, user=request.user)
+            ProjectMember.objects.filter(project=project).delete()
+        messages.success(request, f"Project {project.name} is being deleted")
+        return redirect("job_detail", pk=job.pk)
+
+
 class TaskCreateView(LoginRequiredMixin, CreateView):
     """Представления для создания задачи"""
 
@@ -207,26 +388,82 @@ class TaskCreateView(LoginRequiredMixin, CreateView):
 
         return super().form_valid(form)
     
-class TaskListView(LoginRequiredMixin, ListView):
+class TaskListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """Представление для отображения списка задач"""
+
+    query_budget = 3
+    replica_reads = True
+
     model = Task
     template_name = "taskmanager/task_list.html"
     login_url = "login"
-    
+    # Совпадает с Task.Meta.ordering, id делает ключ уникальным
+    keyset_ordering = ["task_order", "-created_at", "id"]
+
     def get_queryset(self):
-        return Task.objects.filter(
-            Q(creator=self.request.user) | Q(assignees__user = self.request.user)
-        ).distinct()
+        return Task.objects.visible_to(self.request.user).select_related(
+            "project", "status"
+        )
+
+
+class SearchView(LoginRequiredMixin, TemplateView):
+    """Полнотекстовый поиск по задачам и комментариям проектов пользователя"""
+
+    query_budget = 5
+    replica_reads = True
+    # Тяжелый поиск лучше прервать, чем держать воркер (см. timeouts.py)
+    statement_timeout = 5000
 
+    template_name = "taskmanager/search.html"
+    login_url = "login"
 
-class TaskDetailView(LoginRequiredMixin,DetailView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "").strip()
+        context["query"] = query
+        context["results"] = search.search(self.request.user, query)
+        return context
+
+
+class TaskDetailView(LoginRequiredMixin, ConditionalGetMixin, ProjectRoleMixin, DetailView):
     """Представления для отображения задачи"""
+
+    query_budget = 8
+    replica_reads = True
+
     model = Task
     template_name = "taskmanager/task_detail.html"
-    
+
+    def get_validators(self):
+        changes = conditional.task_changed_at(self.kwargs["pk"])
+        if changes is None:
+            return None
+        project_id, changed_at = changes
+        if not self.has_project_role(project_id):
+            raise Http404("Task not found")
+        return [changed_at.isoformat()], changed_at
+
+    def get_queryset(self):
+        return Task.objects.select_related("project", "status", "creator").prefetch_related(
+            Prefetch("assignees", queryset=Assignee.objects.select_related("user")),
+            Prefetch("comments", queryset=Comment.objects.select_related("author")),
+            Prefetch(
+                "attachments",
+                queryset=Attachment.objects.select_related("blob").order_by("-created_at"),
+            ),
+        )
+
+    def get_object(self, queryset=None):
+        task = super().get_object(queryset)
+        if not self.has_project_role(task.project_id):
+            raise Http404("Task not found")
+        return task
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # context[""] = 
+        context["can_edit"] = self.has_project_role(
+            self.object.project_id, *ProjectEditMixin.edit_roles
+        )
         return context
 
 class TaskUpdateView(LoginRequiredMixin,UpdateView):
@@ -234,3 +471,478 @@ class TaskUpdateView(LoginRequiredMixin,UpdateView):
     model = Task
     fields = ["title", "description", "priority", "due_date"]
     # TODO Доделать и отрефакторить 
+
+
+class ProjectTaskImportView(LoginRequiredMixin, ProjectRoleMixin, View):
+    """Массовый импорт задач из CSV или NDJSON файла (поле file, параметр format)"""
+
+    import_roles = ["owner", "admin", "member"]
+    statement_timeout = 120000
+
+    def post(self, request, pk):
+        project = get_object_or_404(Project, pk=pk)
+        if not self.has_project_role(project, *self.import_roles):
+            raise Http404("Project not found")
+
+        upload = request.FILES.get("file")
+        if upload is None:
+            return JsonResponse({"error": "File is required"}, status=400)
+
+        fmt = request.POST.get("format") or importexport.detect_format(upload.name)
+        if fmt not in importexport.FORMATS:
+            return JsonResponse({"error": f"Unknown format: {fmt}"}, status=400)
+
+        if request.POST.get("background") or upload.size > getattr(
+            settings, "TASKMANAGER_IMPORT_BACKGROUND_SIZE", 1024 ** 2
+        ):
+            return self.enqueue(request, project, upload, fmt)
+
+        records = importexport.iter_records(importexport.open_text(upload.file), fmt)
+        result = importexport.TaskImporter(project, user=request.user).run(records)
+        return JsonResponse(result.as_dict())
+
+    def enqueue(self, request, project, upload, fmt):
+        """Большой файл импортирует run_jobs: ответ 202 со ссылкой на задачу"""
+        # Не в uploads/: задача может ждать в очереди дольше, чем gc_attachments
+        # хранит брошенные загрузки
+        path, _, _ = blob_storage.write_temp(upload.chunks(), directory="imports")
+        job = jobs.enqueue(
+            "import_tasks",
+            {"project_id": project.pk, "path": path, "format": fmt},
+            user=request.user,
+            max_attempts=1,
+        )
+        url = reverse("job_detail", kwargs={"pk": job.pk})
+        response = JsonResponse({"job": job.pk, "url": url}, status=202)
+        response["Location"] = url
+        return response
+
+
+class ProjectTaskExportView(LoginRequiredMixin, ProjectRoleMixin, View):
+    """Потоковый экспорт задач проекта (?format=csv|ndjson)"""
+
+    content_types = {
+        "csv": "text/csv; charset=utf-8",
+        "ndjson": "application/x-ndjson; charset=utf-8",
+    }
+
+    def get(self, request, pk):
+        project = get_object_or_404(Project, pk=pk)
+        if not self.has_project_role(project):
+            raise Http404("Project not found")
+
+        fmt = request.GET.get("format", "csv")
+        if fmt not in importexport.FORMATS:
+            return JsonResponse({"error": f"Unknown format: {fmt}"}, status=400)
+
+        response = StreamingHttpResponse(
+            importexport.iter_export(project, fmt),
+            content_type=self.content_types[fmt],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="project-{project.pk}-tasks.{fmt}"'
+        )
+        return response
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class ProjectEditMixin(ProjectRoleMixin):
+    """Доступ к изменению задач проекта для владельца, администраторов и участников"""
+
+    edit_roles = ["owner", "admin", "member"]
+
+    def get_editable_project(self, pk):
+        project = get_object_or_404(Project, pk=pk)
+        if not self.has_project_role(project, *self.edit_roles):
+            raise Http404("Project not found")
+        return project
+
+
+class TaskMoveView(LoginRequiredMixin, ProjectEditMixin, View):
+    """Перемещение задачи: {"status": id|null, "after": id|null, "before": id|null}"""
+
+    def post(self, request, pk):
+        task = get_object_or_404(Task, pk=pk)
+        self.get_editable_project(task.project_id)
+
+        data = _json_body(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+        try:
+            task = ordering.move_task(
+                task,
+                status_id=data.get("status"),
+                after_id=data.get("after"),
+                before_id=data.get("before"),
+            )
+        except ordering.MoveError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        return JsonResponse(
+            {"id": task.pk, "status": task.status_id, "task_order": task.task_order}
+        )
+
+
+class ProjectTaskBulkMoveView(LoginRequiredMixin, ProjectEditMixin, View):
+    """Перемещение нескольких задач подряд:
+    {"tasks": [id, ...], "status": id|null, "after": id|null, "before": id|null}"""
+
+    def post(self, request, pk):
+        project = self.get_editable_project(pk)
+
+        data = _json_body(request)
+        if data is None or not isinstance(data.get("tasks"), list):
+            return JsonResponse({"error": "tasks must be a list"}, status=400)
+
+        try:
+            tasks = ordering.move_tasks(
+                project,
+                data["tasks"],
+                status_id=data.get("status"),
+                after_id=data.get("after"),
+                before_id=data.get("before"),
+            )
+        except ordering.MoveError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        return JsonResponse(
+            {
+                "tasks": [
+                    {"id": task.pk, "status": task.status_id, "task_order": task.task_order}
+                    for task in tasks
+                ]
+            }
+        )
+
+
+class ProjectTaskBulkView(LoginRequiredMixin, ProjectEditMixin, View):
+    """Массовое создание и изменение задач: {"operations": [...]} (см. bulk.py)
+
+    Операции применяются все вместе или ни одна; в ответе результат каждой.
+    """
+
+    statement_timeout = 60000
+
+    def post(self, request, pk):
+        project = self.get_editable_project(pk)
+
+        data = _json_body(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+        try:
+            result = bulk.TaskBatch(project, request.user).run(data.get("operations"))
+        except bulk.BulkError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        return JsonResponse(result.as_dict(), status=200 if result.applied else 400)
+
+
+class StatusReorderView(LoginRequiredMixin, ProjectEditMixin, View):
+    """Новый порядок колонок проекта: {"statuses": [id, ...]}"""
+
+    edit_roles = ["owner", "admin"]
+
+    def post(self, request, pk):
+        project = self.get_editable_project(pk)
+
+        data = _json_body(request)
+        if data is None or not isinstance(data.get("statuses"), list):
+            return JsonResponse({"error": "statuses must be a list"}, status=400)
+
+        try:
+            statuses = ordering.reorder_statuses(project, data["statuses"])
+        except ordering.MoveError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        return JsonResponse(
+            {"statuses": [{"id": status.pk, "order": status.order} for status in statuses]}
+        )
+
+
+def _attachment_data(attachment):
+    return {
+        "id": attachment.pk,
+        "name": attachment.name,
+        "content_type": attachment.content_type,
+        "size": attachment.blob.size,
+        "sha256": attachment.blob_id,
+        "url": reverse("attachment_download", args=[attachment.pk]),
+        "thumbnail_url": (
+            reverse("attachment_thumbnail", args=[attachment.pk])
+            if attachment.is_image
+            else None
+        ),
+    }
+
+
+def _upload_data(session):
+    return {
+        "id": str(session.pk),
+        "name": session.name,
+        "size": session.size,
+        "offset": session.offset,
+        "url": reverse("upload_session", args=[session.pk]),
+    }
+
+
+class AttachmentUploadView(LoginRequiredMixin, ProjectEditMixin, View):
+    """Загрузка вложения обычной формой (поле file)"""
+
+    def post(self, request, pk):
+        task = get_object_or_404(Task, pk=pk)
+        self.get_editable_project(task.project_id)
+
+        upload = request.FILES.get("file")
+        if upload is None:
+            return JsonResponse({"error": "File is required"}, status=400)
+        try:
+            attachments.check_size(upload.size)
+        except attachments.UploadError as error:
+            return JsonResponse({"error": str(error)}, status=413)
+
+        attachments.store_uploaded_file(task, request.user, upload)
+        return redirect("task_detail", pk=task.pk)
+
+
+class UploadSessionCreateView(LoginRequiredMixin, ProjectEditMixin, View):
+    """Начать загрузку по частям: {"name": ..., "size": ..., "content_type": ...}"""
+
+    def post(self, request, pk):
+        task = get_object_or_404(Task, pk=pk)
+        self.get_editable_project(task.project_id)
+
+        data = _json_body(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+        try:
+            session = attachments.start_upload(
+                task,
+                request.user,
+                data.get("name"),
+                data.get("size"),
+                data.get("content_type", ""),
+            )
+        except attachments.UploadError as error:
+            return JsonResponse({"error": str(error)}, status=error.status)
+        return JsonResponse(_upload_data(session), status=201)
+
+
+class UploadSessionView(LoginRequiredMixin, ProjectEditMixin, View):
+    """Загрузка по частям: GET - смещение для продолжения, PATCH - очередная
+    часть (тело запроса, заголовок Upload-Offset), DELETE - отмена"""
+
+    http_method_names = ["get", "patch", "delete", "head", "options"]
+
+    def get_session(self, pk):
+        # Продолжить загрузку может только тот, кто ее начал
+        session = get_object_or_404(
+            UploadSession.objects.select_related("task"), pk=pk, user=self.request.user
+        )
+        self.get_editable_project(session.task.project_id)
+        return session
+
+    def get(self, request, pk):
+        return JsonResponse(_upload_data(self.get_session(pk)))
+
+    def patch(self, request, pk):
+        session = self.get_session(pk)
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.headers.get("Content-Length") or 0)
+        except (KeyError, ValueError):
+            return JsonResponse({"error": "Upload-Offset header is required"}, status=400)
+
+        try:
+            session, attachment = attachments.append_chunk(session, offset, request, length)
+        except attachments.UploadConflict as error:
+            return JsonResponse({"error": str(error), "offset": error.offset}, status=409)
+        except attachments.UploadError as error:
+            return JsonResponse({"error": str(error)}, status=error.status)
+
+        if attachment is None:
+            return JsonResponse(_upload_data(session))
+        return JsonResponse({"attachment": _attachment_data(attachment)}, status=201)
+
+    def delete(self, request, pk):
+        attachments.abort_upload(self.get_session(pk))
+        return HttpResponse(status=204)
+
+
+class AttachmentDownloadView(LoginRequiredMixin, ProjectRoleMixin, View):
+    """Содержимое вложения с поддержкой Range (докачка, перемотка видео)"""
+
+    def get_attachment(self, pk):
+        attachment = get_object_or_404(
+            Attachment.objects.select_related("blob").annotate(
+                project_id=F("task__project_id")
+            ),
+            pk=pk,
+        )
+        if not self.has_project_role(attachment.project_id):
+            raise Http404("Attachment not found")
+        return attachment
+
+    def get(self, request, pk):
+        return attachments.serve_attachment(request, self.get_attachment(pk))
+
+
+class AttachmentThumbnailView(AttachmentDownloadView):
+    """Превью изображения для страницы задачи вместо полного файла"""
+
+    def get(self, request, pk):
+        response = attachments.serve_thumbnail(request, self.get_attachment(pk))
+        if response is None:
+            raise Http404("Thumbnail not available")
+        return response
+
+
+class TaskActivityView(LoginRequiredMixin, ProjectRoleMixin, KeysetPaginationMixin, ListView):
+    """История изменений задачи
+
+    Записи не могут быть старше задачи, поэтому условие по created_at
+    позволяет PostgreSQL не читать секции Activity до ее создания.
+    """
+
+    query_budget = 5
+    replica_reads = True
+
+    template_name = "taskmanager/task_activity.html"
+    context_object_name = "activities"
+    keyset_ordering = ["-created_at", "-id"]
+
+    def get_queryset(self):
+        self.task = get_object_or_404(Task, pk=self.kwargs["pk"])
+        if not self.has_project_role(self.task.project_id):
+            raise Http404("Task not found")
+        return Activity.objects.filter(
+            task=self.task, created_at__gte=self.task.created_at
+        ).select_related("user")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["task"] = self.task
+        return context
+
+
+class BoardLimitMixin:
+    board_limit = 20
+    max_board_limit = 100
+
+    def get_board_limit(self):
+        try:
+            limit = int(self.request.GET.get("limit", self.board_limit))
+        except ValueError:
+            limit = self.board_limit
+        return max(1, min(limit, self.max_board_limit))
+
+
+class ProjectBoardView(LoginRequiredMixin, ProjectRoleMixin, BoardLimitMixin, DetailView):
+    """Kanban-доска проекта (?limit= карточек в колонке)"""
+
+    query_budget = 8
+    replica_reads = True
+
+    model = Project
+    template_name = "taskmanager/project_board.html"
+
+    def get_queryset(self):
+        return Project.objects.select_related("summary").prefetch_related("statuses")
+
+    def get_object(self, queryset=None):
+        project = super().get_object(queryset)
+        if not self.has_project_role(project):
+            raise Http404("Project not found")
+        return project
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["columns"] = board.render_columns(self.object, self.get_board_limit())
+        return context
+
+
+class BoardColumnView(LoginRequiredMixin, ProjectRoleMixin, BoardLimitMixin, TemplateView):
+    """Подгрузка карточек колонки доски (?cursor=...)"""
+
+    replica_reads = True
+    template_name = "taskmanager/includes/board_cards.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        project = get_object_or_404(Project, pk=self.kwargs["pk"])
+        if not self.has_project_role(project):
+            raise Http404("Project not found")
+
+        status = None
+        status_key = self.kwargs["status"]
+        if status_key != board.NO_STATUS:
+            if not status_key.isdigit():
+                raise Http404("Status not found")
+            status = get_object_or_404(project.statuses, pk=int(status_key))
+
+        column = board.Column(project, status, count=None)
+        context["column"] = board.load_more(
+            column, self.request.GET.get("cursor"), self.get_board_limit()
+        )
+        context["project"] = project
+        context["limit"] = self.get_board_limit()
+        return context
+
+
+class MetricsView(View):
+    """Метрики запросов и кэшей в текстовом формате Prometheus
+
+    Доступны персоналу и по заголовку Authorization: Bearer <METRICS_TOKEN>.
+    """
+
+    def has_access(self, request):
+        token = settings.TASKMANAGER_METRICS_TOKEN
+        header = request.headers.get("Authorization", "")
+        if token and hmac.compare_digest(header, f"Bearer {token}"):
+            return True
+        return request.user.is_authenticated and request.user.is_staff
+
+    def get(self, request):
+        if not self.has_access(request):
+            return HttpResponse("Forbidden", status=403, content_type="text/plain")
+        return HttpResponse(
+            instrumentation.render_metrics(fragments=fragment_metrics.stats()),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class JobDetailView(LoginRequiredMixin, DetailView):
+    """Состояние фоновой задачи пользователя; ?format=json - для опроса со страницы"""
+
+    template_name = "taskmanager/job_detail.html"
+    context_object_name = "job"
+
+    def get_queryset(self):
+        return Job.objects.filter(created_by=self.request.user)
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get("format") != "json":
+            return super().render_to_response(context, **response_kwargs)
+        job = self.object
+        return JsonResponse(
+            {
+                "id": job.pk,
+                "kind": job.kind,
+                "state": job.state,
+                "progress": job.progress,
+                "total": job.total,
+                "percent": job.percent,
+                "attempts": job.attempts,
+                "error": job.error,
+                "result": job.result,
+            }
+        )